@@ -1,4 +1,4 @@
-from typing import Optional, Union
+from typing import Optional, Sequence, Tuple, Union
 from envs.base import Env
 from envs.user import UserStrategy
 
@@ -10,6 +10,9 @@ def get_env(
     task_split: str,
     user_provider: Optional[str] = None,
     task_index: Optional[int] = None,
+    user_rules: Optional[Sequence[Tuple[str, str]]] = None,
+    user_latency: float = 0.0,
+    durable_dir: Optional[str] = None,
 ) -> Env:
     if env_name == "retail":
         from envs.retail import MockRetailDomainEnv
@@ -20,6 +23,9 @@ def get_env(
             task_split=task_split,
             user_provider=user_provider,
             task_index=task_index,
+            user_rules=user_rules,
+            user_latency=user_latency,
+            durable_dir=durable_dir,
         )
     elif env_name == "airline":
         from envs.airline import MockAirlineDomainEnv
@@ -0,0 +1,328 @@
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+from envs.index import IndexedData, IndexManager, Row, is_indexable
+from envs.query import OrderBy, Query, QueryError, order_records, parse_order_by
+
+# table -> {referenced table -> foreign-key column}
+ForeignKeys = Mapping[str, Mapping[str, str]]
+ColumnRef = Tuple[str, str]
+
+OPS = ("count", "sum", "avg", "min", "max")
+# Lengths of the ISO date prefixes a group_by column can be truncated to.
+TRUNCATIONS = {"year": 4, "month": 7, "day": 10}
+
+
+class Join(object):
+    """A many-to-one join from `source` to `target` through `foreign_key`."""
+
+    def __init__(self, source: str, target: str, foreign_key: str) -> None:
+        self.source = source
+        self.target = target
+        self.foreign_key = foreign_key
+
+
+class GroupBy(object):
+    def __init__(self, label: str, ref: ColumnRef, truncate: Optional[int]) -> None:
+        self.label = label
+        self.ref = ref
+        self.truncate = truncate
+
+
+class Metric(object):
+    def __init__(
+        self, label: str, op: str, ref: Optional[ColumnRef], times: Optional[ColumnRef]
+    ) -> None:
+        self.label = label
+        self.op = op
+        self.ref = ref
+        self.times = times
+
+
+def plan_joins(table_name: str, joins: Iterable[str], foreign_keys: ForeignKeys) -> List[Join]:
+    """Resolves each joined table through a foreign key of a table joined before it."""
+    plan: List[Join] = []
+    joined = [table_name]
+    for target in joins:
+        if not isinstance(target, str) or target in joined:
+            raise QueryError(f"Invalid join {target!r}")
+        for source in joined:
+            foreign_key = foreign_keys.get(source, {}).get(target)
+            if foreign_key is not None:
+                plan.append(Join(source, target, foreign_key))
+                joined.append(target)
+                break
+        else:
+            raise QueryError(f"No foreign key leads from {', '.join(joined)} to {target}")
+    return plan
+
+
+def resolve_column(column: Any, table_name: str, tables: Iterable[str]) -> ColumnRef:
+    """Splits "table.column" (or a bare column of the aggregated table)."""
+    if not isinstance(column, str) or not column:
+        raise QueryError(f"Invalid column {column!r}")
+    if "." not in column:
+        return table_name, column
+    table, name = column.split(".", 1)
+    if table not in tables:
+        raise QueryError(f"Table {table} of {column} is not joined")
+    return table, name
+
+
+def parse_group_by(group_by: Any, table_name: str, tables: List[str]) -> List[GroupBy]:
+    """Items are column names or {"column": ..., "truncate": "year"|"month"|"day", "as": ...}."""
+    if group_by is None:
+        return []
+    if isinstance(group_by, (str, dict)):
+        group_by = [group_by]
+    if not isinstance(group_by, list):
+        raise QueryError("group_by must be a list")
+    groups = []
+    for item in group_by:
+        if isinstance(item, str):
+            item = {"column": item}
+        if not isinstance(item, dict):
+            raise QueryError(f"Invalid group_by item {item!r}")
+        truncate = item.get("truncate")
+        if truncate is not None and truncate not in TRUNCATIONS:
+            raise QueryError(f"truncate must be one of {', '.join(TRUNCATIONS)}")
+        ref = resolve_column(item.get("column"), table_name, tables)
+        label = item.get("as") or item["column"]
+        groups.append(GroupBy(label, ref, TRUNCATIONS.get(truncate)))
+    return groups
+
+
+def parse_metrics(metrics: Any, table_name: str, tables: List[str]) -> List[Metric]:
+    """Items are {"op": ..., "column": ..., "times": ..., "as": ...}.
+
+    `count` without a column counts rows; with one, its non-null values.
+    `times` multiplies each value by another column first, e.g. quantity
+    times products.unit_price for revenue.
+    """
+    if metrics is None:
+        metrics = [{"op": "count"}]
+    if not isinstance(metrics, list) or not metrics:
+        raise QueryError("metrics must be a non-empty list")
+    parsed = []
+    for item in metrics:
+        if not isinstance(item, dict) or item.get("op") not in OPS:
+            raise QueryError(f"Each metric needs an op among {', '.join(OPS)}")
+        op = item["op"]
+        column = item.get("column")
+        if column is None and op != "count":
+            raise QueryError(f"{op} needs a column")
+        ref = resolve_column(column, table_name, tables) if column is not None else None
+        times = item.get("times")
+        times_ref = resolve_column(times, table_name, tables) if times is not None else None
+        label = item.get("as") or (op if column is None else f"{op}_{ref[1]}")
+        if times_ref is not None and not item.get("as"):
+            label = f"{label}_times_{times_ref[1]}"
+        parsed.append(Metric(label, op, ref, times_ref))
+    return parsed
+
+
+class Accumulator(object):
+    __slots__ = ("count", "total", "best")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total: Any = 0
+        self.best: Any = None
+
+    def add(self, op: str, value: Any) -> None:
+        if op in ("sum", "avg"):
+            if type(value) not in (int, float):
+                raise QueryError(f"{op} needs numeric values, got {value!r}")
+            self.total += value
+        elif op == "min":
+            if self.best is None or value < self.best:
+                self.best = value
+        elif op == "max":
+            if self.best is None or value > self.best:
+                self.best = value
+        self.count += 1
+
+    def result(self, op: str) -> Any:
+        if op == "count":
+            return self.count
+        if op == "sum":
+            return self.total
+        if op == "avg":
+            return self.total / self.count if self.count else None
+        return self.best
+
+
+def _needed_columns(
+    table_name: str,
+    joins: List[Join],
+    groups: List[GroupBy],
+    metrics: List[Metric],
+    queries: Dict[str, Query],
+) -> Dict[str, List[str]]:
+    needed: Dict[str, Dict[str, None]] = {table_name: {}}
+    for join in joins:
+        needed.setdefault(join.target, {})
+        needed.setdefault(join.source, {})[join.foreign_key] = None
+    refs = [group.ref for group in groups]
+    for metric in metrics:
+        refs.extend(ref for ref in (metric.ref, metric.times) if ref is not None)
+    for table, column in refs:
+        needed[table][column] = None
+    query = queries.get(table_name)
+    if query is not None:
+        for column in list(query.equal) + [column for column, _, _ in query.predicates]:
+            needed[table_name][column] = None
+    return {table: list(columns) for table, columns in needed.items()}
+
+
+def _project(row: Optional[Row], columns: List[str]) -> Optional[Row]:
+    if row is None:
+        return None
+    return {column: row[column] for column in columns if column in row}
+
+
+def aggregate(
+    data: Dict[str, Any],
+    table_name: str,
+    foreign_keys: ForeignKeys,
+    joins: Optional[List[str]] = None,
+    filters: Optional[Dict[str, Any]] = None,
+    group_by: Any = None,
+    metrics: Any = None,
+    order_by: OrderBy = None,
+    limit: Optional[int] = None,
+) -> Tuple[List[Row], int, int]:
+    """Groups the rows of a table, joined with the tables it references, and aggregates them.
+
+    Filter keys may be qualified with a joined table ("sales_orders.status").
+    Filters on a joined table are evaluated once on that table (through its
+    indexes where possible) into a set of allowed ids; when the aggregated
+    table has an index on the foreign key, the rows to visit then come
+    straight from that index. Otherwise the table is scanned, reading only
+    the columns the query needs (`scan` on columnar and mapped tables).
+
+    Returns (groups, number of groups before `limit`, rows aggregated).
+    """
+    if not isinstance(data.get(table_name), Mapping):
+        raise QueryError(f"Unknown table {table_name}")
+    if limit is not None and (type(limit) is not int or limit < 0):
+        raise QueryError("limit must be a non-negative integer")
+    join_plan = plan_joins(table_name, joins or [], foreign_keys)
+    tables = [table_name] + [join.target for join in join_plan]
+    groups = parse_group_by(group_by, table_name, tables)
+    parsed_metrics = parse_metrics(metrics, table_name, tables)
+
+    if filters is None:
+        filters = {}
+    if not isinstance(filters, dict):
+        raise QueryError("filters must be an object")
+    split: Dict[str, Dict[str, Any]] = {}
+    for column, value in filters.items():
+        table, name = resolve_column(column, table_name, tables)
+        split.setdefault(table, {})[name] = value
+    queries = {table: Query(table_filters) for table, table_filters in split.items()}
+    needed = _needed_columns(table_name, join_plan, groups, parsed_metrics, queries)
+
+    # Ids allowed by the filters on each joined table.
+    allowed: Dict[str, Set[str]] = {}
+    for join in join_plan:
+        query = queries.get(join.target)
+        if query is not None:
+            allowed[join.target] = {
+                row_id for row_id, _ in query.iter_records(data, join.target)
+            }
+
+    table = data[table_name]
+    base_query = queries.get(table_name, Query({}))
+    row_ids = base_query.candidates(data, table_name)
+    indexes: Optional[IndexManager] = getattr(data, "indexes", None)
+    if indexes is not None:
+        for join in join_plan:
+            if join.source != table_name or join.target not in allowed:
+                continue
+            if row_ids is not None and len(row_ids) <= len(allowed[join.target]):
+                continue
+            by_key = indexes.lookup_in(table_name, join.foreign_key, allowed[join.target])
+            if by_key is not None and (row_ids is None or len(by_key) < len(row_ids)):
+                row_ids = by_key
+    if row_ids is not None:
+        rows: Iterable[Tuple[str, Row]] = ((row_id, table[row_id]) for row_id in row_ids)
+    elif hasattr(table, "scan"):
+        rows = table.scan(needed[table_name])
+    else:
+        rows = table.items()
+    if isinstance(data, IndexedData):
+        data.rows_scanned += len(table) if row_ids is None else len(row_ids)
+
+    # Referenced rows, projected to the needed columns, fetched once per id.
+    parents: Dict[str, Dict[Any, Optional[Row]]] = {join.target: {} for join in join_plan}
+    accumulators: Dict[Tuple[Any, ...], List[Accumulator]] = {}
+    matched = 0
+    for _, row in rows:
+        if not base_query.matches(row):
+            continue
+        context: Dict[str, Optional[Row]] = {table_name: row}
+        for join in join_plan:
+            source = context[join.source]
+            key = source.get(join.foreign_key) if source is not None else None
+            if join.target in allowed and key not in allowed[join.target]:
+                break
+            cache = parents[join.target]
+            if key not in cache:
+                target = data.get(join.target, {})
+                parent = target.get(key) if isinstance(key, str) else None
+                cache[key] = _project(parent, needed[join.target])
+            context[join.target] = cache[key]
+        else:
+            matched += 1
+            group_key = []
+            for group in groups:
+                source = context[group.ref[0]]
+                value = source.get(group.ref[1]) if source is not None else None
+                if group.truncate is not None and isinstance(value, str):
+                    value = value[: group.truncate]
+                if not is_indexable(value):
+                    raise QueryError(f"Cannot group by {group.label}: unhashable value")
+                group_key.append(value)
+            states = accumulators.get(tuple(group_key))
+            if states is None:
+                states = [Accumulator() for _ in parsed_metrics]
+                accumulators[tuple(group_key)] = states
+            for metric, state in zip(parsed_metrics, states):
+                if metric.ref is None:
+                    state.count += 1
+                    continue
+                source = context[metric.ref[0]]
+                value = source.get(metric.ref[1]) if source is not None else None
+                if value is not None and metric.times is not None:
+                    other = context[metric.times[0]]
+                    factor = other.get(metric.times[1]) if other is not None else None
+                    if factor is None:
+                        continue
+                    if type(value) not in (int, float) or type(factor) not in (int, float):
+                        raise QueryError(f"{metric.label} needs numeric values")
+                    value = value * factor
+                if value is None:
+                    continue
+                try:
+                    state.add(metric.op, value)
+                except TypeError:
+                    raise QueryError(f"Cannot compare values of {metric.label}")
+
+    results = []
+    for group_key, states in accumulators.items():
+        result = {group.label: value for group, value in zip(groups, group_key)}
+        for metric, state in zip(parsed_metrics, states):
+            result[metric.label] = state.result(metric.op)
+        results.append(("", result))
+    order = parse_order_by(order_by) if order_by is not None else [
+        (group.label, False) for group in groups
+    ]
+    for column, _ in order:
+        if not any(column == item.label for item in list(groups) + list(parsed_metrics)):
+            raise QueryError(f"Cannot order by {column}: not a group or metric")
+    if order:
+        results = order_records(results, order, "", None)
+    total = len(results)
+    if limit is not None:
+        results = results[:limit]
+    return [result for _, result in results], total, matched
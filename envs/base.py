@@ -1,7 +1,17 @@
+import contextlib
 import random
-from hashlib import sha256
 from envs.tool import Tool
-from typing import Any, Callable, Dict, List, Type, Optional, Set, Union, Tuple
+from envs.clock import EpisodeClock
+from envs.hashing import Hashable, ToHashable, consistent_hash, to_hashable
+from envs.index import IndexColumns
+from envs.instrumentation import Instrumentation
+from envs.query import PageLimits
+from envs.serialization import Serializer
+from envs.gt_cache import GroundTruthCache, code_version
+from envs.snapshot import ViewFactory, load_snapshot
+from envs.store import DataStore, extract_delta
+from envs.wal import WriteAheadLog, open_durable_store
+from typing import Any, Callable, ContextManager, Dict, List, Sequence, Tuple, Type, Optional, Union
 
 from envs.user import load_user, UserStrategy
 from types import (
@@ -16,27 +26,10 @@ from types import (
     RESPOND_ACTION_NAME,
 )
 
-ToHashable = Union[
-    str, int, float, Dict[str, "ToHashable"], List["ToHashable"], Set["ToHashable"]
-]
-Hashable = Union[str, int, float, Tuple["Hashable"], Tuple[Tuple[str, "Hashable"]]]
-
-
-def to_hashable(item: ToHashable) -> Hashable:
-    if isinstance(item, dict):
-        return tuple((key, to_hashable(value)) for key, value in sorted(item.items()))
-    elif isinstance(item, list):
-        return tuple(to_hashable(element) for element in item)
-    elif isinstance(item, set):
-        return tuple(sorted(to_hashable(element) for element in item))
-    else:
-        return item
-
-
-def consistent_hash(
-    value: Hashable,
-) -> str:
-    return sha256(str(value).encode("utf-8")).hexdigest()
+def get_tool_name(tool: Type[Tool]) -> str:
+    info = tool.get_info()
+    # Interface tools describe themselves flat, without the "function" wrapper.
+    return info["function"]["name"] if "function" in info else info["name"]
 
 
 class Env(object):
@@ -51,14 +44,37 @@ class Env(object):
         user_model: str,
         user_provider: Optional[str] = None,
         task_index: Optional[int] = None,
+        index_columns: Optional[IndexColumns] = None,
+        gt_cache: Optional[GroundTruthCache] = None,
+        instrumentation: Optional[Instrumentation] = None,
+        page_limits: Optional[PageLimits] = None,
+        serializer: Optional[Serializer] = None,
+        views: Optional[Dict[str, ViewFactory]] = None,
+        user_rules: Optional[Sequence[Tuple[str, str]]] = None,
+        user_latency: float = 0.0,
+        durable_dir: Optional[str] = None,
+        clock: Optional[EpisodeClock] = None,
     ) -> None:
         super().__init__()
         self.data_load_func = data_load_func
-        self.data = data_load_func()
+        self.index_columns = index_columns
+        self.page_limits = page_limits
+        self.serializer = serializer
+        # Pinned, so the episode and the ground-truth replay write the same rows.
+        self.clock = clock if clock is not None else EpisodeClock()
+        self.views = views or {}
+        self.snapshot = load_snapshot(data_load_func, index_columns)
+        self.snapshot.add_views(self.views)
+        # With `durable_dir`, the episode's data survives a crash (see `recover_data`).
+        self.wal: Optional[WriteAheadLog] = None
+        self.data = self.load_data() if durable_dir is None else self.recover_data(durable_dir)
         self.tools_map: Dict[str, Type[Tool]] = {
-            tool.get_info()["function"]["name"]: tool for tool in tools
+            get_tool_name(tool): tool for tool in tools
         }
         self.tools_info = [tool.get_info() for tool in tools]
+        self.code_version = code_version(tools)
+        self.gt_cache = gt_cache if gt_cache is not None else GroundTruthCache()
+        self.instrumentation = instrumentation
         self.terminate_tools = []
         self.tasks = tasks
         if task_index is not None:
@@ -69,46 +85,118 @@ class Env(object):
         self.wiki = wiki
         self.rules = rules
         self.user = load_user(
-            user_strategy=user_strategy, model=user_model, provider=user_provider
+            user_strategy=user_strategy,
+            model=user_model,
+            provider=user_provider,
+            rules=user_rules,
+            latency=user_latency,
         )
         self.actions: List[Action] = []
 
     def reset(self, task_index: Optional[int] = None) -> EnvResetResponse:
+        self.prepare_reset(task_index)
+        initial_observation = self.user.reset(instruction=self.task.instruction)
+        return EnvResetResponse(
+            observation=initial_observation, info=EnvInfo(task=self.task, source="user")
+        )
+
+    async def areset(self, task_index: Optional[int] = None) -> EnvResetResponse:
+        self.prepare_reset(task_index)
+        initial_observation = await self.user.areset(instruction=self.task.instruction)
+        return EnvResetResponse(
+            observation=initial_observation, info=EnvInfo(task=self.task, source="user")
+        )
+
+    def prepare_reset(self, task_index: Optional[int] = None) -> None:
         if task_index is None:
             task_index = random.randint(0, len(self.tasks))
         self.task_index = task_index
-        self.data = self.data_load_func()
+        self.data = self.load_data()
+        if self.wal is not None:
+            self.wal.reset()
+            self.wal.attach(self.data)
         self.task = self.tasks[task_index]
         self.actions = []
-        initial_observation = self.user.reset(instruction=self.task.instruction)
-        return EnvResetResponse(
-            observation=initial_observation, info=EnvInfo(task=self.task, source="user")
+        self.user.set_task(self.task)
+
+    def load_data(self) -> DataStore:
+        return self.configure_data(self.snapshot.checkout(self.views))
+
+    def recover_data(self, durable_dir: str) -> DataStore:
+        """Recovers the data persisted in `durable_dir` and logs its commits there.
+
+        The data is the last reset's plus every commit logged since, each
+        one on disk before its step returns. `close` closes the log.
+        """
+        data, self.wal = open_durable_store(
+            durable_dir,
+            self.data_load_func,
+            self.index_columns,
+            self.views,
+            snapshot=self.snapshot,
         )
+        return self.configure_data(data)
+
+    def configure_data(self, data: DataStore) -> DataStore:
+        data.page_limits = self.page_limits
+        data.serializer = self.serializer
+        data.clock = self.clock
+        return data
+
+    def close(self) -> None:
+        if self.wal is not None:
+            self.wal.close()
+            self.wal = None
 
     def step(self, action: Action) -> EnvResponse:
+        instrumentation = self.instrumentation
+        if instrumentation is None:
+            return self.dispatch_step(action)
+        metrics = instrumentation.begin_step(self, action)
+        response = self.dispatch_step(action)
+        instrumentation.end_step(self, action, response, metrics)
+        return response
+
+    def dispatch_step(self, action: Action) -> EnvResponse:
         self.actions.append(action)
 
         info = EnvInfo(task=self.task)
-        reward = 0
         done = False
         if action.name == RESPOND_ACTION_NAME:
             observation = self.user.step(action.kwargs["content"])
             info.source = "user"
             done = "###STOP###" in observation
         elif action.name in self.tools_map:
-            try:
-                observation = self.tools_map[action.name].invoke(
-                    data=self.data, **action.kwargs
-                )
-            except Exception as e:
-                observation = f"Error: {e}"
+            observation = self.invoke_tool(self.data, action)
             info.source = action.name
             if action.name in self.terminate_tools:
                 done = True
         else:
             observation = f"Unknown action {action.name}"
             info.source = action.name
+        return self.finish_step(observation, done, info)
 
+    async def astep(self, action: Action) -> EnvResponse:
+        instrumentation = self.instrumentation
+        if instrumentation is None:
+            return await self.adispatch_step(action)
+        metrics = instrumentation.begin_step(self, action)
+        response = await self.adispatch_step(action)
+        instrumentation.end_step(self, action, response, metrics)
+        return response
+
+    async def adispatch_step(self, action: Action) -> EnvResponse:
+        # Only the user simulator does I/O; tools run inline on the event loop.
+        if action.name != RESPOND_ACTION_NAME:
+            return self.dispatch_step(action)
+        self.actions.append(action)
+        info = EnvInfo(task=self.task, source="user")
+        observation = await self.user.astep(action.kwargs["content"])
+        done = "###STOP###" in observation
+        return self.finish_step(observation, done, info)
+
+    def finish_step(self, observation: str, done: bool, info: EnvInfo) -> EnvResponse:
+        reward = 0
         if done:
             reward_res = self.calculate_reward()
             reward = reward_res.reward
@@ -116,47 +204,98 @@ class Env(object):
             info.user_cost = self.user.get_total_cost()
         return EnvResponse(observation=observation, reward=reward, done=done, info=info)
 
+    def invoke_tool(self, data: DataStore, action: Action) -> str:
+        # Apply the tool's delta atomically; a failing call leaves no trace.
+        data.begin()
+        try:
+            observation = self.tools_map[action.name].invoke(
+                data=data, **action.kwargs
+            )
+            data.apply_delta(extract_delta(observation))
+            data.commit()
+        except Exception as e:
+            if data.in_transaction:
+                data.rollback()
+            observation = f"Error: {e}"
+        return observation
+
     def get_data_hash(self) -> str:
-        return consistent_hash(to_hashable(self.data))
+        return self.data.get_data_hash()
+
+    def get_dataset_fingerprint(self) -> str:
+        return self.snapshot.fingerprint
+
+    def get_gt_cache_key(self, task_index: int) -> str:
+        task = self.tasks[task_index]
+        actions_hash = consistent_hash(
+            to_hashable([action.model_dump() for action in task.actions])
+        )
+        return ":".join(
+            [
+                str(task_index),
+                actions_hash[:16],
+                self.get_dataset_fingerprint(),
+                self.clock.fingerprint,
+                self.code_version,
+            ]
+        )
+
+    def compute_gt_data_hash(self, task_index: int) -> str:
+        # Replay the ground-truth tool calls on a fresh checkout of the data.
+        data = self.load_data()
+        for action in self.tasks[task_index].actions:
+            if action.name in self.tools_map and action.name not in self.terminate_tools:
+                self.invoke_tool(data, action)
+        return data.get_data_hash()
+
+    def get_gt_data_hash(self, task_index: int) -> str:
+        return self.gt_cache.get_or_compute(
+            self.get_gt_cache_key(task_index),
+            lambda: self.compute_gt_data_hash(task_index),
+        )
+
+    def phase(self, name: str) -> ContextManager[None]:
+        """Times a named phase when instrumented; a no-op otherwise."""
+        if self.instrumentation is None:
+            return contextlib.nullcontext()
+        return self.instrumentation.phase(name)
 
     def calculate_reward(self) -> RewardResult:
-        data_hash = self.get_data_hash()
+        with self.phase("reward.data_hash"):
+            data_hash = self.get_data_hash()
         reward = 1.0
         actions = [
             action for action in self.task.actions if action.name != RESPOND_ACTION_NAME
         ]
 
         # Check if the database changes are correct. If they are not correct, then we set the reward to 0.
-        # TODO: cache gt_data_hash in tasks.py (low priority)
-        self.data = self.data_load_func()
-        for action in self.task.actions:
-            if action.name not in self.terminate_tools:
-                self.step(action)
-        gt_data_hash = self.get_data_hash()
+        with self.phase("reward.gt_data_hash"):
+            gt_data_hash = self.get_gt_data_hash(self.task_index)
         info = RewardActionInfo(
             r_actions=data_hash == gt_data_hash, gt_data_hash=gt_data_hash
         )
         if not info.r_actions:
             reward = 0.0
 
-        if len(self.task.outputs) > 0:
-            # check outputs
-            r_outputs = 1.0
-            outputs = {}
-            for output in self.task.outputs:
-                found = False
-                for action in self.actions:
-                    if (
-                        action.name == RESPOND_ACTION_NAME
-                        and output.lower()
-                        in action.kwargs["content"].lower().replace(",", "")
-                    ):
-                        found = True
-                        break
-                outputs[output] = found
-                if not found:
-                    r_outputs = 0.0
-                    reward = 0.0
-            info = RewardOutputInfo(r_outputs=r_outputs, outputs=outputs)
+        with self.phase("reward.outputs"):
+            if len(self.task.outputs) > 0:
+                # check outputs
+                r_outputs = 1.0
+                outputs = {}
+                for output in self.task.outputs:
+                    found = False
+                    for action in self.actions:
+                        if (
+                            action.name == RESPOND_ACTION_NAME
+                            and output.lower()
+                            in action.kwargs["content"].lower().replace(",", "")
+                        ):
+                            found = True
+                            break
+                    outputs[output] = found
+                    if not found:
+                        r_outputs = 0.0
+                        reward = 0.0
+                info = RewardOutputInfo(r_outputs=r_outputs, outputs=outputs)
             
         return RewardResult(reward=reward, info=info, actions=actions)
\ No newline at end of file
@@ -0,0 +1,503 @@
+import argparse
+import importlib
+import json
+import mmap
+import os
+import sys
+from array import array
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Set, Tuple
+
+from envs.columnar import ENCODINGS, ColumnarTable, is_canonical_id
+from envs.files import replace_file
+from envs.hashing import MODULUS, row_digest
+from envs.index import HashIndex, IndexColumns, IndexKey, Row, TableIndex, is_indexable
+from envs.sequence import max_numeric_id
+
+MAGIC = b"ENVSNAP1"
+VERSION = 1
+ALIGNMENT = 8
+PREFIX_SIZE = len(MAGIC) + 8
+
+# A blob is stored as [offset, length] relative to the start of the data section.
+BlobRef = List[int]
+
+
+def _align(size: int) -> int:
+    return size + (-size % ALIGNMENT)
+
+
+def _normalize(value: Any) -> Any:
+    # Values that compare equal must encode equally, as they share a hash bucket.
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def encode_index_key(value: Any) -> bytes:
+    if isinstance(value, tuple):
+        value = [_normalize(element) for element in value]
+    else:
+        value = _normalize(value)
+    return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+
+class _BlobWriter(object):
+    def __init__(self) -> None:
+        self.chunks: List[bytes] = []
+        self.size = 0
+
+    def add(self, data: bytes) -> BlobRef:
+        padding = -self.size % ALIGNMENT
+        if padding:
+            self.chunks.append(b"\0" * padding)
+            self.size += padding
+        offset = self.size
+        self.chunks.append(data)
+        self.size += len(data)
+        return [offset, len(data)]
+
+    def add_strings(self, values: Sequence[bytes]) -> Dict[str, BlobRef]:
+        offsets = array("Q", [0])
+        total = 0
+        for value in values:
+            total += len(value)
+            offsets.append(total)
+        return {"offsets": self.add(offsets.tobytes()), "data": self.add(b"".join(values))}
+
+
+def _encode_table(
+    table: Dict[str, Row],
+    categories: Iterable[str],
+    index_keys: Iterable[IndexKey],
+    blobs: _BlobWriter,
+) -> Dict[str, Any]:
+    columnar = ColumnarTable(table, categories)
+    shape_sets = [set(shape) for shape in columnar.shapes]
+    meta: Dict[str, Any] = {
+        "rows": len(columnar),
+        "categories": sorted(columnar.category_columns),
+        "shapes": [list(shape) for shape in columnar.shapes],
+        "shape_ids": blobs.add(columnar.shape_ids.tobytes()),
+        "digest_sum": format(
+            sum(row_digest(row_id, row) for row_id, row in table.items()) % MODULUS, "x"
+        ),
+        "max_id": max_numeric_id(table),
+    }
+    if columnar.int_keys is not None:
+        meta["keys"] = {"kind": "int", "data": blobs.add(columnar.int_keys.tobytes())}
+    else:
+        encoded = [row_id.encode("utf-8") for row_id in columnar.str_keys]
+        order = sorted(range(len(encoded)), key=encoded.__getitem__)
+        meta["keys"] = {
+            "kind": "str",
+            **blobs.add_strings(encoded),
+            "order": blobs.add(array("I", order).tobytes()),
+        }
+
+    columns: Dict[str, Any] = {}
+    for name, column in columnar.columns.items():
+        if column.kind != "object":
+            columns[name] = {
+                "kind": column.kind,
+                "data": blobs.add(column.values.tobytes()),
+                "categories": column.categories,
+            }
+            continue
+        present = [
+            value
+            for value, shape_id in zip(column.values, columnar.shape_ids)
+            if name in shape_sets[shape_id]
+        ]
+        if all(isinstance(value, str) for value in present):
+            kind = "str"
+            encoded = [
+                value.encode("utf-8") if isinstance(value, str) else b""
+                for value in column.values
+            ]
+        else:
+            kind = "json"
+            encoded = [json.dumps(value).encode("utf-8") for value in column.values]
+        columns[name] = {"kind": kind, **blobs.add_strings(encoded)}
+    meta["columns"] = columns
+
+    indexes = []
+    for index_key in index_keys:
+        hash_index = HashIndex(index_key)
+        entries = []
+        for position, row in enumerate(table.values()):
+            value = hash_index.key(row)
+            if is_indexable(value):
+                entries.append((encode_index_key(value), position))
+        entries.sort()
+        indexes.append(
+            {
+                "column": list(index_key) if isinstance(index_key, tuple) else index_key,
+                "positions": blobs.add(array("I", [p for _, p in entries]).tobytes()),
+                **blobs.add_strings([key for key, _ in entries]),
+            }
+        )
+    meta["indexes"] = indexes
+    return meta
+
+
+def write_snapshot(
+    tables: Dict[str, Any],
+    path: str,
+    index_columns: Optional[IndexColumns] = None,
+    categories: Optional[Dict[str, Iterable[str]]] = None,
+) -> None:
+    """Writes `tables` (dicts of rows) to a binary snapshot file at `path`."""
+    index_columns = index_columns or {}
+    categories = categories or {}
+    blobs = _BlobWriter()
+    table_metas = {}
+    for table_name, table in tables.items():
+        if not isinstance(table, dict):
+            raise ValueError(f"Table {table_name} is not a dict of rows")
+        table_metas[table_name] = _encode_table(
+            table,
+            categories.get(table_name, ()),
+            index_columns.get(table_name, ()),
+            blobs,
+        )
+    header = json.dumps(
+        {"version": VERSION, "byteorder": sys.byteorder, "tables": table_metas}
+    ).encode("utf-8")
+    prefix = MAGIC + len(header).to_bytes(8, "little")
+    padding = _align(PREFIX_SIZE + len(header)) - PREFIX_SIZE - len(header)
+
+    def write(f: Any) -> None:
+        f.write(prefix + header + b"\0" * padding)
+        for chunk in blobs.chunks:
+            f.write(chunk)
+
+    replace_file(os.path.dirname(path) or ".", path, write, binary=True)
+
+
+def _view(data: memoryview, ref: BlobRef, typecode: str = "B") -> memoryview:
+    offset, length = ref
+    view = data[offset : offset + length]
+    return view if typecode == "B" else view.cast(typecode)
+
+
+class _MappedStrings(object):
+    """Variable-length byte strings addressed through an offsets array."""
+
+    def __init__(self, data: memoryview, meta: Dict[str, Any]) -> None:
+        self.offsets = _view(data, meta["offsets"], "Q")
+        self.data = _view(data, meta["data"])
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def get(self, position: int) -> memoryview:
+        return self.data[self.offsets[position] : self.offsets[position + 1]]
+
+    def search(self, target: bytes, order: Optional[memoryview] = None) -> Tuple[int, int]:
+        """Range of entries equal to `target`; entries are sorted (via `order`)."""
+
+        def at(index: int) -> bytes:
+            return bytes(self.get(order[index] if order is not None else index))
+
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if at(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        start, hi = lo, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if at(mid) <= target:
+                lo = mid + 1
+            else:
+                hi = mid
+        return start, lo
+
+
+class MappedColumn(object):
+    def __init__(self, data: memoryview, meta: Dict[str, Any]) -> None:
+        self.kind = meta["kind"]
+        self.categories: List[Any] = meta.get("categories", [])
+        if self.kind in ("str", "json"):
+            self.strings = _MappedStrings(data, meta)
+        else:
+            typecode = "I" if self.kind == "category" else ENCODINGS[self.kind][0]
+            self.values = _view(data, meta["data"], typecode)
+
+    def get(self, position: int) -> Any:
+        if self.kind == "str":
+            return str(self.strings.get(position), "utf-8")
+        if self.kind == "json":
+            return json.loads(bytes(self.strings.get(position)))
+        if self.kind == "category":
+            return self.categories[self.values[position]]
+        return ENCODINGS[self.kind][2](self.values[position])
+
+
+class MappedIndex(object):
+    """A sorted index of one column (or tuple of columns) of a `MappedTable`."""
+
+    def __init__(self, data: memoryview, meta: Dict[str, Any]) -> None:
+        column = meta["column"]
+        self.column: IndexKey = tuple(column) if isinstance(column, list) else column
+        self.hash_index = HashIndex(self.column)
+        self.positions = _view(data, meta["positions"], "I")
+        self.keys = _MappedStrings(data, meta)
+
+    def covers(self, filters: Dict[str, Any]) -> bool:
+        return self.hash_index.covers(filters)
+
+    def key(self, values: Dict[str, Any]) -> Any:
+        return self.hash_index.key(values)
+
+    def get(self, value: Any) -> memoryview:
+        """Positions of the rows whose key equals `value`."""
+        start, stop = self.keys.search(encode_index_key(value))
+        return self.positions[start:stop]
+
+
+class MappedTableIndex(TableIndex):
+    """Read-only `TableIndex` served from the indexes stored in a snapshot.
+
+    A table is copied before its first write, and `copy` then builds regular
+    hash indexes over the copy.
+    """
+
+    def __init__(self, table: "MappedTable", columns: Iterable[IndexKey]) -> None:
+        self.table = table
+        self.columns = tuple(columns)
+        self.mapped_indexes = {column: table.indexes[column] for column in self.columns}
+
+    def add(self, row_id: str, row: Row) -> None:
+        raise TypeError("Mapped tables are read-only")
+
+    def remove(self, row_id: str, row: Row) -> None:
+        raise TypeError("Mapped tables are read-only")
+
+    def copy(self, table: Dict[str, Row]) -> TableIndex:
+        return TableIndex(table, self.columns)
+
+    def lookup(self, filters: Dict[str, Any]) -> Optional[List[str]]:
+        best: Optional[memoryview] = None
+        for index in self.mapped_indexes.values():
+            if not index.covers(filters):
+                continue
+            value = index.key(filters)
+            if not is_indexable(value):
+                continue
+            positions = index.get(value)
+            if best is None or len(positions) < len(best):
+                best = positions
+                if not best:
+                    break
+        if best is None:
+            return None
+        return [self.table.get_key(position) for position in sorted(best)]
+
+    def lookup_in(self, column: str, values: Iterable[Any]) -> Optional[List[str]]:
+        index = self.mapped_indexes.get(column)
+        if index is None:
+            return None
+        positions: Set[int] = set()
+        for value in values:
+            if is_indexable(value):
+                positions.update(index.get(value))
+        return [self.table.get_key(position) for position in sorted(positions)]
+
+
+class MappedTable(Mapping[str, Row]):
+    """A read-only table served straight from a memory-mapped snapshot.
+
+    Nothing is decoded until a row is read. `digest_sum` and `max_id` are
+    stored in the snapshot so that the data hash and id sequences start
+    without a scan; `copy` returns a writable `ColumnarTable`.
+    """
+
+    materializes_rows = True
+
+    def __init__(self, data: memoryview, meta: Dict[str, Any]) -> None:
+        self.rows: int = meta["rows"]
+        self.categories: List[str] = meta["categories"]
+        self.shapes = [tuple(shape) for shape in meta["shapes"]]
+        self.shape_ids = _view(data, meta["shape_ids"], "I")
+        self.digest_sum = int(meta["digest_sum"], 16)
+        self.max_id: int = meta["max_id"]
+        keys = meta["keys"]
+        self.int_keys: Optional[memoryview] = None
+        self.str_keys: Optional[_MappedStrings] = None
+        self.key_order: Optional[memoryview] = None
+        if keys["kind"] == "int":
+            self.int_keys = _view(data, keys["data"], "q")
+        else:
+            self.str_keys = _MappedStrings(data, keys)
+            self.key_order = _view(data, keys["order"], "I")
+        self.columns = {
+            name: MappedColumn(data, column) for name, column in meta["columns"].items()
+        }
+        self.indexes: Dict[IndexKey, MappedIndex] = {}
+        for index_meta in meta["indexes"]:
+            index = MappedIndex(data, index_meta)
+            self.indexes[index.column] = index
+
+    def get_key(self, position: int) -> str:
+        if self.int_keys is not None:
+            return str(self.int_keys[position])
+        assert self.str_keys is not None
+        return str(self.str_keys.get(position), "utf-8")
+
+    def _position(self, row_id: Any) -> Optional[int]:
+        if not isinstance(row_id, str):
+            return None
+        if self.int_keys is not None:
+            if not is_canonical_id(row_id):
+                return None
+            key = int(row_id)
+            position = bisect_left(self.int_keys, key)
+            if position < len(self.int_keys) and self.int_keys[position] == key:
+                return position
+            return None
+        assert self.str_keys is not None and self.key_order is not None
+        start, stop = self.str_keys.search(row_id.encode("utf-8"), self.key_order)
+        return self.key_order[start] if start < stop else None
+
+    def _row(self, position: int) -> Row:
+        columns = self.columns
+        return {
+            name: columns[name].get(position)
+            for name in self.shapes[self.shape_ids[position]]
+        }
+
+    def __getitem__(self, row_id: str) -> Row:
+        position = self._position(row_id)
+        if position is None:
+            raise KeyError(row_id)
+        return self._row(position)
+
+    def __contains__(self, row_id: object) -> bool:
+        return self._position(row_id) is not None
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def __iter__(self) -> Iterator[str]:
+        for position in range(self.rows):
+            yield self.get_key(position)
+
+    def items(self) -> Iterator[Tuple[str, Row]]:  # type: ignore[override]
+        for position in range(self.rows):
+            yield self.get_key(position), self._row(position)
+
+    def values(self) -> Iterator[Row]:  # type: ignore[override]
+        for position in range(self.rows):
+            yield self._row(position)
+
+    def scan(self, names: Sequence[str]) -> Iterator[Tuple[str, Row]]:
+        """Like `ColumnarTable.scan`: rows with only the columns in `names`."""
+        wanted: Dict[int, List[Tuple[str, MappedColumn]]] = {}
+        for position in range(self.rows):
+            shape_id = self.shape_ids[position]
+            columns = wanted.get(shape_id)
+            if columns is None:
+                shape = self.shapes[shape_id]
+                columns = [(name, self.columns[name]) for name in names if name in shape]
+                wanted[shape_id] = columns
+            yield self.get_key(position), {name: column.get(position) for name, column in columns}
+
+    def copy(self) -> ColumnarTable:
+        return ColumnarTable(dict(self.items()), self.categories)
+
+    def build_index(self, columns: Iterable[IndexKey]) -> TableIndex:
+        columns = tuple(columns)
+        if all(column in self.indexes for column in columns):
+            return MappedTableIndex(self, columns)
+        return TableIndex(self, columns)
+
+
+def open_snapshot(path: str) -> Dict[str, MappedTable]:
+    """Maps a binary snapshot into memory and returns its tables.
+
+    The file is mapped read-only, so every process that opens (or inherits)
+    the same snapshot shares its pages through the OS page cache.
+    """
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(buffer)
+    if bytes(view[: len(MAGIC)]) != MAGIC:
+        raise ValueError(f"{path} is not a binary snapshot")
+    header_length = int.from_bytes(view[len(MAGIC) : PREFIX_SIZE], "little")
+    header = json.loads(bytes(view[PREFIX_SIZE : PREFIX_SIZE + header_length]))
+    if header["version"] != VERSION:
+        raise ValueError(f"Unsupported snapshot version {header['version']} in {path}")
+    if header["byteorder"] != sys.byteorder:
+        raise ValueError(f"{path} was written on a {header['byteorder']}-endian machine")
+    data = view[_align(PREFIX_SIZE + header_length) :]
+    return {
+        table_name: MappedTable(data, meta)
+        for table_name, meta in header["tables"].items()
+    }
+
+
+def load_json_tables(json_dir: str) -> Dict[str, Any]:
+    tables = {}
+    for filename in sorted(os.listdir(json_dir)):
+        if filename.endswith(".json"):
+            with open(os.path.join(json_dir, filename)) as f:
+                tables[filename[:-5]] = json.load(f)
+    return tables
+
+
+def json_to_binary(
+    json_dir: str,
+    path: str,
+    index_columns: Optional[IndexColumns] = None,
+    categories: Optional[Dict[str, Iterable[str]]] = None,
+) -> None:
+    write_snapshot(load_json_tables(json_dir), path, index_columns, categories)
+
+
+def binary_to_json(path: str, json_dir: str) -> None:
+    os.makedirs(json_dir, exist_ok=True)
+    for table_name, table in open_snapshot(path).items():
+        with open(os.path.join(json_dir, f"{table_name}.json"), "w") as f:
+            json.dump(dict(table.items()), f, indent=2)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Convert environment data between JSON files and a binary snapshot."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    to_binary = subparsers.add_parser("to-binary")
+    to_binary.add_argument("json_dir", type=str)
+    to_binary.add_argument("output", type=str)
+    to_binary.add_argument(
+        "--env",
+        type=str,
+        default=None,
+        help="Environment whose INDEXES and CATEGORIES to store (e.g. retail)",
+    )
+    to_json = subparsers.add_parser("to-json")
+    to_json.add_argument("snapshot", type=str)
+    to_json.add_argument("output_dir", type=str)
+    args = parser.parse_args()
+
+    if args.command == "to-binary":
+        index_columns = categories = None
+        if args.env is not None:
+            env_data = importlib.import_module(f"envs.{args.env}.data")
+            index_columns = getattr(env_data, "INDEXES", None)
+            categories = getattr(env_data, "CATEGORIES", None)
+        json_to_binary(args.json_dir, args.output, index_columns, categories)
+        print(f"Wrote {args.output} ({os.path.getsize(args.output)} bytes)")
+    else:
+        binary_to_json(args.snapshot, args.output_dir)
+        print(f"Wrote JSON tables to {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
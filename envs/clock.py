@@ -0,0 +1,50 @@
+import datetime
+import random
+from typing import Any
+
+# The moment every episode's tools take as "now", just after the dataset's latest dates.
+EPISODE_START = datetime.datetime(2026, 1, 1, 9, 0, 0)
+
+
+class EpisodeClock(object):
+    """The time and randomness tools stamp into the rows they write.
+
+    Rewards compare an episode's data with a replay of the ground-truth
+    actions, so what a tool writes must not depend on when, or after which
+    other calls, it runs: `now` is pinned to `start`, and `randint` draws
+    from a generator seeded by `seed` and a key naming what is drawn for
+    (e.g. the id of the new row), so the same write yields the same value
+    in the episode and in the replay.
+    """
+
+    def __init__(self, start: datetime.datetime = EPISODE_START, seed: int = 0) -> None:
+        self.start = start
+        self.seed = seed
+
+    @property
+    def fingerprint(self) -> str:
+        return f"{self.start.isoformat()}/{self.seed}"
+
+    def now(self) -> datetime.datetime:
+        return self.start
+
+    def randint(self, key: str, a: int, b: int) -> int:
+        return random.Random(f"{self.seed}:{key}").randint(a, b)
+
+
+class SystemClock(object):
+    """Wall-clock time and the global `random`, for data outside an `Env`."""
+
+    def now(self) -> datetime.datetime:
+        return datetime.datetime.now()
+
+    def randint(self, key: str, a: int, b: int) -> int:
+        return random.randint(a, b)
+
+
+SYSTEM_CLOCK = SystemClock()
+
+
+def get_clock(data: Any) -> Any:
+    """The clock configured on `data`, or the system clock."""
+    return getattr(data, "clock", None) or SYSTEM_CLOCK
@@ -0,0 +1,414 @@
+import datetime
+import sys
+from array import array
+from bisect import bisect_left
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    MutableMapping,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+Row = Dict[str, Any]
+
+EPOCH = datetime.datetime(1970, 1, 1)
+MICROSECOND = datetime.timedelta(microseconds=1)
+MAX_ID_DIGITS = 18
+DELETED = 0xFFFFFFFF
+
+
+def is_canonical_id(value: Any) -> bool:
+    """True for ids like "1" or "102" that survive a round trip through int."""
+    return (
+        type(value) is str
+        and 0 < len(value) <= MAX_ID_DIGITS
+        and value.isascii()
+        and value.isdigit()
+        and (value == "0" or value[0] != "0")
+    )
+
+
+def _encode_int(value: Any) -> Optional[int]:
+    if type(value) is int and -(1 << 63) <= value < (1 << 63):
+        return value
+    return None
+
+
+def _encode_float(value: Any) -> Optional[float]:
+    return value if type(value) is float else None
+
+
+def _encode_id(value: Any) -> Optional[int]:
+    return int(value) if is_canonical_id(value) else None
+
+
+def _encode_datetime(value: Any) -> Optional[int]:
+    if type(value) is not str or len(value) < 19:
+        return None
+    try:
+        parsed = datetime.datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None or parsed.isoformat() != value:
+        return None
+    return (parsed - EPOCH) // MICROSECOND
+
+
+def _decode_datetime(value: int) -> str:
+    return (EPOCH + value * MICROSECOND).isoformat()
+
+
+def _encode_date(value: Any) -> Optional[int]:
+    if type(value) is not str or len(value) != 10:
+        return None
+    try:
+        parsed = datetime.date.fromisoformat(value)
+    except ValueError:
+        return None
+    return parsed.toordinal() if parsed.isoformat() == value else None
+
+
+def _decode_date(value: int) -> str:
+    return datetime.date.fromordinal(value).isoformat()
+
+
+# kind -> (array typecode, encoder returning None when a value does not fit, decoder)
+ENCODINGS: Dict[str, Tuple[str, Callable[[Any], Any], Callable[[Any], Any]]] = {
+    "int": ("q", _encode_int, int),
+    "float": ("d", _encode_float, float),
+    "id": ("q", _encode_id, str),
+    "datetime": ("q", _encode_datetime, _decode_datetime),
+    "date": ("i", _encode_date, _decode_date),
+}
+# Tried in this order when a column is built; "object" always fits.
+DETECTION_ORDER = ["int", "float", "id", "datetime", "date"]
+
+
+class Column(object):
+    """One column stored as a typed array (or a list for mixed values).
+
+    Category columns store an index into a list of interned strings.
+    Positions of rows that lack the column hold a placeholder that is never
+    read. A value that does not fit the encoding turns the column into a
+    plain object list.
+    """
+
+    def __init__(self, kind: str) -> None:
+        self.kind = kind
+        self.categories: List[Any] = []
+        self.category_codes: Dict[Any, int] = {}
+        if kind == "object":
+            self.values: Any = []
+        elif kind == "category":
+            self.values = array("I")
+        else:
+            self.values = array(ENCODINGS[kind][0])
+
+    @staticmethod
+    def build(values: Sequence[Any], present: Sequence[bool], category: bool) -> "Column":
+        live = [value for value, is_present in zip(values, present) if is_present]
+        kind = "object"
+        if category and all(type(value) is str for value in live):
+            kind = "category"
+        else:
+            for candidate in DETECTION_ORDER:
+                encode = ENCODINGS[candidate][1]
+                if live and all(encode(value) is not None for value in live):
+                    kind = candidate
+                    break
+        column = Column(kind)
+        for value, is_present in zip(values, present):
+            column.append(value if is_present else None, is_present)
+        return column
+
+    def copy(self) -> "Column":
+        column = Column.__new__(Column)
+        column.kind = self.kind
+        column.categories = list(self.categories)
+        column.category_codes = dict(self.category_codes)
+        column.values = self.values[:]
+        return column
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def encode(self, value: Any) -> Optional[Any]:
+        if self.kind == "object":
+            return value
+        if self.kind == "category":
+            if type(value) is not str:
+                return None
+            code = self.category_codes.get(value)
+            if code is None:
+                code = len(self.categories)
+                self.categories.append(sys.intern(value))
+                self.category_codes[value] = code
+            return code
+        return ENCODINGS[self.kind][1](value)
+
+    def decode(self, stored: Any) -> Any:
+        if self.kind == "object":
+            return stored
+        if self.kind == "category":
+            return self.categories[stored]
+        return ENCODINGS[self.kind][2](stored)
+
+    def get(self, position: int) -> Any:
+        return self.decode(self.values[position])
+
+    def placeholder(self) -> Any:
+        return None if self.kind == "object" else 0
+
+    def append(self, value: Any, present: bool = True) -> None:
+        if not present:
+            self.values.append(self.placeholder())
+            return
+        stored = self.encode(value)
+        if stored is None and self.kind != "object":
+            self.to_object()
+            stored = value
+        self.values.append(stored)
+
+    def set(self, position: int, value: Any) -> None:
+        stored = self.encode(value)
+        if stored is None and self.kind != "object":
+            self.to_object()
+            stored = value
+        self.values[position] = stored
+
+    def to_object(self) -> None:
+        # Placeholders decode to arbitrary values, which are never read.
+        decoded = [self.decode(stored) for stored in self.values]
+        self.kind = "object"
+        self.values = decoded
+        self.categories = []
+        self.category_codes = {}
+
+
+class ColumnarTable(MutableMapping[str, Row]):
+    """A table stored column by column, with the read API of a dict of rows.
+
+    Rows are materialized as fresh dicts on access, with their keys in the
+    original order, so tools can use a `ColumnarTable` wherever they use a
+    table dict. Ids that are canonical integers in increasing order are kept
+    in an integer array and found by binary search; any other id switches
+    the table to a dict from id to position.
+    """
+
+    # Every access builds a new row dict (see `envs.serialization`).
+    materializes_rows = True
+
+    def __init__(
+        self, table: Optional[Dict[str, Row]] = None, categories: Iterable[str] = ()
+    ) -> None:
+        self.category_columns = frozenset(categories)
+        self.columns: Dict[str, Column] = {}
+        self.shapes: List[Tuple[str, ...]] = []
+        self.shape_codes: Dict[Tuple[str, ...], int] = {}
+        self.shape_ids = array("I")
+        self.int_keys: Optional[array] = array("q")
+        self.str_keys: List[str] = []
+        self.key_positions: Optional[Dict[str, int]] = None
+        self.live = 0
+        if table:
+            self._load(table)
+
+    def _load(self, table: Dict[str, Row]) -> None:
+        rows = list(table.values())
+        names: Dict[str, None] = {}
+        for row in rows:
+            for name in row:
+                names[name] = None
+        for name in names:
+            present = [name in row for row in rows]
+            values = [row.get(name) for row in rows]
+            self.columns[name] = Column.build(values, present, name in self.category_columns)
+        for row_id, row in table.items():
+            self._append_key(row_id)
+            self.shape_ids.append(self._shape_code(tuple(row)))
+            self.live += 1
+
+    def _shape_code(self, shape: Tuple[str, ...]) -> int:
+        code = self.shape_codes.get(shape)
+        if code is None:
+            code = len(self.shapes)
+            self.shapes.append(shape)
+            self.shape_codes[shape] = code
+        return code
+
+    def _append_key(self, row_id: str) -> None:
+        position = len(self.shape_ids)
+        if self.int_keys is not None:
+            if is_canonical_id(row_id) and (
+                not self.int_keys or int(row_id) > self.int_keys[-1]
+            ):
+                self.int_keys.append(int(row_id))
+                return
+            self._to_key_positions()
+        assert self.key_positions is not None
+        self.str_keys.append(row_id)
+        self.key_positions[row_id] = position
+
+    def _to_key_positions(self) -> None:
+        assert self.int_keys is not None
+        self.str_keys = [str(key) for key in self.int_keys]
+        self.key_positions = {
+            key: position
+            for position, key in enumerate(self.str_keys)
+            if self.shape_ids[position] != DELETED
+        }
+        self.int_keys = None
+
+    def _key(self, position: int) -> str:
+        if self.int_keys is not None:
+            return str(self.int_keys[position])
+        return self.str_keys[position]
+
+    def _find(self, row_id: Any) -> Optional[int]:
+        """Position of `row_id`, including deleted slots in integer mode."""
+        if self.key_positions is not None:
+            return self.key_positions.get(row_id)
+        assert self.int_keys is not None
+        if not is_canonical_id(row_id):
+            return None
+        key = int(row_id)
+        position = bisect_left(self.int_keys, key)
+        if position < len(self.int_keys) and self.int_keys[position] == key:
+            return position
+        return None
+
+    def _position(self, row_id: Any) -> Optional[int]:
+        position = self._find(row_id)
+        if position is None or self.shape_ids[position] == DELETED:
+            return None
+        return position
+
+    def _row(self, position: int) -> Row:
+        shape = self.shapes[self.shape_ids[position]]
+        columns = self.columns
+        return {name: columns[name].get(position) for name in shape}
+
+    def __getitem__(self, row_id: str) -> Row:
+        position = self._position(row_id)
+        if position is None:
+            raise KeyError(row_id)
+        return self._row(position)
+
+    def __contains__(self, row_id: object) -> bool:
+        return self._position(row_id) is not None
+
+    def __len__(self) -> int:
+        return self.live
+
+    def __iter__(self) -> Iterator[str]:
+        for position, shape_id in enumerate(self.shape_ids):
+            if shape_id != DELETED:
+                yield self._key(position)
+
+    def items(self) -> Iterator[Tuple[str, Row]]:  # type: ignore[override]
+        for position, shape_id in enumerate(self.shape_ids):
+            if shape_id != DELETED:
+                yield self._key(position), self._row(position)
+
+    def values(self) -> Iterator[Row]:  # type: ignore[override]
+        for position, shape_id in enumerate(self.shape_ids):
+            if shape_id != DELETED:
+                yield self._row(position)
+
+    def __setitem__(self, row_id: str, row: Row) -> None:
+        position = self._find(row_id)
+        if position is None:
+            self._append_key(row_id)
+            position = len(self.shape_ids)
+            self.shape_ids.append(DELETED)
+            for column in self.columns.values():
+                column.append(None, False)
+        if self.shape_ids[position] == DELETED:
+            self.live += 1
+        for name, value in row.items():
+            column = self.columns.get(name)
+            if column is None:
+                column = Column("object")
+                column.values = [None] * len(self.shape_ids)
+                self.columns[name] = column
+            column.set(position, value)
+        self.shape_ids[position] = self._shape_code(tuple(row))
+
+    def __delitem__(self, row_id: str) -> None:
+        position = self._position(row_id)
+        if position is None:
+            raise KeyError(row_id)
+        self.shape_ids[position] = DELETED
+        self.live -= 1
+        if self.key_positions is not None:
+            del self.key_positions[row_id]
+
+    def copy(self) -> "ColumnarTable":
+        table = ColumnarTable.__new__(ColumnarTable)
+        table.category_columns = self.category_columns
+        table.columns = {name: column.copy() for name, column in self.columns.items()}
+        table.shapes = list(self.shapes)
+        table.shape_codes = dict(self.shape_codes)
+        table.shape_ids = self.shape_ids[:]
+        table.int_keys = self.int_keys[:] if self.int_keys is not None else None
+        table.str_keys = list(self.str_keys)
+        table.key_positions = (
+            dict(self.key_positions) if self.key_positions is not None else None
+        )
+        table.live = self.live
+        return table
+
+    def scan(self, names: Sequence[str]) -> Iterator[Tuple[str, Row]]:
+        """Yields (row_id, row) for live rows, with only the columns in `names`.
+
+        Reads just those columns, so a scan that needs a few columns does not
+        pay for materializing whole rows. Columns a row lacks are left out.
+        """
+        wanted: Dict[int, List[Tuple[str, Column]]] = {}
+        for position, shape_id in enumerate(self.shape_ids):
+            if shape_id == DELETED:
+                continue
+            columns = wanted.get(shape_id)
+            if columns is None:
+                shape = self.shapes[shape_id]
+                columns = [(name, self.columns[name]) for name in names if name in shape]
+                wanted[shape_id] = columns
+            yield self._key(position), {name: column.get(position) for name, column in columns}
+
+    def column(self, name: str) -> List[Any]:
+        """Decoded values of one column, for the live rows that have it."""
+        column = self.columns.get(name)
+        if column is None:
+            return []
+        values = []
+        for position, shape_id in enumerate(self.shape_ids):
+            if shape_id != DELETED and name in self.shapes[shape_id]:
+                values.append(column.get(position))
+        return values
+
+    def raw_column(self, name: str) -> Tuple[Optional[Column], array]:
+        """The stored column and the shape ids, for vectorized scans.
+
+        Values at positions whose shape lacks the column, or whose shape id
+        is `DELETED`, are placeholders.
+        """
+        return self.columns.get(name), self.shape_ids
+
+
+def to_columnar(
+    data: Dict[str, Any], categories: Optional[Dict[str, Iterable[str]]] = None
+) -> Dict[str, Any]:
+    """Converts every dict-of-rows table of `data` to a `ColumnarTable`."""
+    categories = categories or {}
+    return {
+        table_name: ColumnarTable(table, categories.get(table_name, ()))
+        if isinstance(table, dict)
+        else table
+        for table_name, table in data.items()
+    }
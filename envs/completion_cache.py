@@ -0,0 +1,196 @@
+import enum
+import json
+import sqlite3
+import threading
+import time
+from hashlib import sha256
+from typing import Any, Dict, Optional
+
+DEFAULT_MAX_BYTES = 1 << 30
+# A hit only refreshes an entry's last use when the stored one is older than
+# this, and refreshes are written in batches of TOUCH_BATCH.
+TOUCH_INTERVAL = 60.0
+TOUCH_BATCH = 100
+
+
+class CacheMode(enum.Enum):
+    # Serve hits from the cache, call the model and record on a miss.
+    READ_WRITE = "read_write"
+    # Serve hits from the cache, fail on a miss. Never calls the model.
+    REPLAY = "replay"
+
+
+class CacheMissError(KeyError):
+    pass
+
+
+def completion_key(
+    model: Optional[str], provider: Optional[str], messages: Any, attempt: int = 0
+) -> str:
+    """Hashes a request. Retries of the same request pass their attempt
+    index, so that each one is cached as a sample of its own."""
+    request: Dict[str, Any] = {"model": model, "provider": provider, "messages": messages}
+    if attempt:
+        request["attempt"] = attempt
+    payload = json.dumps(request, sort_keys=True, default=str)
+    return sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CompletionCache(object):
+    """Content-addressed store of completion responses in a SQLite file.
+
+    Entries are keyed by model, provider, a hash of the messages and the
+    attempt index of retried requests. When the stored responses exceed
+    `max_bytes`, the least recently used ones are evicted. Their total size
+    is kept up to date by triggers, so a put does not scan the table, and
+    hits record their use in batches rather than with a write each.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        mode: CacheMode = CacheMode.READ_WRITE,
+    ) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.mode = CacheMode(mode)
+        self.lock = threading.Lock()
+        # Last uses not written yet, by key.
+        self.touched: Dict[str, float] = {}
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("BEGIN IMMEDIATE")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS completions (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                provider TEXT,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            )"""
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS completions_last_used ON completions (last_used)"
+        )
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS completions_size (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                total INTEGER NOT NULL
+            )"""
+        )
+        self.conn.execute(
+            """INSERT OR IGNORE INTO completions_size
+            SELECT 0, COALESCE(SUM(size), 0) FROM completions"""
+        )
+        self.conn.execute(
+            """CREATE TRIGGER IF NOT EXISTS completions_size_insert AFTER INSERT ON completions
+            BEGIN UPDATE completions_size SET total = total + NEW.size WHERE id = 0; END"""
+        )
+        self.conn.execute(
+            """CREATE TRIGGER IF NOT EXISTS completions_size_delete AFTER DELETE ON completions
+            BEGIN UPDATE completions_size SET total = total - OLD.size WHERE id = 0; END"""
+        )
+        self.conn.execute(
+            """CREATE TRIGGER IF NOT EXISTS completions_size_update AFTER UPDATE OF size ON completions
+            BEGIN UPDATE completions_size SET total = total + NEW.size - OLD.size WHERE id = 0; END"""
+        )
+        self.conn.commit()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT response, last_used FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            if now - row[1] >= TOUCH_INTERVAL:
+                self.touched[key] = now
+                if len(self.touched) >= TOUCH_BATCH:
+                    self._write_touched()
+                    self.conn.commit()
+        return json.loads(row[0])
+
+    def put(
+        self,
+        key: str,
+        response: Dict[str, Any],
+        model: Optional[str] = None,
+        provider: Optional[str] = None,
+    ) -> None:
+        encoded = json.dumps(response, default=str)
+        with self.lock:
+            self._write_touched()
+            # An upsert rather than INSERT OR REPLACE, whose implicit delete
+            # would not fire the size trigger.
+            self.conn.execute(
+                """INSERT INTO completions VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (key) DO UPDATE SET
+                    model = excluded.model,
+                    provider = excluded.provider,
+                    response = excluded.response,
+                    size = excluded.size,
+                    last_used = excluded.last_used""",
+                (key, model, provider, encoded, len(encoded), time.time()),
+            )
+            self._evict()
+            self.conn.commit()
+
+    def lookup(
+        self, model: Optional[str], provider: Optional[str], messages: Any, attempt: int = 0
+    ) -> Optional[Dict[str, Any]]:
+        response = self.get(completion_key(model, provider, messages, attempt))
+        if response is None and self.mode == CacheMode.REPLAY:
+            raise CacheMissError(
+                f"No cached completion for model {model} in replay mode"
+            )
+        return response
+
+    def record(
+        self,
+        model: Optional[str],
+        provider: Optional[str],
+        messages: Any,
+        response: Dict[str, Any],
+        attempt: int = 0,
+    ) -> None:
+        self.put(completion_key(model, provider, messages, attempt), response, model, provider)
+
+    def flush(self) -> None:
+        """Writes the last uses of recent hits."""
+        with self.lock:
+            self._write_touched()
+            self.conn.commit()
+
+    def close(self) -> None:
+        with self.lock:
+            self._write_touched()
+            self.conn.commit()
+            self.conn.close()
+
+    def _write_touched(self) -> None:
+        if self.touched:
+            self.conn.executemany(
+                "UPDATE completions SET last_used = ? WHERE key = ?",
+                [(last_used, key) for key, last_used in self.touched.items()],
+            )
+            self.touched = {}
+
+    def _evict(self) -> None:
+        (total,) = self.conn.execute(
+            "SELECT total FROM completions_size WHERE id = 0"
+        ).fetchone()
+        if total <= self.max_bytes:
+            return
+        cursor = self.conn.execute(
+            "SELECT key, size FROM completions ORDER BY last_used ASC"
+        )
+        evicted = []
+        for key, size in cursor:
+            if total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        self.conn.executemany("DELETE FROM completions WHERE key = ?", evicted)
@@ -0,0 +1,42 @@
+import os
+import tempfile
+from typing import Any, Callable
+
+
+def sync_directory(directory: str) -> None:
+    """Makes the entries of `directory` (e.g. a rename into it) durable.
+
+    A no-op where directories cannot be opened, as on Windows.
+    """
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def replace_file(
+    directory: str, path: str, write: Callable[[Any], None], binary: bool = False
+) -> None:
+    """Writes a file through a synced temporary file, then renames it over `path`.
+
+    The directory is synced after the rename, so once this returns the new
+    file survives a crash. `binary` opens the temporary file in binary mode.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb" if binary else "w") as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    sync_directory(directory)
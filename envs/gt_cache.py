@@ -0,0 +1,134 @@
+import argparse
+import inspect
+import json
+import importlib
+import os
+import tempfile
+import threading
+from hashlib import sha256
+from typing import Callable, Dict, Iterable, Optional, Type
+
+from envs.tool import Tool
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "envs", "gt_data_hashes.json"
+)
+
+# Bump whenever the way data hashes are computed changes.
+HASH_SCHEME = "merkle-row-sum-v1"
+
+# Modules whose code decides how ground-truth actions change the data.
+ENGINE_MODULES = [
+    "envs.clock",
+    "envs.columnar",
+    "envs.hashing",
+    "envs.query",
+    "envs.sequence",
+    "envs.serialization",
+    "envs.store",
+]
+
+
+def code_version(tools: Iterable[Type[Tool]]) -> str:
+    """Fingerprints the source of the tools and of the delta engine."""
+    module_names = sorted({tool.__module__ for tool in tools} | set(ENGINE_MODULES))
+    digest = sha256(HASH_SCHEME.encode("utf-8"))
+    for module_name in module_names:
+        digest.update(module_name.encode("utf-8"))
+        digest.update(inspect.getsource(importlib.import_module(module_name)).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class GroundTruthCache(object):
+    """Persistent map from a task key to the ground-truth data hash.
+
+    Keys are built by `Env.get_gt_cache_key` from the task index, the dataset
+    fingerprint and the tool-code version, so any change to the data or to
+    the tools invalidates old entries. Writes go through a temporary file
+    and are merged with entries written concurrently by other processes.
+    With `autosave=False`, nothing is written until `save` is called.
+    Without a `path` the cache only lives in memory.
+    """
+
+    def __init__(self, path: Optional[str] = None, autosave: bool = True) -> None:
+        self.path = path
+        self.autosave = autosave
+        self.entries: Dict[str, str] = {}
+        self.lock = threading.Lock()
+        if path is not None and os.path.exists(path):
+            self.entries = self._read()
+
+    def get(self, key: str) -> Optional[str]:
+        return self.entries.get(key)
+
+    def set(self, key: str, value: str) -> None:
+        with self.lock:
+            self.entries[key] = value
+            if self.autosave:
+                self._write()
+
+    def save(self) -> None:
+        with self.lock:
+            self._write()
+
+    def get_or_compute(self, key: str, compute: Callable[[], str]) -> str:
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def _read(self) -> Dict[str, str]:
+        assert self.path is not None
+        try:
+            with open(self.path) as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return entries if isinstance(entries, dict) else {}
+
+    def _write(self) -> None:
+        if self.path is None:
+            return
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self.path):
+            self.entries = {**self._read(), **self.entries}
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(self.entries, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+def main() -> None:
+    from envs import get_env
+
+    parser = argparse.ArgumentParser(
+        description="Precompute the ground-truth data hashes of a task split."
+    )
+    parser.add_argument("env", type=str, help="Environment name, e.g. 'retail'")
+    parser.add_argument("--task-split", type=str, default="test")
+    parser.add_argument("--cache-path", type=str, default=DEFAULT_CACHE_PATH)
+    args = parser.parse_args()
+
+    try:
+        env = get_env(
+            args.env,
+            user_strategy="human",
+            user_model="",
+            task_split=args.task_split,
+            task_index=0,
+        )
+    except IndexError:
+        print(f"The {args.task_split} split of {args.env} has no tasks")
+        return
+    env.gt_cache = GroundTruthCache(args.cache_path, autosave=False)
+    for task_index in range(len(env.tasks)):
+        gt_data_hash = env.get_gt_data_hash(task_index)
+        print(f"Task {task_index}: {gt_data_hash}")
+    env.gt_cache.save()
+    print(f"Cached {len(env.tasks)} ground-truth hashes in {args.cache_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+from hashlib import sha256
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Set, Tuple, Union
+
+ToHashable = Union[
+    str, int, float, Dict[str, "ToHashable"], List["ToHashable"], Set["ToHashable"]
+]
+Hashable = Union[str, int, float, Tuple["Hashable"], Tuple[Tuple[str, "Hashable"]]]
+
+MODULUS = 1 << 256
+
+
+def to_hashable(item: ToHashable) -> Hashable:
+    if isinstance(item, dict):
+        return tuple((key, to_hashable(value)) for key, value in sorted(item.items()))
+    elif isinstance(item, list):
+        return tuple(to_hashable(element) for element in item)
+    elif isinstance(item, set):
+        return tuple(sorted(to_hashable(element) for element in item))
+    else:
+        return item
+
+
+def consistent_hash(
+    value: Hashable,
+) -> str:
+    return sha256(str(value).encode("utf-8")).hexdigest()
+
+
+def row_digest(row_id: str, row: Any) -> int:
+    digest = sha256(str((row_id, to_hashable(row))).encode("utf-8")).digest()
+    return int.from_bytes(digest, "big")
+
+
+class DataHasher(object):
+    """Merkle-style hash of a dataset, maintained incrementally.
+
+    Each table hash is the sum (mod 2**256) of the digests of its rows, so
+    it is independent of row order and a row change only costs re-hashing
+    the old and the new version of that row. The root hash combines the
+    table hashes of the tables currently present.
+    """
+
+    def __init__(self, tables: Optional[Dict[str, Any]] = None) -> None:
+        self.table_sums: Dict[str, int] = {}
+        for table_name, table in (tables or {}).items():
+            self.table_sums[table_name] = self.sum_table(table)
+
+    @staticmethod
+    def sum_table(table: Any) -> int:
+        if not isinstance(table, Mapping):
+            return row_digest("", table)
+        # Read-only tables may carry the sum precomputed.
+        stored = getattr(table, "digest_sum", None)
+        if stored is not None:
+            return stored
+        total = 0
+        for row_id, row in table.items():
+            total += row_digest(row_id, row)
+        return total % MODULUS
+
+    def fork(self) -> "DataHasher":
+        hasher = DataHasher()
+        hasher.table_sums = dict(self.table_sums)
+        return hasher
+
+    def update_row(
+        self,
+        table_name: str,
+        row_id: str,
+        old: Optional[Dict[str, Any]],
+        new: Optional[Dict[str, Any]],
+    ) -> None:
+        total = self.table_sums.get(table_name, 0)
+        if old is not None:
+            total -= row_digest(row_id, old)
+        if new is not None:
+            total += row_digest(row_id, new)
+        self.table_sums[table_name] = total % MODULUS
+
+    def get_table_hash(self, table_name: str) -> str:
+        total = self.table_sums.get(table_name, 0)
+        return sha256(f"{table_name}:{total:064x}".encode("utf-8")).hexdigest()
+
+    def get_table_hashes(self, table_names: Iterable[str]) -> Dict[str, str]:
+        return {
+            table_name: self.get_table_hash(table_name)
+            for table_name in sorted(table_names)
+        }
+
+    def get_root_hash(self, table_names: Iterable[str]) -> str:
+        table_hashes = self.get_table_hashes(table_names)
+        combined = "\n".join(f"{name}:{value}" for name, value in table_hashes.items())
+        return sha256(combined.encode("utf-8")).hexdigest()
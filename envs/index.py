@@ -0,0 +1,262 @@
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple, Union
+
+Row = Dict[str, Any]
+# A column name, or a tuple of column names for a compound index.
+IndexKey = Union[str, Tuple[str, ...]]
+IndexColumns = Dict[str, Iterable[IndexKey]]
+
+
+def is_indexable(value: Any) -> bool:
+    try:
+        hash(value)
+    except TypeError:
+        return False
+    return True
+
+
+class HashIndex(object):
+    """Maps the value of a column (or a tuple of columns) to row ids.
+
+    Buckets are dicts used as insertion-ordered sets so that a bucket can be
+    copied cheaply and iterated deterministically.
+    """
+
+    def __init__(self, column: IndexKey) -> None:
+        self.column = column
+        self.buckets: Dict[Any, Dict[str, None]] = {}
+
+    def key(self, values: Dict[str, Any]) -> Any:
+        if isinstance(self.column, tuple):
+            return tuple(values.get(column) for column in self.column)
+        return values.get(self.column)
+
+    def covers(self, filters: Dict[str, Any]) -> bool:
+        if isinstance(self.column, tuple):
+            return all(column in filters for column in self.column)
+        return self.column in filters
+
+    def add(self, row_id: str, row: Row) -> None:
+        value = self.key(row)
+        if is_indexable(value):
+            self.buckets.setdefault(value, {})[row_id] = None
+
+    def remove(self, row_id: str, row: Row) -> None:
+        value = self.key(row)
+        if not is_indexable(value):
+            return
+        bucket = self.buckets.get(value)
+        if bucket is None:
+            return
+        bucket.pop(row_id, None)
+        if not bucket:
+            del self.buckets[value]
+
+    def get(self, value: Any) -> Dict[str, None]:
+        return self.buckets.get(value, {})
+
+    def copy(self) -> "HashIndex":
+        index = HashIndex(self.column)
+        index.buckets = {value: dict(ids) for value, ids in self.buckets.items()}
+        return index
+
+
+class TableIndex(object):
+    """All hash indexes of one table, plus the position of every row.
+
+    Positions follow the table's insertion order and let index lookups return
+    rows in the same order a linear scan would.
+    """
+
+    def __init__(self, table: Dict[str, Row], columns: Iterable[IndexKey]) -> None:
+        self.table = table
+        self.indexes = {column: HashIndex(column) for column in columns}
+        self.positions: Dict[str, int] = {}
+        self.next_position = 0
+        for row_id, row in table.items():
+            self.add(row_id, row)
+
+    def add(self, row_id: str, row: Row) -> None:
+        if row_id not in self.positions:
+            self.positions[row_id] = self.next_position
+            self.next_position += 1
+        for index in self.indexes.values():
+            index.add(row_id, row)
+
+    def remove(self, row_id: str, row: Row) -> None:
+        for index in self.indexes.values():
+            index.remove(row_id, row)
+
+    def copy(self, table: Dict[str, Row]) -> "TableIndex":
+        table_index = TableIndex.__new__(TableIndex)
+        table_index.table = table
+        table_index.indexes = {
+            column: index.copy() for column, index in self.indexes.items()
+        }
+        table_index.positions = dict(self.positions)
+        table_index.next_position = self.next_position
+        return table_index
+
+    def lookup(self, filters: Dict[str, Any]) -> Optional[List[str]]:
+        """Returns candidate row ids from the most selective usable index.
+
+        Returns None when no filter key is indexed, in which case the caller
+        has to fall back to a full scan.
+        """
+        best: Optional[Dict[str, None]] = None
+        for index in self.indexes.values():
+            if not index.covers(filters):
+                continue
+            value = index.key(filters)
+            if not is_indexable(value):
+                continue
+            bucket = index.get(value)
+            if best is None or len(bucket) < len(best):
+                best = bucket
+                if not best:
+                    break
+        if best is None:
+            return None
+        return sorted(best, key=self.positions.__getitem__)
+
+    def lookup_in(self, column: str, values: Iterable[Any]) -> Optional[List[str]]:
+        """Returns the ids of rows whose `column` is any of `values`.
+
+        Returns None when `column` has no single-column index.
+        """
+        index = self.indexes.get(column)
+        if index is None:
+            return None
+        row_ids: Dict[str, None] = {}
+        for value in values:
+            if is_indexable(value):
+                row_ids.update(index.get(value))
+        return sorted(row_ids, key=self.positions.__getitem__)
+
+
+class IndexManager(object):
+    """Lazily built hash indexes over the tables of an environment's data.
+
+    Indexes are only used to narrow down candidates; every candidate is still
+    checked against all filters, so a lookup returns exactly what a linear
+    scan would. Writers must report row changes through `update_row`. A table
+    object that was replaced wholesale is detected and re-indexed.
+    """
+
+    def __init__(self, data: Dict[str, Any], columns: Optional[IndexColumns] = None) -> None:
+        self.data = data
+        self.columns = {
+            table_name: tuple(table_columns)
+            for table_name, table_columns in (columns or {}).items()
+        }
+        self.tables: Dict[str, TableIndex] = {}
+
+    def get_table_index(self, table_name: str) -> Optional[TableIndex]:
+        columns = self.columns.get(table_name)
+        table = self.data.get(table_name)
+        if not columns or not isinstance(table, Mapping):
+            return None
+        table_index = self.tables.get(table_name)
+        if table_index is None or table_index.table is not table:
+            # Tables loaded with prebuilt indexes (see `envs.binary_snapshot`)
+            # provide their own.
+            build_index = getattr(table, "build_index", None)
+            if build_index is not None:
+                table_index = build_index(columns)
+            else:
+                table_index = TableIndex(table, columns)
+            self.tables[table_name] = table_index
+        return table_index
+
+    def build(self) -> None:
+        for table_name in self.columns:
+            self.get_table_index(table_name)
+
+    def fork(self, data: Dict[str, Any]) -> "IndexManager":
+        """Returns a manager for `data` sharing this manager's indexes.
+
+        `data` must hold the same table objects; a table has to be detached
+        before it is written to.
+        """
+        manager = IndexManager(data)
+        manager.columns = self.columns
+        manager.tables = dict(self.tables)
+        return manager
+
+    def detach(self, table_name: str, table: Dict[str, Row]) -> None:
+        """Gives a private copy of a shared table its own copy of the indexes."""
+        table_index = self.tables.get(table_name)
+        if table_index is not None:
+            self.tables[table_name] = table_index.copy(table)
+
+    def lookup(self, table_name: str, filters: Dict[str, Any]) -> Optional[List[str]]:
+        table_index = self.get_table_index(table_name)
+        if table_index is None:
+            return None
+        return table_index.lookup(filters)
+
+    def lookup_in(
+        self, table_name: str, column: str, values: Iterable[Any]
+    ) -> Optional[List[str]]:
+        table_index = self.get_table_index(table_name)
+        if table_index is None:
+            return None
+        return table_index.lookup_in(column, values)
+
+    def update_row(
+        self,
+        table_name: str,
+        row_id: str,
+        old: Optional[Row],
+        new: Optional[Row],
+    ) -> None:
+        table_index = self.tables.get(table_name)
+        if table_index is None or table_index.table is not self.data.get(table_name):
+            # Not built yet (or stale): it will be built from the table on next use.
+            self.tables.pop(table_name, None)
+            return
+        if old is not None:
+            table_index.remove(row_id, old)
+        if new is not None:
+            table_index.add(row_id, new)
+        else:
+            table_index.positions.pop(row_id, None)
+
+
+class IndexedData(dict):
+    """The `data` dict handed to tools, carrying an `IndexManager`.
+
+    `rows_scanned` counts the rows `find_records` examined, for instrumentation.
+    `page_limits` (an `envs.query.PageLimits`) bounds getter responses and
+    `serializer` (an `envs.serialization.Serializer`) encodes tool results
+    and `clock` (an `envs.clock.EpisodeClock`) dates the rows tools write;
+    None uses the defaults of those modules.
+    """
+
+    def __init__(self, data: Dict[str, Any], index_columns: Optional[IndexColumns] = None) -> None:
+        super().__init__(data)
+        self.indexes = IndexManager(self, index_columns)
+        self.rows_scanned = 0
+        self.page_limits: Optional[Any] = None
+        self.serializer: Optional[Any] = None
+        self.clock: Optional[Any] = None
+
+
+def find_records(
+    data: Dict[str, Any], table_name: str, filters: Dict[str, Any]
+) -> Iterator[Tuple[str, Row]]:
+    """Yields (row_id, row) for every row of a table matching all filters.
+
+    Uses the indexes attached to `data` when there are any, otherwise scans.
+    """
+    table = data.get(table_name, {})
+    indexes: Optional[IndexManager] = getattr(data, "indexes", None)
+    row_ids = indexes.lookup(table_name, filters) if indexes is not None else None
+    if row_ids is None:
+        rows: Iterable[Tuple[str, Row]] = table.items()
+    else:
+        rows = ((row_id, table[row_id]) for row_id in row_ids)
+    if isinstance(data, IndexedData):
+        data.rows_scanned += len(table) if row_ids is None else len(row_ids)
+    for row_id, row in rows:
+        if all(row.get(key) == value for key, value in filters.items()):
+            yield row_id, row
@@ -0,0 +1,243 @@
+import contextlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, Iterator, List, Optional
+
+
+class StepMetrics(object):
+    """What one `Env.step` cost. Filled in by `Instrumentation.end_step`."""
+
+    __slots__ = (
+        "action_name",
+        "source",
+        "start",
+        "wall_s",
+        "cpu_s",
+        "rows_scanned",
+        "rows_written",
+        "response_bytes",
+        "done",
+        "reward",
+        "thread_id",
+        "_cpu_start",
+        "_scanned_start",
+        "_written_start",
+    )
+
+    def __init__(self, action_name: str) -> None:
+        self.action_name = action_name
+        self.source: Optional[str] = None
+        self.start = 0.0
+        self.wall_s = 0.0
+        self.cpu_s = 0.0
+        self.rows_scanned = 0
+        self.rows_written = 0
+        self.response_bytes = 0
+        self.done = False
+        self.reward = 0.0
+        self.thread_id = threading.get_ident()
+        self._cpu_start = 0.0
+        self._scanned_start = 0
+        self._written_start = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__ if not name.startswith("_")}
+
+
+class Instrumentation(object):
+    """Hooks around `Env.step`; every hook is a no-op here.
+
+    Subclasses override `pre_step`, `post_step` and `on_phase`. An env with no
+    instrumentation (the default) skips all of this, so it costs nothing.
+    CPU time is measured for the calling thread only, so concurrent
+    episodes on other threads do not inflate it.
+    """
+
+    def pre_step(self, env: Any, action: Any) -> None:
+        pass
+
+    def post_step(self, env: Any, action: Any, response: Any, metrics: StepMetrics) -> None:
+        pass
+
+    def on_phase(self, name: str, start: float, duration: float) -> None:
+        pass
+
+    def begin_step(self, env: Any, action: Any) -> StepMetrics:
+        self.pre_step(env, action)
+        metrics = StepMetrics(action.name)
+        data = env.data
+        metrics._scanned_start = getattr(data, "rows_scanned", 0)
+        metrics._written_start = getattr(data, "rows_written", 0)
+        metrics._cpu_start = time.thread_time()
+        metrics.start = time.perf_counter()
+        return metrics
+
+    def end_step(self, env: Any, action: Any, response: Any, metrics: StepMetrics) -> None:
+        metrics.wall_s = time.perf_counter() - metrics.start
+        metrics.cpu_s = time.thread_time() - metrics._cpu_start
+        data = env.data
+        metrics.rows_scanned = getattr(data, "rows_scanned", 0) - metrics._scanned_start
+        metrics.rows_written = getattr(data, "rows_written", 0) - metrics._written_start
+        metrics.response_bytes = len(response.observation.encode("utf-8"))
+        metrics.source = response.info.source
+        metrics.done = response.done
+        metrics.reward = response.reward
+        self.post_step(env, action, response, metrics)
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.on_phase(name, start, time.perf_counter() - start)
+
+
+class ToolStats(object):
+    def __init__(self) -> None:
+        self.count = 0
+        self.wall_s = 0.0
+        self.cpu_s = 0.0
+        self.rows_scanned = 0
+        self.rows_written = 0
+        self.response_bytes = 0
+
+    def add(self, metrics: StepMetrics) -> None:
+        self.count += 1
+        self.wall_s += metrics.wall_s
+        self.cpu_s += metrics.cpu_s
+        self.rows_scanned += metrics.rows_scanned
+        self.rows_written += metrics.rows_written
+        self.response_bytes += metrics.response_bytes
+
+
+class Recorder(Instrumentation):
+    """Aggregates step metrics per action and keeps a timeline of events.
+
+    Timeline events past `max_events` are dropped (the aggregates still
+    count them). Export with `write_prometheus` or `write_chrome_trace`.
+    """
+
+    def __init__(self, max_events: int = 100_000) -> None:
+        self.max_events = max_events
+        self.lock = threading.Lock()
+        self.tools: Dict[str, ToolStats] = defaultdict(ToolStats)
+        self.phases: Dict[str, List[float]] = defaultdict(lambda: [0, 0.0])
+        self.steps: List[StepMetrics] = []
+        self.phase_events: List[Dict[str, Any]] = []
+        self.dropped_events = 0
+        self.origin = time.perf_counter()
+
+    def post_step(self, env: Any, action: Any, response: Any, metrics: StepMetrics) -> None:
+        with self.lock:
+            self.tools[metrics.action_name].add(metrics)
+            if len(self.steps) + len(self.phase_events) < self.max_events:
+                self.steps.append(metrics)
+            else:
+                self.dropped_events += 1
+
+    def on_phase(self, name: str, start: float, duration: float) -> None:
+        with self.lock:
+            totals = self.phases[name]
+            totals[0] += 1
+            totals[1] += duration
+            if len(self.steps) + len(self.phase_events) < self.max_events:
+                self.phase_events.append(
+                    {"name": name, "start": start, "duration": duration, "thread_id": threading.get_ident()}
+                )
+            else:
+                self.dropped_events += 1
+
+    def summary(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "tools": {name: dict(vars(stats)) for name, stats in self.tools.items()},
+                "phases": {
+                    name: {"count": count, "seconds": seconds}
+                    for name, (count, seconds) in self.phases.items()
+                },
+                "dropped_events": self.dropped_events,
+            }
+
+    def to_prometheus(self, prefix: str = "env") -> str:
+        """Renders the aggregates in the Prometheus text exposition format."""
+        counters = [
+            ("steps_total", "Steps per action.", "count"),
+            ("step_wall_seconds_total", "Wall time spent in steps.", "wall_s"),
+            ("step_cpu_seconds_total", "CPU time spent in steps.", "cpu_s"),
+            ("rows_scanned_total", "Rows examined by table lookups.", "rows_scanned"),
+            ("rows_written_total", "Rows written by tool deltas.", "rows_written"),
+            ("response_bytes_total", "Bytes of serialized observations.", "response_bytes"),
+        ]
+        lines: List[str] = []
+        with self.lock:
+            for name, help_text, attr in counters:
+                metric = f"{prefix}_{name}"
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} counter")
+                for action, stats in sorted(self.tools.items()):
+                    lines.append(f'{metric}{{action="{_escape(action)}"}} {getattr(stats, attr)}')
+            for name, help_text, index in [
+                ("phase_total", "Reward phases run.", 0),
+                ("phase_seconds_total", "Wall time spent in reward phases.", 1),
+            ]:
+                metric = f"{prefix}_{name}"
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} counter")
+                for phase, totals in sorted(self.phases.items()):
+                    lines.append(f'{metric}{{phase="{_escape(phase)}"}} {totals[index]}')
+        return "\n".join(lines) + "\n"
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """Renders the timeline as Chrome trace events (chrome://tracing, Perfetto)."""
+        pid = os.getpid()
+        events: List[Dict[str, Any]] = []
+        with self.lock:
+            for metrics in self.steps:
+                events.append(
+                    {
+                        "name": metrics.action_name,
+                        "cat": "step",
+                        "ph": "X",
+                        "ts": (metrics.start - self.origin) * 1e6,
+                        "dur": metrics.wall_s * 1e6,
+                        "pid": pid,
+                        "tid": metrics.thread_id,
+                        "args": metrics.to_dict(),
+                    }
+                )
+            for event in self.phase_events:
+                events.append(
+                    {
+                        "name": event["name"],
+                        "cat": "phase",
+                        "ph": "X",
+                        "ts": (event["start"] - self.origin) * 1e6,
+                        "dur": event["duration"] * 1e6,
+                        "pid": pid,
+                        "tid": event["thread_id"],
+                    }
+                )
+        events.sort(key=lambda event: event["ts"])
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_prometheus(self, path: str, prefix: str = "env") -> None:
+        _write_atomic(path, self.to_prometheus(prefix))
+
+    def write_chrome_trace(self, path: str) -> None:
+        _write_atomic(path, json.dumps(self.to_chrome_trace()))
+
+
+def _escape(label: str) -> str:
+    return label.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _write_atomic(path: str, content: str) -> None:
+    # Scrapers (node_exporter's textfile collector) must never see a partial file.
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
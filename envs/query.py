@@ -0,0 +1,501 @@
+import base64
+import binascii
+import heapq
+import itertools
+import json
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from envs.index import IndexedData, IndexManager, Row, find_records
+from envs.serialization import Serializer, get_serializer, record_with_id
+
+# Shared by the inputs of every getter that runs a query.
+QUERY_INPUTS: Dict[str, Any] = {
+    "order_by": {
+        "type": "array",
+        "description": "Columns to sort by, prefixed with '-' for descending (e.g., ['-order_date']). Rows missing a column sort last.",
+    },
+    "limit": {"type": "integer", "description": "Maximum number of records to return"},
+    "offset": {"type": "integer", "description": "Number of matching records to skip"},
+    "fields": {
+        "type": "array",
+        "description": "Columns to return for each record (default: all)",
+    },
+    "cursor": {
+        "type": "string",
+        "description": "The next_cursor of a previous response, to fetch the following page. The filters, order_by, limit and fields of that search are reused.",
+    },
+}
+
+# Bounds of `PageLimits()`. Responses are only paged when the data carries `page_limits`.
+DEFAULT_PAGE_SIZE = 100
+DEFAULT_MAX_RESPONSE_BYTES = 64 * 1024
+
+FILTERS_DESCRIPTION = (
+    "A value matches exactly; an object of operators matches a condition: "
+    "$eq, $ne, $gt, $gte, $lt, $lte, $in (a list) and $prefix "
+    "(e.g., {'order_date': {'$gte': '2025-06-01'}, 'status': {'$in': ['placed', 'processing']}})"
+)
+
+
+class QueryError(ValueError):
+    pass
+
+
+class PageLimits(object):
+    """Bounds on one getter response; None disables a bound.
+
+    A page ends after `max_page_size` records, or before the record that
+    would take the serialized records past `max_response_bytes` (a page
+    always holds at least one record). The response then carries a
+    `next_cursor` to resume from. Environments page getter responses only
+    when given limits (`Env(page_limits=PageLimits())`).
+    """
+
+    def __init__(
+        self,
+        max_page_size: Optional[int] = DEFAULT_PAGE_SIZE,
+        max_response_bytes: Optional[int] = DEFAULT_MAX_RESPONSE_BYTES,
+    ) -> None:
+        self.max_page_size = max_page_size
+        self.max_response_bytes = max_response_bytes
+
+
+UNLIMITED = PageLimits(None, None)
+
+
+def _prefix(value: Any, operand: Any) -> bool:
+    return isinstance(value, str) and value.startswith(operand)
+
+
+OPERATORS: Dict[str, Callable[[Any, Any], bool]] = {
+    "$eq": lambda value, operand: value == operand,
+    "$ne": lambda value, operand: value != operand,
+    "$gt": lambda value, operand: value > operand,
+    "$gte": lambda value, operand: value >= operand,
+    "$lt": lambda value, operand: value < operand,
+    "$lte": lambda value, operand: value <= operand,
+    "$in": lambda value, operand: value in operand,
+    "$prefix": _prefix,
+}
+Predicate = Tuple[str, str, Any]
+
+
+def is_operator_filter(value: Any) -> bool:
+    return isinstance(value, dict) and bool(value) and all(
+        isinstance(key, str) and key.startswith("$") for key in value
+    )
+
+
+class Query(object):
+    """Filters of a getter, split into exact matches and operator predicates.
+
+    A filter value that is a dict whose keys all start with "$" is a set of
+    operators on that column; any other value must be equal. Exact matches
+    and `$in` lists are answered from the hash indexes when the column is
+    indexed; every candidate is still checked against all predicates.
+    """
+
+    def __init__(self, filters: Optional[Dict[str, Any]]) -> None:
+        if filters is None:
+            filters = {}
+        if not isinstance(filters, dict):
+            raise QueryError("filters must be an object")
+        self.equal: Dict[str, Any] = {}
+        self.in_lists: Dict[str, List[Any]] = {}
+        self.predicates: List[Predicate] = []
+        for column, value in filters.items():
+            if not is_operator_filter(value):
+                self.equal[column] = value
+                continue
+            for op, operand in value.items():
+                if op not in OPERATORS:
+                    raise QueryError(f"Unknown operator {op} on {column}")
+                if op == "$eq":
+                    self.equal[column] = operand
+                    continue
+                if op == "$in":
+                    if not isinstance(operand, list):
+                        raise QueryError(f"$in on {column} needs a list")
+                    self.in_lists[column] = operand
+                elif op == "$prefix" and not isinstance(operand, str):
+                    raise QueryError(f"$prefix on {column} needs a string")
+                self.predicates.append((column, op, operand))
+
+    def matches(self, row: Row) -> bool:
+        for column, value in self.equal.items():
+            if row.get(column) != value:
+                return False
+        # A missing column, or a value that does not compare with the
+        # operand, only satisfies $ne.
+        for column, op, operand in self.predicates:
+            if column not in row:
+                if op != "$ne":
+                    return False
+                continue
+            try:
+                if not OPERATORS[op](row[column], operand):
+                    return False
+            except TypeError:
+                return False
+        return True
+
+    def candidates(self, data: Dict[str, Any], table_name: str) -> Optional[List[str]]:
+        """Row ids from the most selective usable index, or None to scan."""
+        indexes: Optional[IndexManager] = getattr(data, "indexes", None)
+        if indexes is None:
+            return None
+        best = indexes.lookup(table_name, self.equal) if self.equal else None
+        for column, values in self.in_lists.items():
+            if best is not None and len(best) <= len(values):
+                break
+            row_ids = indexes.lookup_in(table_name, column, values)
+            if row_ids is not None and (best is None or len(row_ids) < len(best)):
+                best = row_ids
+        return best
+
+    def iter_records(self, data: Dict[str, Any], table_name: str) -> Iterator[Tuple[str, Row]]:
+        table = data.get(table_name, {})
+        row_ids = self.candidates(data, table_name)
+        if row_ids is None:
+            rows: Iterable[Tuple[str, Row]] = table.items()
+        else:
+            rows = ((row_id, table[row_id]) for row_id in row_ids)
+        if isinstance(data, IndexedData):
+            data.rows_scanned += len(table) if row_ids is None else len(row_ids)
+        for row_id, row in rows:
+            if self.matches(row):
+                yield row_id, row
+
+
+OrderBy = Union[str, List[str], None]
+
+
+def parse_order_by(order_by: OrderBy) -> List[Tuple[str, bool]]:
+    """Returns (column, descending) pairs."""
+    if order_by is None:
+        return []
+    if isinstance(order_by, str):
+        order_by = [order_by]
+    if not isinstance(order_by, list) or not all(
+        isinstance(column, str) and column.lstrip("-") for column in order_by
+    ):
+        raise QueryError("order_by must be a column name or a list of column names")
+    return [(column.lstrip("-"), column.startswith("-")) for column in order_by]
+
+
+def _sort_key(column: str, descending: bool, id_column: str) -> Callable[[Tuple[str, Row]], Any]:
+    # Missing values sort last in both directions.
+    def key(record: Tuple[str, Row]) -> Any:
+        row_id, row = record
+        value = row_id if column == id_column and column not in row else row.get(column)
+        return (value is not None, value) if descending else (value is None, value)
+
+    return key
+
+
+def order_records(
+    records: Iterable[Tuple[str, Row]],
+    order: List[Tuple[str, bool]],
+    id_column: str,
+    keep: Optional[int] = None,
+) -> List[Tuple[str, Row]]:
+    """Sorts records stably; with `keep`, only the first `keep` are kept.
+
+    A single sort direction uses a bounded heap, so memory stays
+    proportional to `keep` rather than to the number of matches.
+    """
+    try:
+        if len({descending for _, descending in order}) == 1:
+            keys = [_sort_key(column, descending, id_column) for column, descending in order]
+
+            def key(record: Tuple[str, Row]) -> Tuple[Any, ...]:
+                return tuple(column_key(record) for column_key in keys)
+
+            descending = order[0][1]
+            if keep is None:
+                return sorted(records, key=key, reverse=descending)
+            select = heapq.nlargest if descending else heapq.nsmallest
+            return select(keep, records, key=key)
+        ordered = list(records)
+        for column, descending in reversed(order):
+            ordered.sort(key=_sort_key(column, descending, id_column), reverse=descending)
+        return ordered if keep is None else ordered[:keep]
+    except TypeError:
+        columns = ", ".join(column for column, _ in order)
+        raise QueryError(f"Cannot order by {columns}: values of different types")
+
+
+def query_records(
+    data: Dict[str, Any],
+    table_name: str,
+    filters: Optional[Dict[str, Any]],
+    order_by: OrderBy = None,
+    limit: Optional[int] = None,
+    offset: Optional[int] = None,
+    id_column: str = "",
+) -> List[Tuple[str, Row]]:
+    """Returns (row_id, row) for the rows matching `filters`, in query order.
+
+    Without `order_by`, rows come in table order, and a `limit` stops the
+    scan as soon as enough rows matched. `id_column` names the column that
+    holds the row id, which rows may omit.
+    """
+    if limit is not None and (type(limit) is not int or limit < 0):
+        raise QueryError("limit must be a non-negative integer")
+    if offset is None:
+        offset = 0
+    if type(offset) is not int or offset < 0:
+        raise QueryError("offset must be a non-negative integer")
+    order = parse_order_by(order_by)
+    records = Query(filters).iter_records(data, table_name)
+    stop = None if limit is None else offset + limit
+    if order:
+        return order_records(records, order, id_column, stop)[offset:]
+    return list(itertools.islice(records, offset, stop))
+
+
+def select_fields(record: Row, fields: Optional[List[str]]) -> Row:
+    if fields is None:
+        return record
+    if not isinstance(fields, list):
+        raise QueryError("fields must be a list of column names")
+    return {field: record[field] for field in fields if field in record}
+
+
+def encode_cursor(state: Dict[str, Any]) -> str:
+    payload = json.dumps(state, sort_keys=True, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: Any, table_name: str) -> Dict[str, Any]:
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (AttributeError, UnicodeError, binascii.Error, ValueError):
+        raise QueryError("Invalid cursor")
+    if not isinstance(state, dict) or state.get("table") != table_name:
+        raise QueryError("Invalid cursor")
+    return state
+
+
+def _id_key(row_id: str) -> Tuple[int, int, str]:
+    # Numeric ids in numeric order, before any other id.
+    return (0, len(row_id), row_id) if row_id.isdigit() else (1, 0, row_id)
+
+
+class Position(object):
+    """Where a record sits in the order of a paged search.
+
+    Records are ordered by the `order_by` columns, missing values last as in
+    `order_records`, then by row id, so every record has a distinct position
+    and a page can resume after the last record of the previous one.
+    """
+
+    __slots__ = ("order", "values", "row_id")
+
+    def __init__(self, order: List[Tuple[str, bool]], values: List[Any], row_id: str) -> None:
+        self.order = order
+        self.values = values
+        self.row_id = row_id
+
+    @classmethod
+    def of(cls, record: Tuple[str, Row], order: List[Tuple[str, bool]], id_column: str) -> "Position":
+        row_id, row = record
+        values = [
+            row_id if column == id_column and column not in row else row.get(column)
+            for column, _ in order
+        ]
+        return cls(order, values, row_id)
+
+    def __lt__(self, other: "Position") -> bool:
+        for (_, descending), value, other_value in zip(self.order, self.values, other.values):
+            if value == other_value:
+                continue
+            if value is None or other_value is None:
+                return other_value is None
+            return other_value < value if descending else value < other_value
+        return _id_key(self.row_id) < _id_key(other.row_id)
+
+
+class Page(object):
+    """One page of a getter response, with its records already serialized.
+
+    `count` is the number of records of the whole search, which is more
+    than the page holds when a `next_cursor` follows.
+    """
+
+    def __init__(
+        self,
+        serializer: Serializer,
+        encoded: List[str],
+        next_cursor: Optional[str],
+        count: Optional[int] = None,
+    ) -> None:
+        self.serializer = serializer
+        self.encoded = encoded
+        self.next_cursor = next_cursor
+        self.count = len(encoded) if count is None else count
+
+    def render(self, result_key: str) -> str:
+        """The response, byte for byte what the serializer gives for the same dict."""
+        dumps = self.serializer.dumps
+        item = self.serializer.item_separator
+        key = self.serializer.key_separator
+        parts = [
+            "{",
+            dumps("success"), key, dumps(True), item,
+            dumps("count"), key, str(self.count), item,
+            dumps(result_key), key, "[", item.join(self.encoded), "]",
+        ]
+        if self.next_cursor is not None:
+            parts.extend([item, dumps("next_cursor"), key, dumps(self.next_cursor)])
+        parts.append("}")
+        return "".join(parts)
+
+
+def search_page(
+    data: Dict[str, Any],
+    table_name: str,
+    id_column: str,
+    filters: Optional[Dict[str, Any]] = None,
+    order_by: OrderBy = None,
+    limit: Optional[int] = None,
+    offset: Optional[int] = None,
+    fields: Optional[List[str]] = None,
+    cursor: Optional[str] = None,
+    overwrite_id: bool = False,
+    make_record: Optional[Callable[[str, Row], Row]] = None,
+) -> Page:
+    """Runs a getter query and serializes its records.
+
+    Each record is the row with its id in `id_column` (see
+    `record_with_id`), or whatever `make_record` builds from the row id and
+    row, e.g. a row with related records embedded.
+
+    Without `page_limits` on the data every record is returned, in query
+    order. With them, records are ordered by `Position`, only the rows of
+    the page (plus one, to tell whether more follow) are kept, and records
+    are serialized one at a time so the byte budget stops the page without
+    encoding the rest. The cursor is self-contained: it carries the query,
+    the position of the last record returned and the search's count, so the
+    next page starts right after that record however many came before it,
+    and rows inserted meanwhile do not shift it.
+    """
+    limits: PageLimits = getattr(data, "page_limits", None) or UNLIMITED
+    serializer = get_serializer(data)
+    table = data.get(table_name)
+
+    def encode(row_id: str, row: Row) -> str:
+        if make_record is not None:
+            return serializer.dumps(select_fields(make_record(row_id, row), fields))
+        if fields is None:
+            return serializer.encode_record(table, table_name, row_id, row, id_column, overwrite_id)
+        record = record_with_id(row_id, row, id_column, overwrite_id)
+        return serializer.dumps(select_fields(record, fields))
+
+    paged = limits.max_page_size is not None or limits.max_response_bytes is not None
+    if cursor is None and not paged:
+        records = query_records(data, table_name, filters, order_by, limit, offset, id_column)
+        return Page(serializer, [encode(row_id, row) for row_id, row in records], None)
+
+    after: Optional[Position] = None
+    total: Optional[int] = None
+    if cursor is not None:
+        state = decode_cursor(cursor, table_name)
+        filters, order_by, fields = state.get("filters"), state.get("order_by"), state.get("fields")
+        limit, total = state.get("limit"), state.get("count")
+        values, row_id = state.get("after"), state.get("after_id")
+        if not isinstance(values, list) or not isinstance(row_id, str) or type(total) is not int:
+            raise QueryError("Invalid cursor")
+        offset = 0
+    if limit is not None and (type(limit) is not int or limit < 0):
+        raise QueryError("limit must be a non-negative integer")
+    if offset is None:
+        offset = 0
+    if type(offset) is not int or offset < 0:
+        raise QueryError("offset must be a non-negative integer")
+    order = parse_order_by(order_by)
+    if cursor is not None:
+        if len(values) != len(order):
+            raise QueryError("Invalid cursor")
+        after = Position(order, values, row_id)
+
+    page_size = limit
+    if limits.max_page_size is not None and (page_size is None or page_size > limits.max_page_size):
+        page_size = limits.max_page_size
+    matched = 0
+
+    def positioned() -> Iterator[Tuple[Position, Tuple[str, Row]]]:
+        nonlocal matched
+        for record in Query(filters).iter_records(data, table_name):
+            position = Position.of(record, order, id_column)
+            if after is None or after < position:
+                matched += 1
+                yield position, record
+
+    def by_position(item: Tuple[Position, Tuple[str, Row]]) -> Position:
+        return item[0]
+
+    try:
+        if page_size is None:
+            ordered = sorted(positioned(), key=by_position)
+        else:
+            ordered = heapq.nsmallest(offset + page_size + 1, positioned(), key=by_position)
+    except TypeError:
+        columns = ", ".join(column for column, _ in order)
+        raise QueryError(f"Cannot order by {columns}: values of different types")
+    window = ordered[offset:]
+    if total is None:
+        total = max(0, matched - offset)
+        if limit is not None:
+            total = min(total, limit)
+
+    budget = limits.max_response_bytes
+    encoded: List[str] = []
+    size = 0
+    for _, (row_id, row) in window[:page_size]:
+        text = encode(row_id, row)
+        size += len(text) + len(serializer.item_separator)
+        if budget is not None and encoded and size > budget:
+            break
+        encoded.append(text)
+
+    returned = len(encoded)
+    remaining = None if limit is None else limit - returned
+    next_cursor = None
+    if 0 < returned < len(window) and remaining != 0:
+        last = window[returned - 1][0]
+        next_cursor = encode_cursor(
+            {
+                "table": table_name,
+                "filters": filters,
+                "order_by": order_by,
+                "fields": fields,
+                "after": last.values,
+                "after_id": last.row_id,
+                "limit": remaining,
+                "count": total,
+            }
+        )
+    return Page(serializer, encoded, next_cursor, total)
+
+
+def get_record(data: Dict[str, Any], table_name: str, row_id: Any, id_column: str) -> Optional[Row]:
+    """The row a foreign key points at, with its id, or None."""
+    table = data.get(table_name, {})
+    if not isinstance(row_id, str) or row_id not in table:
+        return None
+    return record_with_id(row_id, table[row_id], id_column)
+
+
+def related_records(
+    data: Dict[str, Any], table_name: str, foreign_key: str, value: Any, id_column: str
+) -> List[Row]:
+    """The rows of `table_name` whose `foreign_key` equals `value`, with their ids.
+
+    With an index on `foreign_key` (see the environment's index columns)
+    this is a hash lookup rather than a scan.
+    """
+    return [
+        record_with_id(row_id, row, id_column)
+        for row_id, row in find_records(data, table_name, {foreign_key: value})
+    ]
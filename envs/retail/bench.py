@@ -0,0 +1,405 @@
+"""Benchmarks the retail environment over generated datasets.
+
+    python -m envs.retail.bench --scales 1 10 100 --output bench.json
+    python -m envs.retail.bench --scales 1 10 100 --baseline bench.json
+
+Datasets are generated with `envs.retail.seeding` and cached by seed and
+scale. For each scale the suite times every tool of `ALL_TOOLS_INTERFACE_1`
+(through `Env.invoke_tool`, so delta application is included), `reset`,
+`step`, `get_data_hash` and `calculate_reward`, and the throughput of whole
+episodes that replay a task against the scripted (offline) user. Results are
+written as JSON and can be compared against a previous run.
+"""
+import argparse
+import functools
+import json
+import os
+import platform
+import random
+import sys
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from envs.base import Env
+from envs.binary_snapshot import load_json_tables
+from envs.gt_cache import GroundTruthCache
+from envs.retail.data import INDEXES
+from envs.retail.inventory import VIEWS
+from envs.retail.rules import RULES
+from envs.retail.seeding import TABLES, generate
+from envs.retail.tools import ALL_TOOLS_INTERFACE_1
+from envs.snapshot import load_snapshot
+from envs.user import UserStrategy
+from types import Action, Task, RESPOND_ACTION_NAME
+
+DEFAULT_DATA_DIR = os.path.expanduser("~/.cache/envs/bench")
+DEFAULT_SCALES = [1.0, 10.0, 100.0]
+DEFAULT_THRESHOLD = 1.25
+# Cases whose p50 is below this are too noisy to flag as regressions.
+MIN_COMPARABLE_US = 5.0
+
+Stats = Dict[str, float]
+
+
+def measure(fn: Callable[[], Any], iterations: int, warmup: int = 3) -> Stats:
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+    return {
+        "n": len(samples),
+        "mean_us": sum(samples) / len(samples),
+        "p50_us": samples[len(samples) // 2],
+        "p95_us": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        "min_us": samples[0],
+    }
+
+
+def ensure_dataset(data_dir: str, scale: float, seed: int) -> str:
+    path = os.path.join(data_dir, f"seed{seed}-scale{scale:g}")
+    if not all(os.path.exists(os.path.join(path, f"{table}.json")) for table in TABLES):
+        print(f"Generating dataset at scale {scale:g} into {path}...")
+        generate(output_dir=path, scale=scale, seed=seed, num_workers=os.cpu_count() or 1)
+    return path
+
+
+# One loader per directory, so that the process-wide snapshot is loaded once.
+_loaders: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+
+def get_loader(path: str) -> Callable[[], Dict[str, Any]]:
+    if path not in _loaders:
+        _loaders[path] = functools.partial(load_json_tables, path)
+    return _loaders[path]
+
+
+def tool_cases(data: Dict[str, Any], rng: random.Random) -> List[Tuple[str, Action]]:
+    """One or more representative calls of every interface tool."""
+
+    def pick(table_name: str) -> Dict[str, Any]:
+        table = data[table_name]
+        return table[str(rng.randint(1, len(table)))]
+
+    user = pick("users")
+    supplier = pick("suppliers")
+    product = pick("products")
+    purchase_order = pick("purchase_orders")
+    sales_order = pick("sales_orders")
+    shipment = pick("shipping")
+    cases = [
+        ("check_approval", {"action": "force_cancel", "requester_email": user["email"]}),
+        (
+            "create_new_audit_trail",
+            {"action": "bench", "details": {"scale": True}, "user_email": user["email"]},
+        ),
+        ("discover_users[email]", {"filters": {"email": user["email"]}}),
+        ("discover_users[scan]", {"filters": {"last_name": user["last_name"]}}),
+        (
+            "manage_users",
+            {"action": "update", "user_id": user["user_id"], "changes": {"city": "Bench"}},
+        ),
+        ("discover_suppliers[id]", {"filters": {"supplier_id": supplier["supplier_id"]}}),
+        ("discover_suppliers[scan]", {"filters": {"name": supplier["name"]}}),
+        (
+            "manage_suppliers",
+            {"action": "update", "supplier_id": supplier["supplier_id"], "supplier_name": "Bench"},
+        ),
+        (
+            "manage_products",
+            {
+                "action": "create",
+                "name": "Bench",
+                "supplier_id": supplier["supplier_id"],
+                "unit_price": 10.0,
+            },
+        ),
+        (
+            "discover_purchase_orders[supplier]",
+            {"filters": {"supplier_id": purchase_order["supplier_id"]}},
+        ),
+        (
+            "manage_purchase_orders",
+            {
+                "action": "add_item",
+                "purchase_order_id": purchase_order["purchase_order_id"],
+                "product_id": product["product_id"],
+                "quantity": 1,
+            },
+        ),
+        (
+            "manage_purchase_orders[bulk_add_items]",
+            {
+                "action": "bulk_add_items",
+                "purchase_order_id": purchase_order["purchase_order_id"],
+                "items": [{"product_id": product["product_id"], "quantity": n} for n in range(1, 11)],
+            },
+        ),
+        ("discover_sales_orders[user]", {"filters": {"user_id": sales_order["user_id"]}}),
+        ("discover_sales_orders[status]", {"filters": {"status": "delivered"}}),
+        (
+            "manage_sales_orders",
+            {
+                "action": "update",
+                "sales_order_id": sales_order["sales_order_id"],
+                "status": "processing",
+            },
+        ),
+        ("discover_shipping[order]", {"filters": {"sales_order_id": shipment["sales_order_id"]}}),
+        (
+            "discover_sales_order_items[order]",
+            {"filters": {"sales_order_id": sales_order["sales_order_id"]}},
+        ),
+        (
+            "discover_purchase_order_items[product]",
+            {"filters": {"product_id": product["product_id"]}},
+        ),
+        (
+            "get_sales_order_details[user]",
+            {"filters": {"user_id": sales_order["user_id"]}},
+        ),
+        (
+            "get_purchase_order_details[id]",
+            {"filters": {"purchase_order_id": purchase_order["purchase_order_id"]}},
+        ),
+        (
+            "aggregate_records[revenue]",
+            {
+                "table": "sales_order_items",
+                "joins": ["sales_orders", "products"],
+                "group_by": ["sales_orders.payment_method"],
+                "metrics": [
+                    {"op": "sum", "column": "quantity", "times": "products.unit_price", "as": "revenue"}
+                ],
+            },
+        ),
+        (
+            "aggregate_records[units_by_product]",
+            {
+                "table": "sales_order_items",
+                "joins": ["sales_orders"],
+                "filters": {"sales_orders.user_id": sales_order["user_id"]},
+                "group_by": ["product_id"],
+                "metrics": [{"op": "sum", "column": "quantity"}],
+            },
+        ),
+        (
+            "manage_sales_orders[bulk_update]",
+            {
+                "action": "bulk_update",
+                "sales_order_ids": [str(n) for n in range(1, min(10, len(data["sales_orders"])) + 1)],
+                "status": "processing",
+            },
+        ),
+        (
+            "manage_shipping[bulk_create]",
+            {
+                "action": "bulk_create",
+                "sales_order_ids": [sales_order["sales_order_id"]] * 10,
+                "method": "Standard",
+            },
+        ),
+        (
+            "get_inventory[product]",
+            {"product_id": product["product_id"]},
+        ),
+        (
+            "manage_shipping",
+            {"action": "create", "sales_order_id": sales_order["sales_order_id"], "method": "Standard"},
+        ),
+    ]
+    return [(name, Action(name=name.split("[")[0], kwargs=kwargs)) for name, kwargs in cases]
+
+
+def build_tasks(cases: List[Tuple[str, Action]], num_tasks: int, rng: random.Random) -> List[Task]:
+    """Episodes of a few tool calls followed by a reply to the user."""
+    tasks = []
+    for task_index in range(num_tasks):
+        actions = [action for _, action in rng.sample(cases, min(5, len(cases)))]
+        actions.append(Action(name=RESPOND_ACTION_NAME, kwargs={"content": "Done."}))
+        tasks.append(
+            Task(
+                user_id="bench",
+                actions=actions,
+                instruction=f"Benchmark task {task_index}",
+                outputs=[],
+            )
+        )
+    return tasks
+
+
+def make_env(path: str, tasks: List[Task]) -> Env:
+    return Env(
+        data_load_func=get_loader(path),
+        tools=ALL_TOOLS_INTERFACE_1,
+        tasks=tasks,
+        wiki="",
+        rules=RULES,
+        user_strategy=UserStrategy.SCRIPTED,
+        user_model="",
+        task_index=0,
+        index_columns=INDEXES,
+        views=VIEWS,
+        gt_cache=GroundTruthCache(None),
+    )
+
+
+def run_episode(env: Env, task_index: int) -> float:
+    env.reset(task_index=task_index)
+    for action in env.task.actions:
+        response = env.step(action)
+        if response.done:
+            return response.reward
+    return env.calculate_reward().reward
+
+
+def bench_scale(
+    path: str,
+    seed: int,
+    iterations: int,
+    num_episodes: int,
+) -> Dict[str, Stats]:
+    rng = random.Random(seed)
+    load_start = time.perf_counter()
+    snapshot = load_snapshot(get_loader(path), INDEXES)
+    results: Dict[str, Stats] = {
+        "snapshot_load": {"n": 1, "mean_us": (time.perf_counter() - load_start) * 1e6}
+    }
+    cases = tool_cases(snapshot.tables, rng)
+    tasks = build_tasks(cases, max(1, num_episodes), rng)
+    env = make_env(path, tasks)
+
+    for name, action in cases:
+        env.reset(task_index=0)
+        results[f"tool:{name}"] = measure(
+            lambda: env.invoke_tool(env.data, action), iterations
+        )
+
+    counter = iter(range(sys.maxsize))
+    results["reset"] = measure(
+        lambda: env.reset(task_index=next(counter) % len(tasks)), iterations
+    )
+    env.reset(task_index=0)
+    step_action = cases[0][1]
+    results["step"] = measure(lambda: env.step(step_action), iterations)
+    # A write first, so that the hash reflects a modified table.
+    env.step(cases[-1][1])
+    results["get_data_hash"] = measure(env.get_data_hash, iterations)
+    results["calculate_reward[cold]"] = measure(
+        lambda: env.compute_gt_data_hash(env.task_index), max(1, iterations // 10), 1
+    )
+    env.calculate_reward()
+    results["calculate_reward[cached]"] = measure(env.calculate_reward, iterations)
+
+    start = time.perf_counter()
+    rewards = [run_episode(env, task_index) for task_index in range(num_episodes)]
+    elapsed = time.perf_counter() - start
+    results["episodes"] = {
+        "n": num_episodes,
+        "mean_us": elapsed / max(1, num_episodes) * 1e6,
+        "episodes_per_s": num_episodes / elapsed if elapsed > 0 else 0.0,
+        "mean_reward": sum(rewards) / max(1, len(rewards)),
+    }
+    return results
+
+
+def run(
+    scales: List[float],
+    seed: int = 0,
+    iterations: int = 200,
+    num_episodes: int = 200,
+    data_dir: str = DEFAULT_DATA_DIR,
+) -> Dict[str, Any]:
+    report: Dict[str, Any] = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.time(),
+            "seed": seed,
+            "iterations": iterations,
+            "num_episodes": num_episodes,
+        },
+        "results": {},
+    }
+    for scale in scales:
+        path = ensure_dataset(data_dir, scale, seed)
+        print(f"Benchmarking scale {scale:g}...")
+        report["results"][f"scale={scale:g}"] = bench_scale(
+            path, seed, iterations, num_episodes
+        )
+    return report
+
+
+def compare(
+    report: Dict[str, Any], baseline: Dict[str, Any], threshold: float = DEFAULT_THRESHOLD
+) -> List[str]:
+    """Returns a line per case that got slower than `threshold` times the baseline."""
+    regressions = []
+    for scale, cases in report["results"].items():
+        for name, stats in cases.items():
+            old = baseline.get("results", {}).get(scale, {}).get(name)
+            if old is None:
+                continue
+            key = "p50_us" if "p50_us" in stats and "p50_us" in old else "mean_us"
+            if old[key] < MIN_COMPARABLE_US:
+                continue
+            ratio = stats[key] / old[key]
+            if ratio > threshold:
+                regressions.append(
+                    f"{scale} {name}: {old[key]:.1f}us -> {stats[key]:.1f}us ({ratio:.2f}x)"
+                )
+    return regressions
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    for scale, cases in report["results"].items():
+        print(f"\n{scale}")
+        for name, stats in cases.items():
+            extra = ""
+            if "episodes_per_s" in stats:
+                extra = f"  {stats['episodes_per_s']:.1f} episodes/s"
+            p50 = stats.get("p50_us", stats["mean_us"])
+            p95 = stats.get("p95_us", stats["mean_us"])
+            print(f"  {name:<40} p50 {p50:>10.1f}us  p95 {p95:>10.1f}us{extra}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the retail environment.")
+    parser.add_argument("--scales", type=float, nargs="+", default=DEFAULT_SCALES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--num-episodes", type=int, default=200)
+    parser.add_argument("--data-dir", type=str, default=DEFAULT_DATA_DIR)
+    parser.add_argument("--output", type=str, default=None, help="Write results as JSON")
+    parser.add_argument("--baseline", type=str, default=None, help="Compare against a previous --output")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args()
+
+    report = run(
+        scales=args.scales,
+        seed=args.seed,
+        iterations=args.iterations,
+        num_episodes=args.num_episodes,
+        data_dir=args.data_dir,
+    )
+    print_report(report)
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold}x:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("\nNo regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
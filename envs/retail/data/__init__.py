@@ -2,7 +2,47 @@ import json
 import os
 from typing import Any
 
+from envs.binary_snapshot import open_snapshot
+from envs.columnar import to_columnar
+
 FOLDER_PATH = os.path.dirname(__file__)
+# Built from the JSON files with
+#   python -m envs.binary_snapshot to-binary envs/retail/data envs/retail/data/retail.snap --env retail
+BINARY_SNAPSHOT_PATH = os.path.join(FOLDER_PATH, "retail.snap")
+
+# Columns with a hash index, per table: primary keys plus the foreign-key and
+# lookup columns the discover tools filter on.
+INDEXES = {
+    "users": ["user_id", "email"],
+    "suppliers": ["supplier_id"],
+    "products": ["product_id", "supplier_id"],
+    "purchase_orders": ["purchase_order_id", "supplier_id", "status"],
+    "purchase_order_items": ["po_item_id", "purchase_order_id", "product_id"],
+    "sales_orders": ["sales_order_id", "user_id", "status"],
+    "sales_order_items": ["so_item_id", "sales_order_id", "product_id"],
+    "shipping": ["shipping_id", "sales_order_id", "tracking_number", "status"],
+    "approvals": [("requester_email", "action")],
+}
+
+# Many-to-one relationships created by `seeding.py`, per table: referenced
+# table -> foreign-key column. Used by the aggregate getters to join tables.
+FOREIGN_KEYS = {
+    "products": {"suppliers": "supplier_id"},
+    "purchase_orders": {"suppliers": "supplier_id"},
+    "purchase_order_items": {"purchase_orders": "purchase_order_id", "products": "product_id"},
+    "sales_orders": {"users": "user_id"},
+    "sales_order_items": {"sales_orders": "sales_order_id", "products": "product_id"},
+    "shipping": {"sales_orders": "sales_order_id"},
+}
+
+# Low-cardinality string columns the columnar backend stores as interned
+# categories.
+CATEGORIES = {
+    "users": ["role"],
+    "purchase_orders": ["status"],
+    "sales_orders": ["status", "payment_method"],
+    "shipping": ["status", "method"],
+}
 
 
 def load_data() -> dict[str, Any]:
@@ -12,4 +52,14 @@ def load_data() -> dict[str, Any]:
             key = filename[:-5]  # Remove .json extension
             with open(os.path.join(FOLDER_PATH, filename)) as f:
                 data[key] = json.load(f)
-    return data
\ No newline at end of file
+    return data
+
+
+def load_columnar_data() -> dict[str, Any]:
+    """Loads the same tables as `load_data`, stored column by column."""
+    return to_columnar(load_data(), CATEGORIES)
+
+
+def load_binary_data() -> dict[str, Any]:
+    """Maps the binary snapshot of the JSON files; nothing is parsed."""
+    return open_snapshot(BINARY_SNAPSHOT_PATH)
\ No newline at end of file
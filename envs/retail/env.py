@@ -1,10 +1,16 @@
-from envs.retail.data import load_data
+from envs.retail.data import (
+    INDEXES,
+    load_binary_data,
+    load_columnar_data,
+    load_data,
+)
+from envs.retail.inventory import VIEWS
 from envs.retail.rules import RULES
 from envs.retail.tools import (
     ALL_TOOLS_INTERFACE_1,
 )
 from envs.base import Env
-from typing import Optional, Union
+from typing import Optional, Sequence, Tuple, Union
 from envs.user import UserStrategy
 import os
 
@@ -17,7 +23,11 @@ class MockRetailDomainEnv(Env):
         user_provider: Optional[str] = None,
         task_split: str = "test",
         task_index: Optional[int] = None,
-        interface_num: Optional[int] = 2,  # Default to Interface 2 (Retail Ops)
+        interface_num: Optional[int] = 1,  # Default to Interface 1 (Retail Ops)
+        data_backend: str = "dict",
+        user_rules: Optional[Sequence[Tuple[str, str]]] = None,
+        user_latency: float = 0.0,
+        durable_dir: Optional[str] = None,
     ):
         match task_split:
             case "test":
@@ -35,17 +45,29 @@ class MockRetailDomainEnv(Env):
         # Load policy (System Prompt) based on interface_num
         folder_path = os.path.dirname(__file__)
         match interface_num:
-            case 2:
+            case 1:
                 # Loads the 'Retail Operations' policy we wrote in Step 1
-                policy_path = os.path.join(folder_path, "policy.txt")
+                policy_path = os.path.join(
+                    folder_path, "tools", "interface_1", "policy.md"
+                )
             case _:
                 raise ValueError(f"Unknown interface_num: {interface_num}")
         
+        match data_backend:
+            case "dict":
+                data_load_func = load_data
+            case "columnar":
+                data_load_func = load_columnar_data
+            case "binary":
+                data_load_func = load_binary_data
+            case _:
+                raise ValueError(f"Unknown data_backend: {data_backend}")
+
         with open(policy_path, "r") as f:
             wiki = f.read()
         
         super().__init__(
-            data_load_func=load_data,
+            data_load_func=data_load_func,
             tools=tools,
             tasks=tasks,
             wiki=wiki,
@@ -54,5 +76,10 @@ class MockRetailDomainEnv(Env):
             user_model=user_model,
             user_provider=user_provider,
             task_index=task_index,
+            index_columns=INDEXES,
+            views=VIEWS,
+            user_rules=user_rules,
+            user_latency=user_latency,
+            durable_dir=durable_dir,
         )
         self.terminate_tools = ["transfer_to_human"]
\ No newline at end of file
@@ -0,0 +1,188 @@
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from envs.index import find_records
+from envs.store import DataStore, MaterializedView, RowChange
+
+RECEIVED_STATUSES = frozenset(["received"])
+SHIPPED_STATUSES = frozenset(["shipped", "delivered"])
+RESERVED_STATUSES = frozenset(["placed", "processing"])
+
+# What an order contributes: ("received" | "shipped" | "reserved", {product_id: units}).
+Contribution = Tuple[str, Dict[str, int]]
+OrderKey = Tuple[str, str]  # ("po" | "so", order id)
+COLUMNS = ("received", "shipped", "reserved")
+NO_CONTRIBUTION: Contribution = ("", {})
+
+
+def sales_order_state(order: Optional[Dict[str, Any]], shipment_statuses: Iterable[Any]) -> str:
+    """ "shipped", "reserved" or "" (cancelled, returned or unknown orders hold no stock)."""
+    if order is None:
+        return ""
+    status = order.get("status")
+    if status in ("cancelled", "returned"):
+        return ""
+    if status in SHIPPED_STATUSES or any(s in SHIPPED_STATUSES for s in shipment_statuses):
+        return "shipped"
+    if status in RESERVED_STATUSES:
+        return "reserved"
+    return ""
+
+
+def _add_units(units: Dict[str, int], item: Dict[str, Any]) -> None:
+    product_id = item.get("product_id")
+    quantity = item.get("quantity")
+    if isinstance(product_id, str) and type(quantity) is int:
+        units[product_id] = units.get(product_id, 0) + quantity
+
+
+class InventoryView(MaterializedView):
+    """Units on hand per product: received minus shipped, less what is reserved.
+
+    - received: items of purchase orders whose status is "received".
+    - shipped: items of sales orders that are shipped or delivered, or that
+      have a shipment in one of those states.
+    - reserved: items of placed or processing sales orders not shipped yet.
+
+    Built with one pass over the order, item and shipping tables. Each
+    commit recomputes only the orders its changes touch (found through the
+    foreign-key indexes) and adjusts the per-product totals by the
+    difference, so reading a product's stock is a dict lookup.
+    """
+
+    def __init__(self, tables: Dict[str, Any]) -> None:
+        self.store: Optional[DataStore] = None
+        self.base_totals: Dict[str, List[int]] = {}
+        self.base_contributions: Dict[OrderKey, Contribution] = {}
+        # A fork's own changes, over the base state.
+        self.totals: Dict[str, List[int]] = {}
+        self.contributions: Dict[OrderKey, Contribution] = {}
+
+        po_units: Dict[str, Dict[str, int]] = {}
+        for item in tables.get("purchase_order_items", {}).values():
+            _add_units(po_units.setdefault(item.get("purchase_order_id"), {}), item)
+        for po_id, order in tables.get("purchase_orders", {}).items():
+            if order.get("status") in RECEIVED_STATUSES and po_id in po_units:
+                self._set_base(("po", po_id), ("received", po_units[po_id]))
+
+        shipment_statuses: Dict[str, List[Any]] = {}
+        for shipment in tables.get("shipping", {}).values():
+            shipment_statuses.setdefault(shipment.get("sales_order_id"), []).append(
+                shipment.get("status")
+            )
+        so_units: Dict[str, Dict[str, int]] = {}
+        for item in tables.get("sales_order_items", {}).values():
+            _add_units(so_units.setdefault(item.get("sales_order_id"), {}), item)
+        for so_id, order in tables.get("sales_orders", {}).items():
+            state = sales_order_state(order, shipment_statuses.get(so_id, ()))
+            if state and so_id in so_units:
+                self._set_base(("so", so_id), (state, so_units[so_id]))
+
+    def _set_base(self, key: OrderKey, contribution: Contribution) -> None:
+        self.base_contributions[key] = contribution
+        column = COLUMNS.index(contribution[0])
+        for product_id, units in contribution[1].items():
+            self.base_totals.setdefault(product_id, [0, 0, 0])[column] += units
+
+    def fork(self, store: DataStore) -> "InventoryView":
+        view = InventoryView.__new__(InventoryView)
+        view.store = store
+        view.base_totals = self.base_totals
+        view.base_contributions = self.base_contributions
+        view.totals = {}
+        view.contributions = {}
+        return view
+
+    def get(self, product_id: str) -> Dict[str, int]:
+        received, shipped, reserved = self.base_totals.get(product_id, (0, 0, 0))
+        delta = self.totals.get(product_id)
+        if delta is not None:
+            received += delta[0]
+            shipped += delta[1]
+            reserved += delta[2]
+        return {
+            "received": received,
+            "shipped": shipped,
+            "reserved": reserved,
+            "on_hand": received - shipped,
+            "available": received - shipped - reserved,
+        }
+
+    def on_commit(self, changes: List[RowChange]) -> None:
+        dirty: Set[OrderKey] = set()
+        for change in changes:
+            if change.table_name == "purchase_orders":
+                dirty.add(("po", change.row_id))
+            elif change.table_name == "sales_orders":
+                dirty.add(("so", change.row_id))
+            else:
+                parent = {
+                    "purchase_order_items": ("po", "purchase_order_id"),
+                    "sales_order_items": ("so", "sales_order_id"),
+                    "shipping": ("so", "sales_order_id"),
+                }.get(change.table_name)
+                if parent is None:
+                    continue
+                kind, column = parent
+                for row in (change.old, change.new):
+                    if row is not None and isinstance(row.get(column), str):
+                        dirty.add((kind, row[column]))
+        for key in dirty:
+            self._update(key)
+
+    def _contribution(self, key: OrderKey) -> Contribution:
+        if key in self.contributions:
+            return self.contributions[key]
+        return self.base_contributions.get(key, NO_CONTRIBUTION)
+
+    def _compute(self, key: OrderKey) -> Contribution:
+        data = self.store
+        assert data is not None
+        kind, order_id = key
+        units: Dict[str, int] = {}
+        if kind == "po":
+            order = data.get("purchase_orders", {}).get(order_id)
+            if order is None or order.get("status") not in RECEIVED_STATUSES:
+                return NO_CONTRIBUTION
+            state = "received"
+            items = find_records(data, "purchase_order_items", {"purchase_order_id": order_id})
+        else:
+            order = data.get("sales_orders", {}).get(order_id)
+            statuses = [
+                shipment.get("status")
+                for _, shipment in find_records(data, "shipping", {"sales_order_id": order_id})
+            ]
+            state = sales_order_state(order, statuses)
+            if not state:
+                return NO_CONTRIBUTION
+            items = find_records(data, "sales_order_items", {"sales_order_id": order_id})
+        for _, item in items:
+            _add_units(units, item)
+        return (state, units)
+
+    def _update(self, key: OrderKey) -> None:
+        old = self._contribution(key)
+        new = self._compute(key)
+        if old == new:
+            return
+        for (state, units), sign in ((old, -1), (new, 1)):
+            if not state:
+                continue
+            column = COLUMNS.index(state)
+            for product_id, quantity in units.items():
+                self.totals.setdefault(product_id, [0, 0, 0])[column] += sign * quantity
+        self.contributions[key] = new
+
+
+def get_inventory_view(data: Dict[str, Any]) -> InventoryView:
+    """The inventory view attached to `data`, building one if there is none."""
+    if getattr(data, "views", None) is None:
+        return InventoryView(data)
+    view = data.get_view("inventory")
+    if view is None:
+        view = InventoryView(data)
+        view.store = data  # type: ignore[assignment]
+        data.attach_view("inventory", view)
+    return view
+
+
+VIEWS = {"inventory": InventoryView}
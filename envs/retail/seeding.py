@@ -1,277 +1,448 @@
+"""Generates the retail dataset as one JSON file per table.
+
+    python -m envs.retail.seeding --scale 1000 --seed 42 --output-dir /tmp/retail
+
+Scale 1 gives the small dataset checked into `envs/retail/data`. Every
+entity draws from its own RNG, seeded from the seed, its table and its id.
+Row contents therefore do not depend on generation order, and each table
+can be generated in its own process. A table only re-derives the few
+per-parent counts it needs to number its ids. Rows are streamed to disk in
+chunks, so memory stays flat at any scale.
+"""
+import argparse
+import datetime
 import json
-import random
+import multiprocessing
 import os
-import datetime
-from faker import Faker
+import random
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
-fake = Faker()
-Faker.seed(42)
-random.seed(42)
+from faker import Faker
 
-# Constants
+# Constants (rows at scale factor 1)
 NUM_SUPPLIERS = 10
-NUM_USERS = 15 
-DOMAIN_DIR = "envs/retail" 
+NUM_USERS = 15
+DOMAIN_DIR = "envs/retail"
 DATA_DIR = f"{DOMAIN_DIR}/data"
+# Relative dates ("-2y", "today") are taken from this instant, not the clock,
+# so that a seed always reproduces the same data.
+DEFAULT_NOW = datetime.datetime(2026, 1, 1)
+CHUNK_SIZE = 10_000
 
-os.makedirs(DATA_DIR, exist_ok=True)
+PRODUCT_CATEGORIES = ["Electronics", "Home", "Clothing", "Sports", "Toys"]
+STAFF_ROLES = ["Store Manager", "Fulfillment Specialist"]
+EMAIL_DOMAINS = ["gmail.com", "yahoo.com", "outlook.com", "retail-store.com", "provider.net"]
+PO_STATUSES = ["pending", "received", "cancelled"]
+SO_STATUSES = ["placed", "processing", "shipped", "delivered", "cancelled", "returned"]
+SHIPPED_STATUSES = ["shipped", "delivered", "returned"]
+PAYMENT_METHODS = ["Credit Card", "PayPal", "Debit"]
+CANCEL_REASONS = ["Changed mind", "Found cheaper", "Wait too long"]
 
+Row = Dict[str, Any]
 
-def get_id(n):
+
+def get_id(n: int) -> str:
     """Constraint 3 & 17: IDs must be strings, incremental, starting from '1'."""
     return str(n)
 
-def get_timestamps():
+
+def get_timestamps(fake: Faker, now: datetime.datetime) -> Tuple[str, str]:
     """Constraint 10: created_at < updated_at."""
-    created = fake.date_time_between(start_date="-2y", end_date="-1m")
-    updated = fake.date_time_between(start_date=created, end_date="now")
+    created = fake.date_time_between(
+        start_date=now - datetime.timedelta(days=730),
+        end_date=now - datetime.timedelta(days=30),
+    )
+    updated = fake.date_time_between(start_date=created, end_date=now)
     return created.isoformat(), updated.isoformat()
 
-def generate_realistic_email(first_name, last_name):
+
+def generate_realistic_email(rng: random.Random, first_name: str, last_name: str) -> str:
     """Constraint 12: Realistic emails with domains and random numbers."""
-    domains = ["gmail.com", "yahoo.com", "outlook.com", "retail-store.com", "provider.net"]
-    domain = random.choice(domains)
-    separator = random.choice(["", ".", "_", "-"])
-    number = str(random.randint(1, 999)) if random.random() > 0.5 else ""
-    email = f"{first_name.lower()}{separator}{last_name.lower()}{number}@{domain}"
-    return email
-
-def generate_phone():
+    domain = rng.choice(EMAIL_DOMAINS)
+    separator = rng.choice(["", ".", "_", "-"])
+    number = str(rng.randint(1, 999)) if rng.random() > 0.5 else ""
+    return f"{first_name.lower()}{separator}{last_name.lower()}{number}@{domain}"
+
+
+def generate_phone(rng: random.Random) -> str:
     """Constraint 13: Consistent phone format."""
-    area_code = random.randint(200, 999)
-    part1 = random.randint(200, 999)
-    part2 = random.randint(1000, 9999)
+    area_code = rng.randint(200, 999)
+    part1 = rng.randint(200, 999)
+    part2 = rng.randint(1000, 9999)
     return f"({area_code}) {part1}-{part2}"
 
 
-print("Generating Suppliers...")
-suppliers = {}
-for i in range(1, NUM_SUPPLIERS + 1):
-    s_id = get_id(i)
-    created, updated = get_timestamps()
-    suppliers[s_id] = {
-        "supplier_id": s_id,
-        "name": fake.company(),
-        "contact_email": fake.company_email(),
-        "address": fake.street_address(),
-        "city": fake.city(),
-        "state": fake.state_abbr(),
-        "zip_code": fake.zipcode(),
-        "country": "USA",
-        "created_at": created,
-        "updated_at": updated
-    }
-
-with open(f"{DATA_DIR}/suppliers.json", "w") as f:
-    json.dump(suppliers, f, indent=2)
-
-
-print("Generating Products...")
-products = {}
-product_counter = 1
-categories = ["Electronics", "Home", "Clothing", "Sports", "Toys"]
-
-# Constraint 1: Loop through Suppliers (Parents) to ensure max 3 products per supplier
-for s_id in suppliers:
-    # 0 to 3 products per supplier
-    num_products = random.randint(1, 3) 
-    
-    for _ in range(num_products):
-        p_id = get_id(product_counter)
-        product_counter += 1
-        created, updated = get_timestamps()
-        
-        # Constraint 5: Description can be empty (free-form)
-        description = fake.sentence() if random.random() > 0.2 else ""
-        
-        products[p_id] = {
-            "product_id": p_id,
-            "name": f"{random.choice(categories)} {fake.word().capitalize()}",
-            "description": description,
-            "supplier_id": s_id,  # Constraint 8: Valid FK
-            "unit_price": round(random.uniform(10.0, 500.0), 2),
-            "created_at": created,
-            "updated_at": updated
-        }
+class RetailGenerator(object):
+    """Deterministic row generators for every retail table.
 
-with open(f"{DATA_DIR}/products.json", "w") as f:
-    json.dump(products, f, indent=2)
-
-
-print("Generating Users...")
-users = {}
-staff_roles = ["Store Manager", "Fulfillment Specialist"]
-for i in range(1, NUM_USERS + 1):
-    u_id = get_id(i)
-    created, updated = get_timestamps()
-    first = fake.first_name()
-    last = fake.last_name()
-    
-    if i <= len(staff_roles):
-        role = staff_roles[i-1]
-        email = generate_realistic_email(first, last)
-    else:
-        role = "customer"
-        email = generate_realistic_email(first, last)
-
-    users[u_id] = {
-        "user_id": u_id,
-        "first_name": first,
-        "last_name": last,
-        "email": email,
-        "role": role, 
-        "address": fake.street_address(),
-        "city": fake.city(),
-        "state": fake.state_abbr(),
-        "zip_code": fake.zipcode(),
-        "country": "USA",
-        "created_at": created,
-        "updated_at": updated
-    }
-
-with open(f"{DATA_DIR}/users.json", "w") as f:
-    json.dump(users, f, indent=2)
-
-
-print("Generating Purchase Orders & Items...")
-purchase_orders = {}
-po_items = {}
-po_counter = 1
-po_item_counter = 1
-
-# Constraint 1: Loop through Suppliers (Parents) -> Max 3 POs per supplier
-for s_id in suppliers:
-    num_pos = random.randint(0, 3)
-    
-    for _ in range(num_pos):
-        po_id = get_id(po_counter)
-        po_counter += 1
-        created, updated = get_timestamps()
-        
-        purchase_orders[po_id] = {
-            "purchase_order_id": po_id,
-            "supplier_id": s_id,
-            "order_date": fake.date_between(start_date="-1y", end_date="today").isoformat(),
-            "status": random.choice(["pending", "received", "cancelled"]),
-            "created_at": created,
-            "updated_at": updated
-        }
-        
-        # Items for this PO (Constraint 1: Max 3 items)
-        num_items = random.randint(1, 3)
-        # Find products belonging to THIS supplier (Constraint 7: Coherence)
-        # Only select products from the current supplier to make sense
-        supplier_products = [p for p in products.values() if p["supplier_id"] == s_id]
-        
-        if not supplier_products:
-            continue # Skip adding items if supplier has no products
-            
-        for _ in range(num_items):
-            poi_id = get_id(po_item_counter)
-            po_item_counter += 1
-            
-            prod = random.choice(supplier_products)
-            
-            po_items[poi_id] = {
-                "po_item_id": poi_id,
-                "purchase_order_id": po_id,
-                "product_id": prod["product_id"],
-                "quantity": random.randint(10, 100),
-                "unit_cost": round(prod["unit_price"] * 0.7, 2), 
-                "created_at": created, 
-                "updated_at": updated
+    Each `<table>` method yields `(id, row)` pairs in id order. The
+    `*_count` helpers draw only the number of children of a parent, which
+    is what lets a child table number its ids without materializing the
+    parent table.
+    """
+
+    def __init__(
+        self,
+        scale: float = 1.0,
+        seed: int = 42,
+        now: datetime.datetime = DEFAULT_NOW,
+    ) -> None:
+        self.seed = seed
+        self.now = now
+        self.today = now.date()
+        self.num_suppliers = max(1, round(NUM_SUPPLIERS * scale))
+        self.num_users = max(len(STAFF_ROLES) + 1, round(NUM_USERS * scale))
+        self.fake = Faker()
+        self._cached_user: Optional[Tuple[str, Row]] = None
+
+    def rng(self, kind: str, index: int) -> random.Random:
+        return random.Random(f"{self.seed}:{kind}:{index}")
+
+    def entity(self, kind: str, index: int) -> random.Random:
+        """Seeds the shared Faker for one entity and returns its RNG."""
+        key = f"{self.seed}:{kind}:{index}"
+        self.fake.seed_instance(key)
+        return random.Random(key)
+
+    def timestamps(self, kind: str, index: int) -> Tuple[str, str]:
+        # Children reuse the timestamps of their parent, so they get their own stream.
+        self.fake.seed_instance(f"{self.seed}:{kind}_timestamps:{index}")
+        return get_timestamps(self.fake, self.now)
+
+    def date_between(self, start_days: int, end_days: int) -> str:
+        return self.fake.date_between(
+            start_date=self.today + datetime.timedelta(days=start_days),
+            end_date=self.today + datetime.timedelta(days=end_days),
+        ).isoformat()
+
+    # Per-parent counts
+
+    def products_count(self, supplier: int) -> int:
+        # Constraint 1: 1 to 3 products per supplier
+        return self.rng("supplier_products", supplier).randint(1, 3)
+
+    def purchase_orders_count(self, supplier: int) -> int:
+        # Constraint 1: Max 3 POs per supplier
+        return self.rng("supplier_purchase_orders", supplier).randint(0, 3)
+
+    def purchase_order_items_count(self, purchase_order: int) -> int:
+        # Constraint 1: Max 3 items
+        return self.rng("purchase_order_items", purchase_order).randint(1, 3)
+
+    def sales_orders_count(self, user: int) -> int:
+        if not self.is_customer(user):
+            return 0  # Only customers make orders
+        # Constraint 1: Max 3 SOs per user
+        return self.rng("user_sales_orders", user).randint(0, 3)
+
+    def sales_order_items_count(self, sales_order: int) -> int:
+        # Constraint 1: Max 3 items
+        return self.rng("sales_order_items", sales_order).randint(1, 3)
+
+    def sales_order_status(self, sales_order: int) -> str:
+        return self.rng("sales_order_status", sales_order).choice(SO_STATUSES)
+
+    def is_customer(self, user: int) -> bool:
+        return user > len(STAFF_ROLES)
+
+    def num_products(self) -> int:
+        return sum(self.products_count(s) for s in range(1, self.num_suppliers + 1))
+
+    def unit_price(self, product: int) -> float:
+        return round(self.rng("product_price", product).uniform(10.0, 500.0), 2)
+
+    # Walks over the parent hierarchy, drawing counts only
+
+    def iter_products(self) -> Iterator[Tuple[int, int]]:
+        """Yields (product, supplier)."""
+        product = 1
+        for supplier in range(1, self.num_suppliers + 1):
+            for _ in range(self.products_count(supplier)):
+                yield product, supplier
+                product += 1
+
+    def iter_purchase_orders(self) -> Iterator[Tuple[int, int, int, int]]:
+        """Yields (purchase order, supplier, first product, product count)."""
+        purchase_order = 1
+        first_product = 1
+        for supplier in range(1, self.num_suppliers + 1):
+            num_products = self.products_count(supplier)
+            for _ in range(self.purchase_orders_count(supplier)):
+                yield purchase_order, supplier, first_product, num_products
+                purchase_order += 1
+            first_product += num_products
+
+    def iter_sales_orders(self) -> Iterator[Tuple[int, int]]:
+        """Yields (sales order, user)."""
+        sales_order = 1
+        for user in range(1, self.num_users + 1):
+            for _ in range(self.sales_orders_count(user)):
+                yield sales_order, user
+                sales_order += 1
+
+    # Tables
+
+    def suppliers(self) -> Iterator[Tuple[str, Row]]:
+        for i in range(1, self.num_suppliers + 1):
+            s_id = get_id(i)
+            self.entity("supplier", i)
+            created, updated = self.timestamps("supplier", i)
+            yield s_id, {
+                "supplier_id": s_id,
+                "name": self.fake.company(),
+                "contact_email": self.fake.company_email(),
+                "address": self.fake.street_address(),
+                "city": self.fake.city(),
+                "state": self.fake.state_abbr(),
+                "zip_code": self.fake.zipcode(),
+                "country": "USA",
+                "created_at": created,
+                "updated_at": updated,
             }
 
-with open(f"{DATA_DIR}/purchase_orders.json", "w") as f:
-    json.dump(purchase_orders, f, indent=2)
-with open(f"{DATA_DIR}/purchase_order_items.json", "w") as f:
-    json.dump(po_items, f, indent=2)
-
-
-print("Generating Sales Orders, Items & Shipping...")
-sales_orders = {}
-so_items = {}
-shipping = {}
-so_counter = 1
-so_item_counter = 1
-shipping_counter = 1
-
-all_product_ids = list(products.keys())
-
-# Constraint 1: Loop through Users -> Max 3 SOs per user
-for u_id, u_data in users.items():
-    if u_data['role'] != "customer":
-        continue # Only customers make orders
-        
-    num_sos = random.randint(0, 3)
-    
-    for _ in range(num_sos):
-        so_id = get_id(so_counter)
-        so_counter += 1
-        created, updated = get_timestamps()
-        status = random.choice(["placed", "processing", "shipped", "delivered", "cancelled", "returned"])
-        
-        # Constraint 5: cancel_reason is free-form, can be empty
-        cancel_reason = ""
-        if status == "cancelled":
-            cancel_reason = random.choice(["Changed mind", "Found cheaper", "Wait too long"])
-        
-        sales_orders[so_id] = {
-            "sales_order_id": so_id,
+    def products(self) -> Iterator[Tuple[str, Row]]:
+        for product, supplier in self.iter_products():
+            p_id = get_id(product)
+            rng = self.entity("product", product)
+            # Constraint 5: Description can be empty (free-form)
+            description = self.fake.sentence() if rng.random() > 0.2 else ""
+            name = f"{rng.choice(PRODUCT_CATEGORIES)} {self.fake.word().capitalize()}"
+            created, updated = self.timestamps("product", product)
+            yield p_id, {
+                "product_id": p_id,
+                "name": name,
+                "description": description,
+                "supplier_id": get_id(supplier),  # Constraint 8: Valid FK
+                "unit_price": self.unit_price(product),
+                "created_at": created,
+                "updated_at": updated,
+            }
+
+    def user(self, i: int) -> Row:
+        u_id = get_id(i)
+        if self._cached_user is not None and self._cached_user[0] == u_id:
+            return self._cached_user[1]
+        rng = self.entity("user", i)
+        first = self.fake.first_name()
+        last = self.fake.last_name()
+        role = STAFF_ROLES[i - 1] if not self.is_customer(i) else "customer"
+        email = generate_realistic_email(rng, first, last)
+        created, updated = self.timestamps("user", i)
+        user = {
             "user_id": u_id,
-            "order_date": fake.date_between(start_date="-6m", end_date="today").isoformat(),
-            "status": status,
-            "payment_method": random.choice(["Credit Card", "PayPal", "Debit"]),
-            "cancel_reason": cancel_reason,
+            "first_name": first,
+            "last_name": last,
+            "email": email,
+            "role": role,
+            "address": self.fake.street_address(),
+            "city": self.fake.city(),
+            "state": self.fake.state_abbr(),
+            "zip_code": self.fake.zipcode(),
+            "country": "USA",
             "created_at": created,
-            "updated_at": updated
+            "updated_at": updated,
         }
-        
-        # Items (Constraint 1: Max 3 items)
-        num_items = random.randint(1, 3)
-        for _ in range(num_items):
-            soi_id = get_id(so_item_counter)
-            so_item_counter += 1
-            
-            prod_id = random.choice(all_product_ids)
-            
-            so_items[soi_id] = {
-                "so_item_id": soi_id,
+        self._cached_user = (u_id, user)
+        return user
+
+    def users(self) -> Iterator[Tuple[str, Row]]:
+        for i in range(1, self.num_users + 1):
+            yield get_id(i), self.user(i)
+
+    def purchase_orders(self) -> Iterator[Tuple[str, Row]]:
+        for purchase_order, supplier, _, _ in self.iter_purchase_orders():
+            po_id = get_id(purchase_order)
+            rng = self.entity("purchase_order", purchase_order)
+            order_date = self.date_between(-365, 0)
+            created, updated = self.timestamps("purchase_order", purchase_order)
+            yield po_id, {
+                "purchase_order_id": po_id,
+                "supplier_id": get_id(supplier),
+                "order_date": order_date,
+                "status": rng.choice(PO_STATUSES),
+                "created_at": created,
+                "updated_at": updated,
+            }
+
+    def purchase_order_items(self) -> Iterator[Tuple[str, Row]]:
+        poi_counter = 1
+        for purchase_order, _, first_product, num_products in self.iter_purchase_orders():
+            # Constraint 7: Coherence. Only products of the PO's supplier are ordered.
+            if num_products == 0:
+                continue  # Skip adding items if supplier has no products
+            created, updated = self.timestamps("purchase_order", purchase_order)
+            rng = self.rng("purchase_order_item_products", purchase_order)
+            for _ in range(self.purchase_order_items_count(purchase_order)):
+                poi_id = get_id(poi_counter)
+                poi_counter += 1
+                product = first_product + rng.randrange(num_products)
+                yield poi_id, {
+                    "po_item_id": poi_id,
+                    "purchase_order_id": get_id(purchase_order),
+                    "product_id": get_id(product),
+                    "quantity": rng.randint(10, 100),
+                    "unit_cost": round(self.unit_price(product) * 0.7, 2),
+                    "created_at": created,
+                    "updated_at": updated,
+                }
+
+    def sales_orders(self) -> Iterator[Tuple[str, Row]]:
+        for sales_order, user in self.iter_sales_orders():
+            so_id = get_id(sales_order)
+            rng = self.entity("sales_order", sales_order)
+            status = self.sales_order_status(sales_order)
+            # Constraint 5: cancel_reason is free-form, can be empty
+            cancel_reason = ""
+            if status == "cancelled":
+                cancel_reason = rng.choice(CANCEL_REASONS)
+            order_date = self.date_between(-182, 0)
+            created, updated = self.timestamps("sales_order", sales_order)
+            yield so_id, {
                 "sales_order_id": so_id,
-                "product_id": prod_id,
-                "quantity": random.randint(1, 5),
+                "user_id": get_id(user),
+                "order_date": order_date,
+                "status": status,
+                "payment_method": rng.choice(PAYMENT_METHODS),
+                "cancel_reason": cancel_reason,
                 "created_at": created,
-                "updated_at": updated
+                "updated_at": updated,
             }
-            
-        # Shipping (Constraint 1: Max 1 shipping record per order)
-        # Logic: Shipping exists if status implies movement
-        if status in ["shipped", "delivered", "returned"]:
+
+    def sales_order_items(self) -> Iterator[Tuple[str, Row]]:
+        num_products = self.num_products()
+        soi_counter = 1
+        for sales_order, _ in self.iter_sales_orders():
+            created, updated = self.timestamps("sales_order", sales_order)
+            rng = self.rng("sales_order_item_products", sales_order)
+            for _ in range(self.sales_order_items_count(sales_order)):
+                soi_id = get_id(soi_counter)
+                soi_counter += 1
+                yield soi_id, {
+                    "so_item_id": soi_id,
+                    "sales_order_id": get_id(sales_order),
+                    "product_id": get_id(rng.randint(1, num_products)),
+                    "quantity": rng.randint(1, 5),
+                    "created_at": created,
+                    "updated_at": updated,
+                }
+
+    def shipping(self) -> Iterator[Tuple[str, Row]]:
+        shipping_counter = 1
+        for sales_order, user in self.iter_sales_orders():
+            # Constraint 1: Max 1 shipping record per order
+            # Logic: Shipping exists if status implies movement
+            status = self.sales_order_status(sales_order)
+            if status not in SHIPPED_STATUSES:
+                continue
+            u_data = self.user(user)
             ship_id = get_id(shipping_counter)
             shipping_counter += 1
-            
-            est_date = fake.date_between(start_date="today", end_date="+1w").isoformat()
-            real_date = fake.date_between(start_date="-1w", end_date="today").isoformat() if status == "delivered" else ""
-            
-            shipping[ship_id] = {
+            created, updated = self.timestamps("sales_order", sales_order)
+            self.entity("shipping", sales_order)
+            est_date = self.date_between(0, 7)
+            real_date = self.date_between(-7, 0) if status == "delivered" else ""
+            yield ship_id, {
                 "shipping_id": ship_id,
-                "sales_order_id": so_id,
+                "sales_order_id": get_id(sales_order),
                 "address": f"{u_data['address']}, {u_data['city']}, {u_data['state']}",
                 "estimate_deliver_date": est_date,
-                "real_deliver_date": real_date, # Constraint 15: Empty string if not applicable, not null
+                "real_deliver_date": real_date,  # Constraint 15: Empty string if not applicable, not null
                 "method": "Standard",
-                "tracking_number": f"TRK-{fake.uuid4()[:8].upper()}",
+                "tracking_number": f"TRK-{self.fake.uuid4()[:8].upper()}",
                 "status": status,
                 "created_at": created,
-                "updated_at": updated
+                "updated_at": updated,
             }
 
-with open(f"{DATA_DIR}/sales_orders.json", "w") as f:
-    json.dump(sales_orders, f, indent=2)
-with open(f"{DATA_DIR}/sales_order_items.json", "w") as f:
-    json.dump(so_items, f, indent=2)
-with open(f"{DATA_DIR}/shipping.json", "w") as f:
-    json.dump(shipping, f, indent=2)
+
+TABLES = [
+    "suppliers",
+    "products",
+    "users",
+    "purchase_orders",
+    "purchase_order_items",
+    "sales_orders",
+    "sales_order_items",
+    "shipping",
+]
+
+
+def write_table(path: str, rows: Iterator[Tuple[str, Row]], chunk_size: int = CHUNK_SIZE) -> int:
+    """Streams rows to `path` in the `json.dump(table, indent=2)` layout."""
+    count = 0
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write("{")
+        chunk: List[str] = []
+        for row_id, row in rows:
+            # Drop the outer braces of a one-entry dict to get an indented entry.
+            entry = json.dumps({row_id: row}, indent=2)[1:-2]
+            chunk.append("," + entry if count else entry)
+            count += 1
+            if len(chunk) >= chunk_size:
+                f.write("".join(chunk))
+                chunk = []
+        f.write("".join(chunk))
+        f.write("\n}" if count else "}")
+    os.replace(tmp_path, path)
+    return count
+
+
+def _generate_table(job: Tuple[str, str, float, int, datetime.datetime, int]) -> Tuple[str, int]:
+    table, output_dir, scale, seed, now, chunk_size = job
+    generator = RetailGenerator(scale=scale, seed=seed, now=now)
+    rows = getattr(generator, table)()
+    count = write_table(os.path.join(output_dir, f"{table}.json"), rows, chunk_size)
+    return table, count
+
+
+def generate(
+    output_dir: str = DATA_DIR,
+    scale: float = 1.0,
+    seed: int = 42,
+    now: datetime.datetime = DEFAULT_NOW,
+    tables: Optional[List[str]] = None,
+    num_workers: int = 1,
+    chunk_size: int = CHUNK_SIZE,
+) -> Dict[str, int]:
+    """Writes the selected tables to `output_dir` and returns their row counts."""
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = [
+        (table, output_dir, scale, seed, now, chunk_size) for table in tables or TABLES
+    ]
+    if num_workers <= 1:
+        results = map(_generate_table, jobs)
+        return {table: count for table, count in results}
+    with multiprocessing.Pool(processes=min(num_workers, len(jobs))) as pool:
+        return {table: count for table, count in pool.imap_unordered(_generate_table, jobs)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate the retail dataset.")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplier on the number of suppliers and users")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--now", type=datetime.datetime.fromisoformat, default=DEFAULT_NOW)
+    parser.add_argument("--output-dir", type=str, default=DATA_DIR)
+    parser.add_argument("--tables", type=str, nargs="+", choices=TABLES, default=None)
+    parser.add_argument("--num-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    print(f"Generating retail data at scale {args.scale} into '{args.output_dir}/'...")
+    counts = generate(
+        output_dir=args.output_dir,
+        scale=args.scale,
+        seed=args.seed,
+        now=args.now,
+        tables=args.tables,
+        num_workers=args.num_workers,
+        chunk_size=args.chunk_size,
+    )
+    for table in TABLES:
+        if table in counts:
+            print(f"  {table}: {counts[table]} rows")
+    print("Done!")
 
 
-print(f"Done! Database seeded in '{DATA_DIR}/' with {product_counter-1} products, {so_counter-1} sales orders.")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
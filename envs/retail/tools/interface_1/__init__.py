@@ -11,6 +11,12 @@ from .discover_sales_orders import DiscoverSalesOrders
 from .manage_sales_orders import ManageSalesOrders
 from .discover_shipping import DiscoverShipping
 from .manage_shipping import ManageShipping
+from .discover_sales_order_items import DiscoverSalesOrderItems
+from .discover_purchase_order_items import DiscoverPurchaseOrderItems
+from .get_sales_order_details import GetSalesOrderDetails
+from .get_purchase_order_details import GetPurchaseOrderDetails
+from .aggregate_records import AggregateRecords
+from .get_inventory import GetInventory
 
 ALL_TOOLS_INTERFACE_1 = [
     CheckApproval,
@@ -26,4 +32,10 @@ ALL_TOOLS_INTERFACE_1 = [
     ManageSalesOrders,
     DiscoverShipping,
     ManageShipping,
+    DiscoverSalesOrderItems,
+    DiscoverPurchaseOrderItems,
+    GetSalesOrderDetails,
+    GetPurchaseOrderDetails,
+    AggregateRecords,
+    GetInventory,
 ]
\ No newline at end of file
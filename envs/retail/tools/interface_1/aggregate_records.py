@@ -0,0 +1,80 @@
+from typing import Any, Dict, List, Optional
+from tau_bench.envs.tool import Tool
+from tau_bench.envs.serialization import get_serializer
+from tau_bench.envs.aggregate import aggregate
+from tau_bench.envs.query import FILTERS_DESCRIPTION, UNLIMITED, QueryError
+from tau_bench.envs.retail.data import FOREIGN_KEYS
+
+class AggregateRecords(Tool):
+    @staticmethod
+    def invoke(
+        data: Dict[str, Any],
+        table: str,
+        metrics: Optional[List[Dict[str, Any]]] = None,
+        group_by: Optional[List[Any]] = None,
+        joins: Optional[List[str]] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        order_by: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+    ) -> str:
+        """
+        Groups the rows of a table (joined with the tables it references) and aggregates them.
+        """
+        serializer = get_serializer(data)
+        # Never return more groups than a getter page holds
+        page_size = (getattr(data, "page_limits", None) or UNLIMITED).max_page_size
+        if page_size is not None and (limit is None or (type(limit) is int and limit > page_size)):
+            limit = page_size
+        try:
+            groups, total, matched = aggregate(
+                data, table, FOREIGN_KEYS, joins, filters, group_by, metrics, order_by, limit
+            )
+        except QueryError as e:
+            return serializer.dumps({"success": False, "error": str(e)})
+
+        result = {"success": True, "rows_matched": matched, "count": len(groups), "groups": groups}
+        if total > len(groups):
+            result["total_groups"] = total
+        return serializer.dumps(result)
+
+    @staticmethod
+    def get_info() -> Dict[str, Any]:
+        return {
+            "name": "aggregate_records",
+            "description": "Computes counts, sums, averages, minimums and maximums over a table, optionally grouped and joined with the tables it references (e.g., units sold per product, open PO quantity per supplier, revenue by payment method). Returns only the aggregated numbers.",
+            "type": "getter",
+            "inputs": {
+                "table": {
+                    "type": "string",
+                    "description": "Table to aggregate (e.g., 'sales_order_items')"
+                },
+                "metrics": {
+                    "type": "array",
+                    "description": "Aggregates to compute, each {'op': 'count'|'sum'|'avg'|'min'|'max', 'column': ..., 'times': ..., 'as': ...}. 'times' multiplies by another column first (e.g., {'op': 'sum', 'column': 'quantity', 'times': 'products.unit_price', 'as': 'revenue'}). Default: [{'op': 'count'}]"
+                },
+                "group_by": {
+                    "type": "array",
+                    "description": "Columns to group by, or {'column': ..., 'truncate': 'year'|'month'|'day'} for dates (e.g., ['product_id'], ['sales_orders.payment_method'])"
+                },
+                "joins": {
+                    "type": "array",
+                    "description": "Referenced tables to join through their foreign keys, in order (e.g., ['sales_orders', 'products'] for sales_order_items). Columns of joined tables are written 'table.column'."
+                },
+                "filters": {
+                    "type": "object",
+                    "description": "Filters on the table or on joined tables (e.g., {'sales_orders.order_date': {'$gte': '2025-12-01'}}). " + FILTERS_DESCRIPTION
+                },
+                "order_by": {
+                    "type": "array",
+                    "description": "Group or metric names to sort by, prefixed with '-' for descending (default: the group_by columns)"
+                },
+                "limit": {"type": "integer", "description": "Maximum number of groups to return"}
+            },
+            "outputs": {
+                "success": "boolean",
+                "rows_matched": "integer",
+                "count": "integer",
+                "groups": "array",
+                "total_groups": "integer (only when groups were cut by limit)"
+            }
+        }
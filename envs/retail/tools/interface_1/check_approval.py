@@ -1,6 +1,19 @@
-import json
 from typing import Any, Dict, Optional
 from tau_bench.envs.tool import Tool
+from tau_bench.envs.serialization import get_serializer
+from tau_bench.envs.index import find_records
+
+# Define Policy Matrix 
+# Store Manager: All access
+# Fulfillment Specialist: Orders, Shipping, Receiving
+# Customer Support: Cancellations, PII Updates
+# Compiled once: role -> frozenset of actions, "*" grants everything.
+ALLOWED_ACTIONS = {
+    "store manager": frozenset(["*"]), # Wildcard
+    "fulfillment specialist": frozenset(["create_shipping", "update_order_status", "receive_inventory"]),
+    "customer support": frozenset(["force_cancel", "update_pii"])
+}
+NO_PERMISSIONS = frozenset()
 
 class CheckApproval(Tool):
     @staticmethod
@@ -9,45 +22,32 @@ class CheckApproval(Tool):
         Validates if the requester is authorized for the action.
         Checks 'approvals' table for explicit approval codes or 'users' table for role-based permission.
         """
-        users = data.get("users", {})
-        requester = next((u for u in users.values() if u.get("email") == requester_email), None)
+        serializer = get_serializer(data)
+        # Email and (requester_email, action) lookups go through the hash indexes.
+        requester = next((u for _, u in find_records(data, "users", {"email": requester_email})), None)
         
         if not requester:
-            return json.dumps({
+            return serializer.dumps({
                 "approved": False, 
                 "reason": f"User {requester_email} not found."
             })
 
         role = requester.get("role", "").lower()
-        
-        # Define Policy Matrix 
-        # Store Manager: All access
-        # Fulfillment Specialist: Orders, Shipping, Receiving
-        # Customer Support: Cancellations, PII Updates
-        
-        allowed_actions = {
-            "store manager": ["*"], # Wildcard
-            "fulfillment specialist": ["create_shipping", "update_order_status", "receive_inventory"],
-            "customer support": ["force_cancel", "update_pii"]
-        }
 
-        user_permissions = allowed_actions.get(role, [])
+        user_permissions = ALLOWED_ACTIONS.get(role, NO_PERMISSIONS)
         
         if "*" in user_permissions:
-            return json.dumps({"approved": True, "reason": "Role authorized (Admin)"})
+            return serializer.dumps({"approved": True, "reason": "Role authorized (Admin)"})
 
         if action in user_permissions:
-             return json.dumps({"approved": True, "reason": "Role authorized"})
+             return serializer.dumps({"approved": True, "reason": "Role authorized"})
 
        
-        approvals = data.get("approvals", {})
-        for appr in approvals.values():
-            if (appr.get("requester_email") == requester_email and 
-                appr.get("action") == action and 
-                appr.get("status") == "approved"):
-                return json.dumps({"approved": True, "reason": f"Explicit approval found: {appr.get('approval_code')}"})
+        approval_filters = {"requester_email": requester_email, "action": action, "status": "approved"}
+        for _, appr in find_records(data, "approvals", approval_filters):
+            return serializer.dumps({"approved": True, "reason": f"Explicit approval found: {appr.get('approval_code')}"})
 
-        return json.dumps({
+        return serializer.dumps({
             "approved": False, 
             "reason": f"Role '{role}' is not authorized for '{action}' and no explicit approval found."
         })
@@ -1,7 +1,8 @@
-import json
-import datetime
 from typing import Any, Dict
 from tau_bench.envs.tool import Tool
+from tau_bench.envs.clock import get_clock
+from tau_bench.envs.serialization import get_serializer
+from tau_bench.envs.sequence import next_id
 
 class CreateNewAuditTrail(Tool):
     @staticmethod
@@ -9,26 +10,25 @@ class CreateNewAuditTrail(Tool):
         """
         Logs a state-changing event. Returns delta for 'audit_logs'.
         """
-        audit_logs = data.get("audit_logs", {})
+        serializer = get_serializer(data)
+        clock = get_clock(data)
+        audit_id = next_id(data, "audit_logs")
         
-        current_ids = [int(k) for k in audit_logs.keys() if k.isdigit()]
-        next_id = str(max(current_ids) + 1) if current_ids else "1"
-        
-        timestamp = datetime.datetime.now().isoformat()
+        timestamp = clock.now().isoformat()
         
         new_log = {
-            "audit_id": next_id,
+            "audit_id": audit_id,
             "action": action,
             "user_email": user_email,
             "details": details,
             "timestamp": timestamp
         }
         
-        delta = {"audit_logs": {next_id: new_log}}
+        delta = {"audit_logs": {audit_id: new_log}}
         
-        return json.dumps({
+        return serializer.dumps({
             "success": True,
-            "audit_id": next_id,
+            "audit_id": audit_id,
             "delta": delta
         })
 
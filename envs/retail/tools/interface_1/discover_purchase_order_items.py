@@ -0,0 +1,50 @@
+from typing import Any, Dict, List, Optional
+from tau_bench.envs.tool import Tool
+from tau_bench.envs.serialization import get_serializer
+from tau_bench.envs.query import FILTERS_DESCRIPTION, QUERY_INPUTS, QueryError, search_page
+
+class DiscoverPurchaseOrderItems(Tool):
+    @staticmethod
+    def invoke(
+        data: Dict[str, Any],
+        filters: Optional[Dict[str, Any]] = None,
+        order_by: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        fields: Optional[List[str]] = None,
+        cursor: Optional[str] = None,
+    ) -> str:
+        """
+        Searches for purchase order line items based on specific filters.
+        """
+        serializer = get_serializer(data)
+        try:
+            page = search_page(
+                data, "purchase_order_items", "po_item_id",
+                filters, order_by, limit, offset, fields, cursor,
+            )
+        except QueryError as e:
+            return serializer.dumps({"success": False, "error": str(e)})
+
+        return page.render("purchase_order_items")
+
+    @staticmethod
+    def get_info() -> Dict[str, Any]:
+        return {
+            "name": "discover_purchase_order_items",
+            "description": "Finds the line items (product, quantity and unit cost) of Purchase Orders.",
+            "type": "getter",
+            "inputs": {
+                "filters": {
+                    "type": "object",
+                    "description": "Key-value pairs for filtering (e.g., {'purchase_order_id': '7'}, {'product_id': '4'}). " + FILTERS_DESCRIPTION
+                },
+                **QUERY_INPUTS
+            },
+            "outputs": {
+                "success": "boolean",
+                "count": "integer (records of the whole search, across its pages)",
+                "purchase_order_items": "array",
+                "next_cursor": "string (only when more records follow)"
+            }
+        }
\ No newline at end of file
@@ -1,23 +1,29 @@
-import json
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional
 from tau_bench.envs.tool import Tool
+from tau_bench.envs.serialization import get_serializer
+from tau_bench.envs.query import FILTERS_DESCRIPTION, QUERY_INPUTS, QueryError, search_page
 
 class DiscoverPurchaseOrders(Tool):
     @staticmethod
-    def invoke(data: Dict[str, Any], filters: Dict[str, Any]) -> str:
-        pos = data.get("purchase_orders", {})
-        results = []
-        for pid, pdata in pos.items():
-            match = True
-            for k, v in filters.items():
-                if pdata.get(k) != v:
-                    match = False
-                    break
-            if match:
-                res = pdata.copy()
-                res["purchase_order_id"] = pid
-                results.append(res)
-        return json.dumps({"success": True, "count": len(results), "purchase_orders": results})
+    def invoke(
+        data: Dict[str, Any],
+        filters: Optional[Dict[str, Any]] = None,
+        order_by: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        fields: Optional[List[str]] = None,
+        cursor: Optional[str] = None,
+    ) -> str:
+        serializer = get_serializer(data)
+        try:
+            page = search_page(
+                data, "purchase_orders", "purchase_order_id",
+                filters, order_by, limit, offset, fields, cursor,
+                overwrite_id=True,
+            )
+        except QueryError as e:
+            return serializer.dumps({"success": False, "error": str(e)})
+        return page.render("purchase_orders")
 
     @staticmethod
     def get_info() -> Dict[str, Any]:
@@ -25,6 +31,9 @@ class DiscoverPurchaseOrders(Tool):
             "name": "discover_purchase_orders",
             "description": "Searches POs.",
             "type": "getter",
-            "inputs": {"filters": {"type": "object"}},
-            "outputs": {"success": "boolean", "purchase_orders": "array"}
+            "inputs": {
+                "filters": {"type": "object", "description": FILTERS_DESCRIPTION},
+                **QUERY_INPUTS
+            },
+            "outputs": {"success": "boolean", "purchase_orders": "array", "next_cursor": "string"}
         }
\ No newline at end of file
@@ -1,37 +1,33 @@
-import json
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 from tau_bench.envs.tool import Tool
+from tau_bench.envs.serialization import get_serializer
+from tau_bench.envs.query import FILTERS_DESCRIPTION, QUERY_INPUTS, QueryError, search_page
 
 class DiscoverSalesOrders(Tool):
     @staticmethod
-    def invoke(data: Dict[str, Any], filters: Dict[str, Any]) -> str:
+    def invoke(
+        data: Dict[str, Any],
+        filters: Optional[Dict[str, Any]] = None,
+        order_by: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        fields: Optional[List[str]] = None,
+        cursor: Optional[str] = None,
+    ) -> str:
         """
         Searches for sales orders based on provided filters.
         """
-        orders = data.get("sales_orders", {})
-        results = []
+        serializer = get_serializer(data)
+        try:
+            # Narrow down through the indexes, apply filters and serialize one page
+            page = search_page(
+                data, "sales_orders", "sales_order_id",
+                filters, order_by, limit, offset, fields, cursor,
+            )
+        except QueryError as e:
+            return serializer.dumps({"success": False, "error": str(e)})
 
-        # Iterate through all orders and apply filters
-        for so_id, so_data in orders.items():
-            match = True
-            for key, val in filters.items():
-                if so_data.get(key) != val:
-                    match = False
-                    break
-            
-            if match:
-                # Create a copy to avoid mutating the source data during read
-                record = so_data.copy()
-                # Ensure the ID is explicitly included in the returned object
-                if "sales_order_id" not in record:
-                    record["sales_order_id"] = so_id
-                results.append(record)
-
-        return json.dumps({
-            "success": True,
-            "count": len(results),
-            "sales_orders": results
-        })
+        return page.render("sales_orders")
 
     @staticmethod
     def get_info() -> Dict[str, Any]:
@@ -42,12 +38,14 @@ class DiscoverSalesOrders(Tool):
             "inputs": {
                 "filters": {
                     "type": "object",
-                    "description": "Key-value pairs for filtering (e.g., {'sales_order_id': 'SO-101'}, {'user_id': 'USR-05'}, {'status': 'placed'})"
-                }
+                    "description": "Key-value pairs for filtering (e.g., {'sales_order_id': 'SO-101'}, {'user_id': 'USR-05'}, {'status': 'placed'}). " + FILTERS_DESCRIPTION
+                },
+                **QUERY_INPUTS
             },
             "outputs": {
                 "success": "boolean",
-                "count": "integer",
-                "sales_orders": "array"
+                "count": "integer (records of the whole search, across its pages)",
+                "sales_orders": "array",
+                "next_cursor": "string (only when more records follow)"
             }
         }
\ No newline at end of file
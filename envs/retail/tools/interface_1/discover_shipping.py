@@ -1,34 +1,32 @@
-import json
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 from tau_bench.envs.tool import Tool
+from tau_bench.envs.serialization import get_serializer
+from tau_bench.envs.query import FILTERS_DESCRIPTION, QUERY_INPUTS, QueryError, search_page
 
 class DiscoverShipping(Tool):
     @staticmethod
-    def invoke(data: Dict[str, Any], filters: Dict[str, Any]) -> str:
+    def invoke(
+        data: Dict[str, Any],
+        filters: Optional[Dict[str, Any]] = None,
+        order_by: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        fields: Optional[List[str]] = None,
+        cursor: Optional[str] = None,
+    ) -> str:
         """
         Searches for shipping records based on specific filters.
         """
-        shipments = data.get("shipping", {})
-        results = []
+        serializer = get_serializer(data)
+        try:
+            page = search_page(
+                data, "shipping", "shipping_id",
+                filters, order_by, limit, offset, fields, cursor,
+            )
+        except QueryError as e:
+            return serializer.dumps({"success": False, "error": str(e)})
 
-        for ship_id, ship_data in shipments.items():
-            match = True
-            for key, val in filters.items():
-                if ship_data.get(key) != val:
-                    match = False
-                    break
-            
-            if match:
-                record = ship_data.copy()
-                if "shipping_id" not in record:
-                    record["shipping_id"] = ship_id
-                results.append(record)
-
-        return json.dumps({
-            "success": True,
-            "count": len(results),
-            "shipments": results
-        })
+        return page.render("shipments")
 
     @staticmethod
     def get_info() -> Dict[str, Any]:
@@ -39,12 +37,14 @@ class DiscoverShipping(Tool):
             "inputs": {
                 "filters": {
                     "type": "object",
-                    "description": "Key-value pairs for filtering (e.g., {'sales_order_id': 'SO-101'}, {'tracking_number': 'TRK-999'})"
-                }
+                    "description": "Key-value pairs for filtering (e.g., {'sales_order_id': 'SO-101'}, {'tracking_number': 'TRK-999'}). " + FILTERS_DESCRIPTION
+                },
+                **QUERY_INPUTS
             },
             "outputs": {
                 "success": "boolean",
-                "count": "integer",
-                "shipments": "array"
+                "count": "integer (records of the whole search, across its pages)",
+                "shipments": "array",
+                "next_cursor": "string (only when more records follow)"
             }
         }
\ No newline at end of file
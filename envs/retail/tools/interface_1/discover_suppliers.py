@@ -1,24 +1,30 @@
-import json
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional
 from tau_bench.envs.tool import Tool
+from tau_bench.envs.serialization import get_serializer
+from tau_bench.envs.query import FILTERS_DESCRIPTION, QUERY_INPUTS, QueryError, search_page
 
 class DiscoverSuppliers(Tool):
     @staticmethod
-    def invoke(data: Dict[str, Any], filters: Dict[str, Any]) -> str:
-        suppliers = data.get("suppliers", {})
-        results = []
-        for s_id, s_data in suppliers.items():
-            match = True
-            for k, v in filters.items():
-                if s_data.get(k) != v:
-                    match = False
-                    break
-            if match:
-                res = s_data.copy()
-                res["supplier_id"] = s_id
-                results.append(res)
-        
-        return json.dumps({"success": True, "count": len(results), "suppliers": results})
+    def invoke(
+        data: Dict[str, Any],
+        filters: Optional[Dict[str, Any]] = None,
+        order_by: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        fields: Optional[List[str]] = None,
+        cursor: Optional[str] = None,
+    ) -> str:
+        serializer = get_serializer(data)
+        try:
+            page = search_page(
+                data, "suppliers", "supplier_id",
+                filters, order_by, limit, offset, fields, cursor,
+                overwrite_id=True,
+            )
+        except QueryError as e:
+            return serializer.dumps({"success": False, "error": str(e)})
+
+        return page.render("suppliers")
 
     @staticmethod
     def get_info() -> Dict[str, Any]:
@@ -26,6 +32,9 @@ class DiscoverSuppliers(Tool):
             "name": "discover_suppliers",
             "description": "Searches for supplier records.",
             "type": "getter",
-            "inputs": {"filters": {"type": "object"}},
-            "outputs": {"success": "boolean", "suppliers": "array"}
+            "inputs": {
+                "filters": {"type": "object", "description": FILTERS_DESCRIPTION},
+                **QUERY_INPUTS
+            },
+            "outputs": {"success": "boolean", "suppliers": "array", "next_cursor": "string"}
         }
\ No newline at end of file
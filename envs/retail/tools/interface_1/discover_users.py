@@ -1,33 +1,32 @@
-import json
 from typing import Any, Dict, List, Optional
 from tau_bench.envs.tool import Tool
+from tau_bench.envs.serialization import get_serializer
+from tau_bench.envs.query import FILTERS_DESCRIPTION, QUERY_INPUTS, QueryError, search_page
 
 class DiscoverUsers(Tool):
     @staticmethod
-    def invoke(data: Dict[str, Any], filters: Dict[str, Any]) -> str:
+    def invoke(
+        data: Dict[str, Any],
+        filters: Optional[Dict[str, Any]] = None,
+        order_by: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        fields: Optional[List[str]] = None,
+        cursor: Optional[str] = None,
+    ) -> str:
         """
-        Searches for users based on exact match filters.
+        Searches for users based on filters.
         """
-        users = data.get("users", {})
-        results = []
-        
-        for u_id, u_data in users.items():
-            match = True
-            for key, val in filters.items():
-                if u_data.get(key) != val:
-                    match = False
-                    break
-            if match:
-                record = u_data.copy()
-                if "user_id" not in record:
-                    record["user_id"] = u_id
-                results.append(record)
-                
-        return json.dumps({
-            "success": True,
-            "count": len(results),
-            "users": results
-        })
+        serializer = get_serializer(data)
+        try:
+            page = search_page(
+                data, "users", "user_id",
+                filters, order_by, limit, offset, fields, cursor,
+            )
+        except QueryError as e:
+            return serializer.dumps({"success": False, "error": str(e)})
+
+        return page.render("users")
 
     @staticmethod
     def get_info() -> Dict[str, Any]:
@@ -38,12 +37,14 @@ class DiscoverUsers(Tool):
             "inputs": {
                 "filters": {
                     "type": "object",
-                    "description": "Key-value pairs for filtering (e.g., {'email': 'bob@example.com'})"
-                }
+                    "description": "Key-value pairs for filtering (e.g., {'email': 'bob@example.com'}). " + FILTERS_DESCRIPTION
+                },
+                **QUERY_INPUTS
             },
             "outputs": {
                 "success": "boolean",
-                "count": "integer",
-                "users": "array"
+                "count": "integer (records of the whole search, across its pages)",
+                "users": "array",
+                "next_cursor": "string (only when more records follow)"
             }
         }
\ No newline at end of file
@@ -0,0 +1,50 @@
+from typing import Any, Dict, List, Optional
+from tau_bench.envs.tool import Tool
+from tau_bench.envs.serialization import get_serializer
+from tau_bench.envs.retail.inventory import get_inventory_view
+
+class GetInventory(Tool):
+    @staticmethod
+    def invoke(
+        data: Dict[str, Any],
+        product_id: Optional[str] = None,
+        product_ids: Optional[List[str]] = None,
+    ) -> str:
+        """
+        Returns the stock of products from the materialized inventory view.
+        """
+        serializer = get_serializer(data)
+        requested = list(product_ids or [])
+        if product_id is not None:
+            requested.insert(0, product_id)
+        if not requested:
+            return serializer.dumps({"success": False, "error": "product_id or product_ids is required"})
+
+        products = data.get("products", {})
+        view = get_inventory_view(data)
+        inventory = []
+        for pid in requested:
+            if not isinstance(pid, str) or pid not in products:
+                return serializer.dumps({"success": False, "error": f"Product {pid} not found"})
+            record = {"product_id": pid}
+            record.update(view.get(pid))
+            inventory.append(record)
+
+        return serializer.dumps({"success": True, "count": len(inventory), "inventory": inventory})
+
+    @staticmethod
+    def get_info() -> Dict[str, Any]:
+        return {
+            "name": "get_inventory",
+            "description": "Returns the stock of one or more products: units received on purchase orders, shipped on sales orders, reserved by open sales orders, on hand (received - shipped) and available (on hand - reserved). Use it to validate stock levels before creating or shipping sales orders.",
+            "type": "getter",
+            "inputs": {
+                "product_id": {"type": "string"},
+                "product_ids": {"type": "array", "items": {"type": "string"}}
+            },
+            "outputs": {
+                "success": "boolean",
+                "count": "integer",
+                "inventory": "array of {product_id, received, shipped, reserved, on_hand, available}"
+            }
+        }
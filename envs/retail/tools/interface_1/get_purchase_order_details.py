@@ -0,0 +1,61 @@
+from typing import Any, Dict, List, Optional
+from tau_bench.envs.tool import Tool
+from tau_bench.envs.serialization import get_serializer, record_with_id
+from tau_bench.envs.query import (
+    FILTERS_DESCRIPTION,
+    QUERY_INPUTS,
+    QueryError,
+    get_record,
+    related_records,
+    search_page,
+)
+
+class GetPurchaseOrderDetails(Tool):
+    @staticmethod
+    def invoke(
+        data: Dict[str, Any],
+        filters: Optional[Dict[str, Any]] = None,
+        order_by: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        fields: Optional[List[str]] = None,
+        cursor: Optional[str] = None,
+    ) -> str:
+        """
+        Returns purchase orders with their supplier, their items and the product of each item.
+        """
+        serializer = get_serializer(data)
+
+        def make_record(pid: str, pdata: Dict[str, Any]) -> Dict[str, Any]:
+            res = dict(record_with_id(pid, pdata, "purchase_order_id", overwrite_id=True))
+            res["supplier"] = get_record(data, "suppliers", res.get("supplier_id"), "supplier_id")
+            items = []
+            for item in related_records(data, "purchase_order_items", "purchase_order_id", pid, "po_item_id"):
+                item = dict(item)
+                item["product"] = get_record(data, "products", item.get("product_id"), "product_id")
+                items.append(item)
+            res["items"] = items
+            return res
+
+        try:
+            page = search_page(
+                data, "purchase_orders", "purchase_order_id",
+                filters, order_by, limit, offset, fields, cursor,
+                make_record=make_record,
+            )
+        except QueryError as e:
+            return serializer.dumps({"success": False, "error": str(e)})
+        return page.render("purchase_orders")
+
+    @staticmethod
+    def get_info() -> Dict[str, Any]:
+        return {
+            "name": "get_purchase_order_details",
+            "description": "Returns Purchase Orders together with their supplier and line items (each with its product) in one call.",
+            "type": "getter",
+            "inputs": {
+                "filters": {"type": "object", "description": "Filters on the purchase orders. " + FILTERS_DESCRIPTION},
+                **QUERY_INPUTS
+            },
+            "outputs": {"success": "boolean", "purchase_orders": "array", "next_cursor": "string"}
+        }
@@ -0,0 +1,71 @@
+from typing import Any, Dict, List, Optional
+from tau_bench.envs.tool import Tool
+from tau_bench.envs.serialization import get_serializer, record_with_id
+from tau_bench.envs.query import (
+    FILTERS_DESCRIPTION,
+    QUERY_INPUTS,
+    QueryError,
+    get_record,
+    related_records,
+    search_page,
+)
+
+class GetSalesOrderDetails(Tool):
+    @staticmethod
+    def invoke(
+        data: Dict[str, Any],
+        filters: Optional[Dict[str, Any]] = None,
+        order_by: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        fields: Optional[List[str]] = None,
+        cursor: Optional[str] = None,
+    ) -> str:
+        """
+        Returns sales orders with their items, the product of each item and their shipments.
+        """
+        serializer = get_serializer(data)
+
+        def make_record(so_id: str, so_data: Dict[str, Any]) -> Dict[str, Any]:
+            record = dict(record_with_id(so_id, so_data, "sales_order_id"))
+            # Items and shipments are found through the foreign-key indexes
+            items = []
+            for item in related_records(data, "sales_order_items", "sales_order_id", so_id, "so_item_id"):
+                item = dict(item)
+                item["product"] = get_record(data, "products", item.get("product_id"), "product_id")
+                items.append(item)
+            record["items"] = items
+            record["shipments"] = related_records(data, "shipping", "sales_order_id", so_id, "shipping_id")
+            return record
+
+        try:
+            page = search_page(
+                data, "sales_orders", "sales_order_id",
+                filters, order_by, limit, offset, fields, cursor,
+                make_record=make_record,
+            )
+        except QueryError as e:
+            return serializer.dumps({"success": False, "error": str(e)})
+
+        return page.render("sales_orders")
+
+    @staticmethod
+    def get_info() -> Dict[str, Any]:
+        return {
+            "name": "get_sales_order_details",
+            "description": "Returns Sales Orders together with their line items (each with its product) and shipments in one call. Use it instead of chaining discover_sales_orders, discover_sales_order_items and discover_shipping.",
+            "type": "getter",
+            "inputs": {
+                "filters": {
+                    "type": "object",
+                    "description": "Filters on the sales orders (e.g., {'sales_order_id': '12'}, {'user_id': '5'}). " + FILTERS_DESCRIPTION
+                },
+                **QUERY_INPUTS
+            },
+            "outputs": {
+                "success": "boolean",
+                "count": "integer (records of the whole search, across its pages)",
+                "sales_orders": "array (each with 'items' and 'shipments'; each item with 'product')",
+                "next_cursor": "string (only when more records follow)"
+            }
+        }
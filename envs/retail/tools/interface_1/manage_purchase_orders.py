@@ -1,46 +1,47 @@
-import json
-import datetime
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 from tau_bench.envs.tool import Tool
+from tau_bench.envs.clock import get_clock
+from tau_bench.envs.serialization import get_serializer
+from tau_bench.envs.sequence import next_id, next_ids
 
 class ManagePurchaseOrders(Tool):
     @staticmethod
     def invoke(data: Dict[str, Any], action: str, supplier_id: str = None, status: str = None,
-               product_id: str = None, quantity: int = 0, purchase_order_id: str = None) -> str:
+               product_id: str = None, quantity: int = 0, purchase_order_id: str = None,
+               items: Optional[List[Dict[str, Any]]] = None) -> str:
+        serializer = get_serializer(data)
+        clock = get_clock(data)
         
         pos = data.get("purchase_orders", {})
-        items = data.get("purchase_order_items", {})
         
         if action == "create":
-            ids = [int(k) for k in pos.keys() if k.isdigit()]
-            new_id = str(max(ids) + 1) if ids else "1"
+            new_id = next_id(data, "purchase_orders")
             
             new_po = {
                 "purchase_order_id": new_id,
                 "supplier_id": supplier_id,
-                "order_date": datetime.datetime.now().date().isoformat(),
+                "order_date": clock.now().date().isoformat(),
                 "status": status or "pending",
-                "created_at": datetime.datetime.now().isoformat(),
-                "updated_at": datetime.datetime.now().isoformat()
+                "created_at": clock.now().isoformat(),
+                "updated_at": clock.now().isoformat()
             }
-            return json.dumps({"success": True, "purchase_order_id": new_id, "delta": {"purchase_orders": {new_id: new_po}}})
+            return serializer.dumps({"success": True, "purchase_order_id": new_id, "delta": {"purchase_orders": {new_id: new_po}}})
 
         elif action == "update":
             if not purchase_order_id or purchase_order_id not in pos:
-                return json.dumps({"success": False, "error": "Invalid PO ID"})
+                return serializer.dumps({"success": False, "error": "Invalid PO ID"})
             
             delta = {"purchase_orders": {purchase_order_id: {
                 "status": status, 
-                "updated_at": datetime.datetime.now().isoformat()
+                "updated_at": clock.now().isoformat()
             }}}
-            return json.dumps({"success": True, "purchase_order_id": purchase_order_id, "delta": delta})
+            return serializer.dumps({"success": True, "purchase_order_id": purchase_order_id, "delta": delta})
             
         elif action == "add_item":
             if not purchase_order_id:
-                return json.dumps({"success": False, "error": "Missing PO ID"})
+                return serializer.dumps({"success": False, "error": "Missing PO ID"})
                 
-            item_ids = [int(k) for k in items.keys() if k.isdigit()]
-            new_item_id = str(max(item_ids) + 1) if item_ids else "1"
+            new_item_id = next_id(data, "purchase_order_items")
             
             products = data.get("products", {})
             unit_cost = 0.0
@@ -53,26 +54,61 @@ class ManagePurchaseOrders(Tool):
                 "product_id": product_id,
                 "quantity": quantity,
                 "unit_cost": unit_cost,
-                "created_at": datetime.datetime.now().isoformat(),
-                "updated_at": datetime.datetime.now().isoformat()
+                "created_at": clock.now().isoformat(),
+                "updated_at": clock.now().isoformat()
             }
-            return json.dumps({"success": True, "item_id": new_item_id, "delta": {"purchase_order_items": {new_item_id: new_item}}})
+            return serializer.dumps({"success": True, "item_id": new_item_id, "delta": {"purchase_order_items": {new_item_id: new_item}}})
 
-        return json.dumps({"success": False, "error": "Invalid action"})
+        elif action == "bulk_add_items":
+            # Every line is validated before any id is allocated, so the PO
+            # gets all of its items in one delta or none of them.
+            if not purchase_order_id or purchase_order_id not in pos:
+                return serializer.dumps({"success": False, "error": "Invalid PO ID"})
+            if not isinstance(items, list) or not items:
+                return serializer.dumps({"success": False, "error": "items must be a non-empty list"})
+
+            products = data.get("products", {})
+            for position, item in enumerate(items):
+                if not isinstance(item, dict) or item.get("product_id") not in products:
+                    return serializer.dumps({"success": False, "error": f"Item {position}: invalid product_id"})
+                item_quantity = item.get("quantity")
+                if type(item_quantity) is not int or item_quantity <= 0:
+                    return serializer.dumps({"success": False, "error": f"Item {position}: quantity must be a positive integer"})
+
+            new_item_ids = next_ids(data, "purchase_order_items", len(items))
+            now = clock.now().isoformat()
+            new_items = {}
+            for new_item_id, item in zip(new_item_ids, items):
+                new_items[new_item_id] = {
+                    "po_item_id": new_item_id,
+                    "purchase_order_id": purchase_order_id,
+                    "product_id": item["product_id"],
+                    "quantity": item["quantity"],
+                    "unit_cost": round(products[item["product_id"]].get("unit_price", 0) * 0.7, 2),
+                    "created_at": now,
+                    "updated_at": now
+                }
+            return serializer.dumps({"success": True, "item_ids": new_item_ids, "delta": {"purchase_order_items": new_items}})
+
+        return serializer.dumps({"success": False, "error": "Invalid action"})
 
     @staticmethod
     def get_info() -> Dict[str, Any]:
         return {
             "name": "manage_purchase_orders",
-            "description": "Manage PO headers and items.",
+            "description": "Manage PO headers and items. Use bulk_add_items to add many lines to one PO in a single call.",
             "type": "setter",
             "inputs": {
-                "action": {"type": "string", "enum": ["create", "update", "add_item"]},
+                "action": {"type": "string", "enum": ["create", "update", "add_item", "bulk_add_items"]},
                 "supplier_id": {"type": "string"},
                 "status": {"type": "string"},
                 "product_id": {"type": "string"},
                 "quantity": {"type": "integer"},
-                "purchase_order_id": {"type": "string"}
+                "purchase_order_id": {"type": "string"},
+                "items": {
+                    "type": "array",
+                    "description": "For bulk_add_items: lines of {'product_id': ..., 'quantity': ...}."
+                }
             },
             "outputs": {"success": "boolean", "delta": "object"}
         }
\ No newline at end of file
@@ -1,23 +1,53 @@
-import json
-import datetime
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional
 from tau_bench.envs.tool import Tool
+from tau_bench.envs.clock import get_clock
+from tau_bench.envs.serialization import get_serializer
+
+SALES_ORDER_STATUSES = ["placed", "processing", "shipped", "delivered", "cancelled", "returned"]
 
 class ManageSalesOrders(Tool):
     @staticmethod
-    def invoke(data: Dict[str, Any], action: str, sales_order_id: str, status: str, cancel_reason: str = None) -> str:
+    def invoke(data: Dict[str, Any], action: str, sales_order_id: str = None, status: str = None,
+               cancel_reason: str = None, sales_order_ids: Optional[List[str]] = None) -> str:
+        serializer = get_serializer(data)
+        clock = get_clock(data)
         sos = data.get("sales_orders", {})
+        if action == "bulk_update":
+            if status not in SALES_ORDER_STATUSES:
+                return serializer.dumps({"success": False, "error": f"status must be one of {', '.join(SALES_ORDER_STATUSES)}"})
+            if not isinstance(sales_order_ids, list) or not sales_order_ids:
+                return serializer.dumps({"success": False, "error": "sales_order_ids must be a non-empty list"})
+            if not all(isinstance(so_id, str) for so_id in sales_order_ids):
+                return serializer.dumps({"success": False, "error": "sales_order_ids must be strings"})
+            if len(set(sales_order_ids)) != len(sales_order_ids):
+                return serializer.dumps({"success": False, "error": "sales_order_ids contains duplicates"})
+            missing = [so_id for so_id in sales_order_ids if so_id not in sos]
+            if missing:
+                return serializer.dumps({"success": False, "error": f"Orders not found: {missing}"})
+
+            updates = {
+                "status": status,
+                "updated_at": clock.now().isoformat()
+            }
+            if cancel_reason:
+                updates["cancel_reason"] = cancel_reason
+            return serializer.dumps({
+                "success": True,
+                "sales_order_ids": sales_order_ids,
+                "delta": {"sales_orders": {so_id: dict(updates) for so_id in sales_order_ids}}
+            })
+
         if sales_order_id not in sos:
-            return json.dumps({"success": False, "error": "Order not found"})
+            return serializer.dumps({"success": False, "error": "Order not found"})
             
         updates = {
             "status": status,
-            "updated_at": datetime.datetime.now().isoformat()
+            "updated_at": clock.now().isoformat()
         }
         if cancel_reason:
             updates["cancel_reason"] = cancel_reason
             
-        return json.dumps({
+        return serializer.dumps({
             "success": True, 
             "sales_order_id": sales_order_id, 
             "delta": {"sales_orders": {sales_order_id: updates}}
@@ -27,13 +57,14 @@ class ManageSalesOrders(Tool):
     def get_info() -> Dict[str, Any]:
         return {
             "name": "manage_sales_orders",
-            "description": "Update Sales Order status.",
+            "description": "Update Sales Order status. Use bulk_update to give many orders the same status in a single call.",
             "type": "setter",
             "inputs": {
-                "action": {"type": "string"},
+                "action": {"type": "string", "enum": ["update", "bulk_update"]},
                 "sales_order_id": {"type": "string"},
                 "status": {"type": "string"},
-                "cancel_reason": {"type": "string", "optional": True}
+                "cancel_reason": {"type": "string", "optional": True},
+                "sales_order_ids": {"type": "array", "items": {"type": "string"}, "description": "For bulk_update."}
             },
             "outputs": {"success": "boolean", "delta": "object"}
         }
\ No newline at end of file
@@ -1,21 +1,23 @@
-import json
-import datetime
-import random
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional
 from tau_bench.envs.tool import Tool
+from tau_bench.envs.clock import get_clock
+from tau_bench.envs.serialization import get_serializer
+from tau_bench.envs.sequence import next_id, next_ids
 
 class ManageShipping(Tool):
     @staticmethod
     def invoke(data: Dict[str, Any], action: str, sales_order_id: str = None, method: str = None, 
-               status: str = None, shipping_id: str = None) -> str:
+               status: str = None, shipping_id: str = None,
+               sales_order_ids: Optional[List[str]] = None) -> str:
+        serializer = get_serializer(data)
+        clock = get_clock(data)
         
         shipping = data.get("shipping", {})
         
         if action == "create":
-            ids = [int(k) for k in shipping.keys() if k.isdigit()]
-            new_id = str(max(ids) + 1) if ids else "1"
+            new_id = next_id(data, "shipping")
             
-            tracking = f"TRK-{random.randint(100000, 999999)}"
+            tracking = f"TRK-{clock.randint(f'shipping:{new_id}', 100000, 999999)}"
             
             new_ship = {
                 "shipping_id": new_id,
@@ -23,10 +25,10 @@ class ManageShipping(Tool):
                 "method": method,
                 "tracking_number": tracking,
                 "status": "shipped",
-                "created_at": datetime.datetime.now().isoformat(),
-                "updated_at": datetime.datetime.now().isoformat()
+                "created_at": clock.now().isoformat(),
+                "updated_at": clock.now().isoformat()
             }
-            return json.dumps({
+            return serializer.dumps({
                 "success": True, 
                 "tracking_number": tracking, 
                 "shipping_id": new_id,
@@ -35,28 +37,59 @@ class ManageShipping(Tool):
             
         elif action == "update":
             if not shipping_id or shipping_id not in shipping:
-                return json.dumps({"success": False, "error": "Invalid Shipping ID"})
+                return serializer.dumps({"success": False, "error": "Invalid Shipping ID"})
             
             delta = {"shipping": {shipping_id: {
                 "status": status,
-                "updated_at": datetime.datetime.now().isoformat()
+                "updated_at": clock.now().isoformat()
             }}}
-            return json.dumps({"success": True, "delta": delta})
-            
-        return json.dumps({"success": False, "error": "Invalid action"})
+            return serializer.dumps({"success": True, "delta": delta})
+
+        elif action == "bulk_create":
+            if not isinstance(sales_order_ids, list) or not sales_order_ids:
+                return serializer.dumps({"success": False, "error": "sales_order_ids must be a non-empty list"})
+            sos = data.get("sales_orders", {})
+            missing = [so_id for so_id in sales_order_ids if not isinstance(so_id, str) or so_id not in sos]
+            if missing:
+                return serializer.dumps({"success": False, "error": f"Orders not found: {missing}"})
+
+            new_ids = next_ids(data, "shipping", len(sales_order_ids))
+            now = clock.now().isoformat()
+            shipments = {}
+            for new_id, so_id in zip(new_ids, sales_order_ids):
+                shipments[new_id] = {
+                    "shipping_id": new_id,
+                    "sales_order_id": so_id,
+                    "method": method,
+                    "tracking_number": f"TRK-{clock.randint(f'shipping:{new_id}', 100000, 999999)}",
+                    "status": "shipped",
+                    "created_at": now,
+                    "updated_at": now
+                }
+            return serializer.dumps({
+                "success": True,
+                "shipments": [
+                    {"shipping_id": new_id, "sales_order_id": shipment["sales_order_id"], "tracking_number": shipment["tracking_number"]}
+                    for new_id, shipment in shipments.items()
+                ],
+                "delta": {"shipping": shipments}
+            })
+
+        return serializer.dumps({"success": False, "error": "Invalid action"})
 
     @staticmethod
     def get_info() -> Dict[str, Any]:
         return {
             "name": "manage_shipping",
-            "description": "Generate shipping labels.",
+            "description": "Generate shipping labels. Use bulk_create to ship many sales orders with one method in a single call.",
             "type": "setter",
             "inputs": {
-                "action": {"type": "string"},
+                "action": {"type": "string", "enum": ["create", "update", "bulk_create"]},
                 "sales_order_id": {"type": "string"},
                 "method": {"type": "string"},
                 "status": {"type": "string"},
-                "shipping_id": {"type": "string"}
+                "shipping_id": {"type": "string"},
+                "sales_order_ids": {"type": "array", "items": {"type": "string"}, "description": "For bulk_create."}
             },
             "outputs": {"success": "boolean", "tracking_number": "string", "delta": "object"}
         }
\ No newline at end of file
@@ -1,20 +1,22 @@
-import json
-import datetime
 from typing import Any, Dict, Optional
 from tau_bench.envs.tool import Tool
+from tau_bench.envs.clock import get_clock
+from tau_bench.envs.serialization import get_serializer
+from tau_bench.envs.sequence import next_id
 
 class ManageSuppliers(Tool):
     @staticmethod
     def invoke(data: Dict[str, Any], action: str, supplier_name: str = "", contact_email: str = "", 
                address: Dict[str, Any] = None, supplier_id: str = None) -> str:
+        serializer = get_serializer(data)
+        clock = get_clock(data)
         
         suppliers = data.get("suppliers", {})
         
         safe_address = address if address else {}
         
         if action == "create":
-            ids = [int(k) for k in suppliers.keys() if k.isdigit()]
-            new_id = str(max(ids) + 1) if ids else "1"
+            new_id = next_id(data, "suppliers")
             
             new_record = {
                 "supplier_id": new_id,
@@ -25,10 +27,10 @@ class ManageSuppliers(Tool):
                 "state": safe_address.get("state", ""),
                 "zip_code": safe_address.get("zip_code", ""),
                 "country": safe_address.get("country", "USA"),
-                "created_at": datetime.datetime.now().isoformat(),
-                "updated_at": datetime.datetime.now().isoformat()
+                "created_at": clock.now().isoformat(),
+                "updated_at": clock.now().isoformat()
             }
-            return json.dumps({
+            return serializer.dumps({
                 "success": True, 
                 "supplier_id": new_id, 
                 "delta": {"suppliers": {new_id: new_record}}
@@ -36,7 +38,7 @@ class ManageSuppliers(Tool):
             
         elif action == "update":
             if not supplier_id or supplier_id not in suppliers:
-                return json.dumps({"success": False, "error": "Invalid supplier_id"})
+                return serializer.dumps({"success": False, "error": "Invalid supplier_id"})
             
             updates = {}
             if supplier_name: updates["name"] = supplier_name
@@ -49,15 +51,15 @@ class ManageSuppliers(Tool):
                 if "zip_code" in address: updates["zip_code"] = address["zip_code"]
                 if "country" in address: updates["country"] = address["country"]
             
-            updates["updated_at"] = datetime.datetime.now().isoformat()
+            updates["updated_at"] = clock.now().isoformat()
             
-            return json.dumps({
+            return serializer.dumps({
                 "success": True,
                 "supplier_id": supplier_id,
                 "delta": {"suppliers": {supplier_id: updates}}
             })
             
-        return json.dumps({"success": False, "error": "Invalid action"})
+        return serializer.dumps({"success": False, "error": "Invalid action"})
 
     @staticmethod
     def get_info() -> Dict[str, Any]:
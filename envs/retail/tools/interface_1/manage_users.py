@@ -1,6 +1,6 @@
-import json
 from typing import Any, Dict
 from tau_bench.envs.tool import Tool
+from tau_bench.envs.serialization import get_serializer
 
 class ManageUsers(Tool):
     @staticmethod
@@ -8,18 +8,19 @@ class ManageUsers(Tool):
         """
         Updates user profile. 
         """
+        serializer = get_serializer(data)
         users = data.get("users", {})
         
         if user_id not in users:
-            return json.dumps({"success": False, "error": f"User ID {user_id} not found."})
+            return serializer.dumps({"success": False, "error": f"User ID {user_id} not found."})
             
         if action != "update":
-            return json.dumps({"success": False, "error": "Only 'update' action is supported."})
+            return serializer.dumps({"success": False, "error": "Only 'update' action is supported."})
             
  
         delta = {"users": {user_id: changes}}
         
-        return json.dumps({
+        return serializer.dumps({
             "success": True,
             "user_id": user_id,
             "delta": delta
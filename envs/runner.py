@@ -0,0 +1,260 @@
+import argparse
+import importlib
+import json
+import multiprocessing
+import os
+import random
+import tempfile
+import traceback
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from envs import get_env
+from envs.base import Env
+from envs.completion_cache import CacheMode, CompletionCache
+from envs.user import load_user_rules, set_completion_cache
+from types import Action
+
+# Returns the next action for the episode, or None to end it.
+Policy = Callable[[Env, str], Optional[Action]]
+
+
+def replay_policy(env: Env, observation: str) -> Optional[Action]:
+    """Replays the ground-truth actions of the current task."""
+    step = len(env.actions)
+    if step >= len(env.task.actions):
+        return None
+    return env.task.actions[step]
+
+
+def load_policy(path: str) -> Policy:
+    """Loads a policy from a 'package.module:function' path."""
+    module_name, _, attr = path.partition(":")
+    if not attr:
+        raise ValueError(f"Policy must be given as 'module:function', got {path}")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+def episode_seed(seed: int, task_index: int) -> int:
+    return seed * 1_000_003 + task_index
+
+
+def load_records(output_path: str) -> Dict[int, Dict[str, Any]]:
+    """Returns the last record of each task in `output_path`.
+
+    Lines that are not records (cut short by a crash, or without an integer
+    `task_index`) are skipped, and a later record of a task replaces an
+    earlier one.
+    """
+    records: Dict[int, Dict[str, Any]] = {}
+    if not os.path.exists(output_path):
+        return records
+    with open(output_path, "rb") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(record, dict) and type(record.get("task_index")) is int:
+                records[record["task_index"]] = record
+    return records
+
+
+def write_records(output_path: str, records: Iterable[Dict[str, Any]]) -> None:
+    """Replaces the content of `output_path` with `records`, atomically."""
+    directory = os.path.dirname(os.path.abspath(output_path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+    os.replace(tmp_path, output_path)
+
+
+_worker_env: Optional[Env] = None
+_worker_config: Dict[str, Any] = {}
+
+
+def _build_env(config: Dict[str, Any], user_strategy: Optional[str] = None) -> Env:
+    return get_env(
+        config["env"],
+        user_strategy=user_strategy or config["user_strategy"],
+        user_model=config["user_model"],
+        task_split=config["task_split"],
+        user_provider=config["user_provider"],
+        task_index=0,
+        user_rules=config["user_rules"],
+        user_latency=config["user_latency"],
+    )
+
+
+def _init_worker(config: Dict[str, Any]) -> None:
+    global _worker_env, _worker_config
+    _worker_config = config
+    if config["completion_cache"] is not None:
+        set_completion_cache(
+            CompletionCache(
+                config["completion_cache"], mode=CacheMode(config["completion_cache_mode"])
+            )
+        )
+    _worker_env = _build_env(config)
+
+
+def _run_episode(task_index: int) -> Dict[str, Any]:
+    assert _worker_env is not None
+    env = _worker_env
+    config = _worker_config
+    seed = episode_seed(config["seed"], task_index)
+    random.seed(seed)
+    record: Dict[str, Any] = {"task_index": task_index, "seed": seed}
+    try:
+        policy = load_policy(config["policy"])
+        reset_response = env.reset(task_index=task_index)
+        observation = reset_response.observation
+        steps: List[Dict[str, Any]] = []
+        reward_result = None
+        for _ in range(config["max_steps"]):
+            action = policy(env, observation)
+            if action is None:
+                break
+            response = env.step(action)
+            steps.append(response.model_dump())
+            observation = response.observation
+            if response.done:
+                reward_result = response.info.reward_info
+                break
+        if reward_result is None:
+            reward_result = env.calculate_reward()
+        record["reward"] = reward_result.reward
+        record["reward_result"] = reward_result.model_dump()
+        record["steps"] = steps
+    except Exception:
+        record["error"] = traceback.format_exc()
+    return record
+
+
+def run(
+    env: str,
+    task_split: str,
+    user_strategy: str,
+    user_model: str,
+    output_path: str,
+    user_provider: Optional[str] = None,
+    task_ids: Optional[List[int]] = None,
+    num_workers: int = 1,
+    seed: int = 0,
+    max_steps: int = 30,
+    policy: str = "envs.runner:replay_policy",
+    completion_cache: Optional[str] = None,
+    completion_cache_mode: str = CacheMode.READ_WRITE.value,
+    user_rules: Optional[List[Tuple[str, str]]] = None,
+    user_latency: float = 0.0,
+) -> List[Dict[str, Any]]:
+    """Runs the episodes of a task split concurrently and streams them to JSONL.
+
+    Tasks already recorded in `output_path` without an error are skipped, so
+    an interrupted run can be resumed by calling `run` again with the same
+    arguments; the file keeps one record per task. Each
+    episode seeds `random` from `seed` and its task index, so results do not
+    depend on which worker ran them or in which order. With
+    `completion_cache`, user-simulator completions are recorded to (or, in
+    replay mode, served only from) that SQLite file. `user_rules` and
+    `user_latency` configure the scripted user.
+    """
+    config = {
+        "env": env,
+        "task_split": task_split,
+        "user_strategy": user_strategy,
+        "user_model": user_model,
+        "user_provider": user_provider,
+        "seed": seed,
+        "max_steps": max_steps,
+        "policy": policy,
+        "completion_cache": completion_cache,
+        "completion_cache_mode": completion_cache_mode,
+        "user_rules": user_rules,
+        "user_latency": user_latency,
+    }
+    # Loading the data in the parent lets forked workers share its pages. The
+    # parent's user is scripted: LLM users call the model when built, and the
+    # completion cache is only opened in the workers, so no SQLite connection
+    # crosses the fork.
+    env_tasks = _build_env(config, user_strategy="scripted").tasks
+    if task_ids is None:
+        task_ids = list(range(len(env_tasks)))
+    previous = load_records(output_path)
+    completed = {task_index for task_index, record in previous.items() if "error" not in record}
+    pending = [task_index for task_index in task_ids if task_index not in completed]
+    print(f"Running {len(pending)} tasks ({len(completed)} already completed)")
+    if os.path.exists(output_path):
+        # One record per task: drop torn lines, superseded records and the
+        # errors of the tasks about to run again.
+        rerun = set(pending)
+        write_records(
+            output_path,
+            [record for task_index, record in previous.items() if task_index not in rerun],
+        )
+
+    records: List[Dict[str, Any]] = []
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else None)
+    with open(output_path, "a") as f, context.Pool(
+        processes=num_workers, initializer=_init_worker, initargs=(config,)
+    ) as pool:
+        for record in pool.imap_unordered(_run_episode, pending):
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+            records.append(record)
+            status = "error" if "error" in record else f"reward={record['reward']}"
+            print(f"Task {record['task_index']}: {status}")
+    return records
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run episodes in parallel.")
+    parser.add_argument("--env", type=str, default="retail")
+    parser.add_argument("--task-split", type=str, default="test")
+    parser.add_argument("--user-strategy", type=str, default="llm")
+    parser.add_argument("--user-model", type=str, default="gpt-4o")
+    parser.add_argument("--user-provider", type=str, default=None)
+    parser.add_argument(
+        "--user-rules", type=str, default=None, help="JSON file of [pattern, reply] pairs for the scripted user"
+    )
+    parser.add_argument("--user-latency", type=float, default=0.0)
+    parser.add_argument("--task-ids", type=int, nargs="+", default=None)
+    parser.add_argument("--num-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-steps", type=int, default=30)
+    parser.add_argument("--policy", type=str, default="envs.runner:replay_policy")
+    parser.add_argument("--completion-cache", type=str, default=None)
+    parser.add_argument(
+        "--completion-cache-mode",
+        type=str,
+        default=CacheMode.READ_WRITE.value,
+        choices=[mode.value for mode in CacheMode],
+    )
+    parser.add_argument("--output", type=str, required=True)
+    args = parser.parse_args()
+
+    records = run(
+        env=args.env,
+        task_split=args.task_split,
+        user_strategy=args.user_strategy,
+        user_model=args.user_model,
+        output_path=args.output,
+        user_provider=args.user_provider,
+        task_ids=args.task_ids,
+        num_workers=args.num_workers,
+        seed=args.seed,
+        max_steps=args.max_steps,
+        policy=args.policy,
+        completion_cache=args.completion_cache,
+        completion_cache_mode=args.completion_cache_mode,
+        user_rules=load_user_rules(args.user_rules) if args.user_rules else None,
+        user_latency=args.user_latency,
+    )
+    rewards = [record["reward"] for record in records if "error" not in record]
+    if rewards:
+        print(f"Average reward: {sum(rewards) / len(rewards):.3f} over {len(rewards)} tasks")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import threading
+from typing import Any, Dict, List, Mapping, Optional
+
+
+def max_numeric_id(table: Dict[str, Any]) -> int:
+    stored = getattr(table, "max_id", None)
+    if stored is not None:
+        return stored
+    ids = [int(k) for k in table.keys() if k.isdigit()]
+    return max(ids) if ids else 0
+
+
+class SequenceAllocator(object):
+    """Hands out the next numeric string id of each table in O(1).
+
+    Seeded once from the loaded tables, then advanced by the store whenever
+    a row is inserted; the store rewinds it on rollback, so only committed
+    inserts consume ids. Each store owns its allocator, so concurrent
+    episodes never share one.
+    """
+
+    def __init__(self, tables: Optional[Dict[str, Any]] = None) -> None:
+        self.next_ids: Dict[str, int] = {}
+        self.lock = threading.Lock()
+        for table_name, table in (tables or {}).items():
+            if isinstance(table, Mapping):
+                self.next_ids[table_name] = max_numeric_id(table) + 1
+
+    def fork(self) -> "SequenceAllocator":
+        allocator = SequenceAllocator()
+        allocator.next_ids = dict(self.next_ids)
+        return allocator
+
+    def peek(self, table_name: str, count: int = 1) -> List[str]:
+        """Returns the next `count` ids without reserving them."""
+        start = self.next_ids.get(table_name, 1)
+        return [str(start + offset) for offset in range(count)]
+
+    def advance(self, table_name: str, row_id: str) -> None:
+        if not row_id.isdigit():
+            return
+        with self.lock:
+            if int(row_id) >= self.next_ids.get(table_name, 1):
+                self.next_ids[table_name] = int(row_id) + 1
+
+    def get_state(self) -> Dict[str, int]:
+        return dict(self.next_ids)
+
+    def set_state(self, state: Dict[str, int]) -> None:
+        with self.lock:
+            self.next_ids = dict(state)
+
+
+def next_ids(data: Dict[str, Any], table_name: str, count: int = 1) -> List[str]:
+    """Returns the next `count` free ids of a table.
+
+    Uses the allocator of a `DataStore`, or falls back to scanning the keys.
+    """
+    sequences: Optional[SequenceAllocator] = getattr(data, "sequences", None)
+    if sequences is not None:
+        return sequences.peek(table_name, count)
+    start = max_numeric_id(data.get(table_name, {})) + 1
+    return [str(start + offset) for offset in range(count)]
+
+
+def next_id(data: Dict[str, Any], table_name: str) -> str:
+    return next_ids(data, table_name)[0]
@@ -0,0 +1,108 @@
+import json
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # optional: only speeds up parsing and opt-in encoding
+    orjson = None
+
+Row = Dict[str, Any]
+
+
+def loads(text: str) -> Any:
+    """Parses JSON, through orjson when it is installed.
+
+    orjson rejects the NaN and Infinity literals `json.dumps` may emit, so
+    those documents fall back to the stdlib parser.
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(text)
+
+
+def record_with_id(row_id: str, row: Row, id_column: str, overwrite_id: bool = False) -> Row:
+    """The row as a getter returns it, with its id in `id_column`.
+
+    The row itself is returned when it already holds the id, since
+    serializing it never mutates it; otherwise a copy gets the id. With
+    `overwrite_id`, a differing stored id is replaced rather than kept.
+    """
+    if id_column in row and (not overwrite_id or row[id_column] == row_id):
+        return row
+    record = row.copy()
+    record[id_column] = row_id
+    return record
+
+
+class Serializer(object):
+    """Encodes tool results into observation strings.
+
+    The default encoding is byte for byte that of `json.dumps`. Encoded
+    getter records are cached per (table, id) and reused for as long as the
+    table still holds the very same row object: stores replace a row on
+    every write, and tables shared between episodes keep their rows, so an
+    identity check is enough to detect changes. Tables that materialize a
+    fresh dict per access (`materializes_rows`) are not cached.
+    """
+
+    item_separator = ", "
+    key_separator = ": "
+
+    def __init__(self, max_cached_rows: int = 100_000) -> None:
+        self.encoder = json.JSONEncoder()
+        self.max_cached_rows = max_cached_rows
+        self.row_cache: Dict[Tuple[str, str, str, bool], Tuple[Row, str]] = {}
+
+    def dumps(self, obj: Any) -> str:
+        return self.encoder.encode(obj)
+
+    def encode_record(
+        self,
+        table: Any,
+        table_name: str,
+        row_id: str,
+        row: Row,
+        id_column: str,
+        overwrite_id: bool = False,
+    ) -> str:
+        if getattr(table, "materializes_rows", False):
+            return self.dumps(record_with_id(row_id, row, id_column, overwrite_id))
+        key = (table_name, row_id, id_column, overwrite_id)
+        cached = self.row_cache.get(key)
+        if cached is not None and cached[0] is row:
+            return cached[1]
+        text = self.dumps(record_with_id(row_id, row, id_column, overwrite_id))
+        if len(self.row_cache) >= self.max_cached_rows:
+            self.row_cache.clear()
+        self.row_cache[key] = (row, text)
+        return text
+
+
+class OrjsonSerializer(Serializer):
+    """Encodes with orjson: faster, but compact and not escaping non-ASCII.
+
+    Observations then differ in bytes from the stdlib encoding, so use it
+    only where nothing compares observation text byte for byte.
+    """
+
+    item_separator = ","
+    key_separator = ":"
+
+    def __init__(self, max_cached_rows: int = 100_000) -> None:
+        if orjson is None:
+            raise ImportError("OrjsonSerializer requires the orjson package")
+        super().__init__(max_cached_rows)
+
+    def dumps(self, obj: Any) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+
+
+DEFAULT_SERIALIZER = Serializer()
+
+
+def get_serializer(data: Any) -> Serializer:
+    """The serializer configured on `data`, or the shared default."""
+    return getattr(data, "serializer", None) or DEFAULT_SERIALIZER
@@ -0,0 +1,397 @@
+"""Serves environments over HTTP to many clients from one process.
+
+    python -m envs.server --env retail --port 8000 --max-sessions 64
+
+Every session is an `Env` of its own (task, user simulator, actions), but
+all of them check out their data from the process-wide snapshot of the
+dataset (see `envs.snapshot`), so the tables and indexes are loaded once
+and a session only copies the tables it writes to.
+
+    GET    /health                  server status and session count
+    POST   /sessions                {"task_index": 3} -> session_id and the reset response
+    GET    /sessions/{id}           task index and actions taken so far
+    GET    /sessions/{id}/tools     tool schemas and the policy (wiki)
+    POST   /sessions/{id}/reset     {"task_index": 3} -> reset response
+    POST   /sessions/{id}/step      {"name": ..., "kwargs": {...}} -> step response
+    GET    /sessions/{id}/reward    reward of the session's current state
+    DELETE /sessions/{id}
+
+Requests and responses are JSON. Connections are kept alive between
+requests (HTTP/1.1), requests of one session are handled one at a time,
+and sessions idle for longer than `session_ttl` are dropped.
+
+With `durable_dir`, each session logs its data changes to a directory of
+its own (see `envs.wal`) and a restarted server recovers the sessions
+found there, with the data and task they had; the actions taken before
+the restart are not kept.
+"""
+import argparse
+import asyncio
+import json
+import os
+import secrets
+import shutil
+import time
+from http import HTTPStatus
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from pydantic import ValidationError
+
+from envs.base import Env
+from envs.files import replace_file
+from types import Action
+
+# Builds the env of a session for a task index (None for a random task),
+# persisting its data to a directory when one is given.
+EnvFactory = Callable[[Optional[int], Optional[str]], Env]
+
+MAX_HEADER_BYTES = 64 * 1024
+SESSION_FILE = "session.json"
+
+
+class HTTPError(Exception):
+    def __init__(self, status: HTTPStatus, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class Request(object):
+    def __init__(self, method: str, path: str, version: str, headers: Dict[str, str], body: bytes) -> None:
+        self.method = method
+        self.path = path
+        self.version = version
+        self.headers = headers
+        self.body = body
+
+    @property
+    def keep_alive(self) -> bool:
+        connection = self.headers.get("connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
+    def json(self) -> Dict[str, Any]:
+        if not self.body:
+            return {}
+        try:
+            payload = json.loads(self.body)
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Body is not valid JSON")
+        if not isinstance(payload, dict):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Body must be a JSON object")
+        return payload
+
+
+async def read_request(reader: asyncio.StreamReader, max_body_bytes: int) -> Optional[Request]:
+    """Reads one request; None when the client closed the connection between requests."""
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError as e:
+        if not e.partial:
+            return None
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Incomplete request")
+    except asyncio.LimitOverrunError:
+        raise HTTPError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Request headers too large")
+    lines = head.decode("latin-1").split("\r\n")
+    try:
+        method, target, version = lines[0].split(" ", 2)
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed request line")
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        raise HTTPError(HTTPStatus.NOT_IMPLEMENTED, "Chunked request bodies are not supported")
+    try:
+        length = int(headers.get("content-length", "0"))
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+    if length < 0 or length > max_body_bytes:
+        raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"Bodies are limited to {max_body_bytes} bytes")
+    try:
+        body = await reader.readexactly(length) if length else b""
+    except asyncio.IncompleteReadError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Incomplete request body")
+    return Request(method.upper(), target.split("?", 1)[0], version, headers, body)
+
+
+def encode_response(status: HTTPStatus, payload: Any, keep_alive: bool) -> bytes:
+    body = json.dumps(payload, default=str).encode("utf-8")
+    head = (
+        f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    return head.encode("latin-1") + body
+
+
+class Session(object):
+    def __init__(self, session_id: str, env: Env, directory: Optional[str] = None) -> None:
+        self.session_id = session_id
+        self.env = env
+        self.directory = directory
+        self.lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+
+    def save(self) -> None:
+        """Records the session's task next to its log."""
+        if self.directory is not None:
+            state = {"task_index": self.env.task_index}
+            replace_file(
+                self.directory,
+                os.path.join(self.directory, SESSION_FILE),
+                lambda f: json.dump(state, f),
+            )
+
+    def close(self) -> None:
+        self.env.close()
+        if self.directory is not None:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class EnvServer(object):
+    """Hosts isolated sessions over one shared dataset.
+
+    At most `max_sessions` sessions exist at a time; creating one more
+    first drops those idle for `session_ttl` seconds and otherwise fails
+    with 429. Idle connections are closed after `keep_alive_timeout`.
+    """
+
+    def __init__(
+        self,
+        make_env: EnvFactory,
+        max_sessions: int = 64,
+        session_ttl: float = 600.0,
+        keep_alive_timeout: float = 30.0,
+        max_body_bytes: int = 1024 * 1024,
+        durable_dir: Optional[str] = None,
+    ) -> None:
+        self.make_env = make_env
+        self.durable_dir = durable_dir
+        self.max_sessions = max_sessions
+        self.session_ttl = session_ttl
+        self.keep_alive_timeout = keep_alive_timeout
+        self.max_body_bytes = max_body_bytes
+        self.sessions: Dict[str, Session] = {}
+        self.requests_served = 0
+
+    def expire_sessions(self) -> None:
+        deadline = time.monotonic() - self.session_ttl
+        for session_id, session in list(self.sessions.items()):
+            if session.last_used < deadline and not session.lock.locked():
+                del self.sessions[session_id]
+                session.close()
+
+    def recover_sessions(self) -> None:
+        """Reopens the sessions persisted under `durable_dir`."""
+        if self.durable_dir is None or not os.path.isdir(self.durable_dir):
+            return
+        for session_id in sorted(os.listdir(self.durable_dir)):
+            directory = os.path.join(self.durable_dir, session_id)
+            path = os.path.join(directory, SESSION_FILE)
+            if session_id in self.sessions or not os.path.exists(path):
+                continue
+            with open(path) as f:
+                task_index = json.load(f)["task_index"]
+            env = self.make_env(task_index, directory)
+            self.sessions[session_id] = Session(session_id, env, directory)
+
+    def get_session(self, session_id: str) -> Session:
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"Unknown session {session_id}")
+        session.last_used = time.monotonic()
+        return session
+
+    async def create_session(self, task_index: Optional[int]) -> Dict[str, Any]:
+        if len(self.sessions) >= self.max_sessions:
+            self.expire_sessions()
+        if len(self.sessions) >= self.max_sessions:
+            raise HTTPError(HTTPStatus.TOO_MANY_REQUESTS, f"Session limit of {self.max_sessions} reached")
+        session_id = secrets.token_hex(16)
+        directory = None
+        if self.durable_dir is not None:
+            directory = os.path.join(self.durable_dir, session_id)
+            os.makedirs(directory)
+        # Building an env loads data and may start the user simulator with a
+        # blocking completion, so it runs off the event loop.
+        env = await asyncio.to_thread(self.make_env, task_index, directory)
+        session = Session(session_id, env, directory)
+        # Registered before the reset so that concurrent creations count it.
+        self.sessions[session.session_id] = session
+        try:
+            async with session.lock:
+                response = await env.areset(task_index=env.task_index)
+                session.save()
+        except Exception:
+            del self.sessions[session.session_id]
+            session.close()
+            raise
+        return {"session_id": session.session_id, **response.model_dump()}
+
+    async def route(self, request: Request) -> Tuple[HTTPStatus, Any]:
+        parts = [part for part in request.path.split("/") if part]
+        method = request.method
+        if parts == ["health"] and method == "GET":
+            return HTTPStatus.OK, {
+                "status": "ok",
+                "sessions": len(self.sessions),
+                "max_sessions": self.max_sessions,
+            }
+        if parts == ["sessions"] and method == "POST":
+            task_index = _task_index(request.json())
+            return HTTPStatus.CREATED, await self.create_session(task_index)
+        if len(parts) not in (2, 3) or parts[0] != "sessions":
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"No route for {request.path}")
+        session = self.get_session(parts[1])
+        env = session.env
+        endpoint = (method, parts[2] if len(parts) == 3 else None)
+        if endpoint == ("GET", None):
+            return HTTPStatus.OK, {
+                "session_id": session.session_id,
+                "task_index": env.task_index,
+                "actions": [action.model_dump() for action in env.actions],
+            }
+        if endpoint == ("DELETE", None):
+            del self.sessions[session.session_id]
+            async with session.lock:
+                session.close()
+            return HTTPStatus.OK, {"session_id": session.session_id, "deleted": True}
+        if endpoint == ("GET", "tools"):
+            return HTTPStatus.OK, {"tools": env.tools_info, "wiki": env.wiki, "rules": env.rules}
+        if endpoint == ("POST", "reset"):
+            task_index = _task_index(request.json())
+            async with session.lock:
+                response = await env.areset(task_index=task_index)
+                session.save()
+            return HTTPStatus.OK, response.model_dump()
+        if endpoint == ("POST", "step"):
+            try:
+                action = Action(**request.json())
+            except ValidationError as e:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, f"Invalid action: {e}")
+            async with session.lock:
+                response = await env.astep(action)
+            return HTTPStatus.OK, response.model_dump()
+        if endpoint == ("GET", "reward"):
+            async with session.lock:
+                reward = await asyncio.to_thread(env.calculate_reward)
+            return HTTPStatus.OK, reward.model_dump()
+        raise HTTPError(HTTPStatus.NOT_FOUND, f"No route for {method} {request.path}")
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            keep_alive = True
+            while keep_alive:
+                try:
+                    request = await asyncio.wait_for(
+                        read_request(reader, self.max_body_bytes), self.keep_alive_timeout
+                    )
+                except asyncio.TimeoutError:
+                    break
+                except HTTPError as e:
+                    # The rest of a malformed request cannot be skipped reliably.
+                    writer.write(encode_response(e.status, {"error": e.message}, False))
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                keep_alive = request.keep_alive
+                try:
+                    status, payload = await self.route(request)
+                except HTTPError as e:
+                    status, payload = e.status, {"error": e.message}
+                except Exception as e:
+                    status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"{type(e).__name__}: {e}"}
+                self.requests_served += 1
+                writer.write(encode_response(status, payload, keep_alive))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def expire_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(max(self.session_ttl / 2, 1.0))
+            self.expire_sessions()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8000) -> None:
+        await asyncio.to_thread(self.recover_sessions)
+        server = await asyncio.start_server(
+            self.handle_connection, host, port, limit=MAX_HEADER_BYTES
+        )
+        expiry = asyncio.ensure_future(self.expire_periodically())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            expiry.cancel()
+
+
+def _task_index(payload: Dict[str, Any]) -> Optional[int]:
+    task_index = payload.get("task_index")
+    if task_index is not None and (type(task_index) is not int or task_index < 0):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "task_index must be a non-negative integer")
+    return task_index
+
+
+def main() -> None:
+    from envs import get_env
+    from envs.user import load_user_rules
+
+    parser = argparse.ArgumentParser(description="Serve an environment to many clients over HTTP.")
+    parser.add_argument("--env", type=str, default="retail")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-sessions", type=int, default=64)
+    parser.add_argument("--session-ttl", type=float, default=600.0)
+    parser.add_argument("--keep-alive-timeout", type=float, default=30.0)
+    parser.add_argument("--task-split", type=str, default="test")
+    parser.add_argument("--user-strategy", type=str, default="llm")
+    parser.add_argument("--user-model", type=str, default="gpt-4o")
+    parser.add_argument("--user-provider", type=str, default=None)
+    parser.add_argument(
+        "--user-rules", type=str, default=None, help="JSON file of [pattern, reply] pairs for the scripted user"
+    )
+    parser.add_argument("--user-latency", type=float, default=0.0)
+    parser.add_argument(
+        "--durable-dir", type=str, default=None, help="Persist sessions there and recover them on startup"
+    )
+    args = parser.parse_args()
+    user_rules = load_user_rules(args.user_rules) if args.user_rules else None
+
+    def make_env(task_index: Optional[int], durable_dir: Optional[str]) -> Env:
+        return get_env(
+            args.env,
+            user_strategy=args.user_strategy,
+            user_model=args.user_model,
+            task_split=args.task_split,
+            user_provider=args.user_provider,
+            task_index=task_index,
+            user_rules=user_rules,
+            user_latency=args.user_latency,
+            durable_dir=durable_dir,
+        )
+
+    server = EnvServer(
+        make_env,
+        max_sessions=args.max_sessions,
+        session_ttl=args.session_ttl,
+        keep_alive_timeout=args.keep_alive_timeout,
+        durable_dir=args.durable_dir,
+    )
+    print(f"Serving {args.env} on http://{args.host}:{args.port}")
+    asyncio.run(server.serve(args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
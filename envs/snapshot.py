@@ -0,0 +1,131 @@
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from envs.hashing import DataHasher
+from envs.index import IndexColumns, IndexManager
+from envs.sequence import SequenceAllocator
+from envs.store import DataStore, MaterializedView, RowChange
+
+# Builds a view over the snapshot tables.
+ViewFactory = Callable[[Dict[str, Any]], MaterializedView]
+
+# Committed changes a pending view holds before it is built anyway.
+MAX_PENDING_CHANGES = 10000
+
+
+class Snapshot(object):
+    """A dataset parsed once and shared read-only by every episode.
+
+    `checkout` hands out a `DataStore` that references the snapshot's tables,
+    indexes, table hashes and id sequences; only the tables an episode writes
+    to are copied. Materialized views registered by `add_views` are built
+    once, when a checkout first reads one, and forked into every checkout
+    that asks for them.
+    """
+
+    def __init__(self, tables: Dict[str, Any], index_columns: Optional[IndexColumns] = None) -> None:
+        self.tables = tables
+        self.index_columns = index_columns
+        self.indexes = IndexManager(tables, index_columns)
+        self.indexes.build()
+        self.hasher = DataHasher(tables)
+        self.fingerprint = self.hasher.get_root_hash(tables)
+        self.sequences = SequenceAllocator(tables)
+        self.view_factories: Dict[str, ViewFactory] = {}
+        self.views: Dict[str, MaterializedView] = {}
+        self.views_lock = threading.Lock()
+
+    def add_views(self, factories: Dict[str, ViewFactory]) -> None:
+        with self.views_lock:
+            for name, factory in factories.items():
+                self.view_factories.setdefault(name, factory)
+
+    def get_view(self, name: str) -> MaterializedView:
+        """The view `name` over the snapshot tables, building it on first use."""
+        with self.views_lock:
+            view = self.views.get(name)
+            if view is None:
+                view = self.view_factories[name](self.tables)
+                self.views[name] = view
+            return view
+
+    def checkout(self, views: Iterable[str] = ()) -> DataStore:
+        store = DataStore(
+            self.tables,
+            self.index_columns,
+            base_indexes=self.indexes,
+            base_hasher=self.hasher,
+            base_sequences=self.sequences,
+        )
+        for name in views:
+            if name not in self.view_factories:
+                raise KeyError(f"Unknown view {name}")
+            view = self.views.get(name)
+            store.attach_view(name, view.fork(store) if view is not None else PendingView(self, name, store))
+        return store
+
+
+class PendingView(MaterializedView):
+    """Stands in for a view of a checkout until the view is first read.
+
+    It keeps the changes committed in the meantime; `resolve` forks the
+    snapshot's view (building it if no checkout did yet), catches the fork
+    up with those changes and attaches it in its place.
+    """
+
+    def __init__(self, snapshot: Snapshot, name: str, store: DataStore) -> None:
+        self.snapshot = snapshot
+        self.name = name
+        self.store = store
+        self.changes: List[RowChange] = []
+
+    def on_commit(self, changes: List[RowChange]) -> None:
+        self.changes.extend(changes)
+        if len(self.changes) > MAX_PENDING_CHANGES:
+            self.resolve()
+
+    def resolve(self) -> MaterializedView:
+        view = self.snapshot.get_view(self.name).fork(self.store)
+        if self.changes:
+            view.on_commit(self.changes)
+        self.store.attach_view(self.name, view)
+        return view
+
+
+# Index columns with tables and columns in a canonical order.
+IndexColumnsKey = Tuple[Tuple[str, Tuple[Any, ...]], ...]
+
+_snapshots: Dict[Tuple[Callable[[], Dict[str, Any]], IndexColumnsKey], Snapshot] = {}
+_snapshots_lock = threading.Lock()
+
+
+def index_key(index_columns: Optional[IndexColumns]) -> IndexColumnsKey:
+    return tuple(
+        sorted(
+            (table_name, tuple(sorted(set(columns), key=repr)))
+            for table_name, columns in (index_columns or {}).items()
+            if columns
+        )
+    )
+
+
+def load_snapshot(
+    data_load_func: Callable[[], Dict[str, Any]],
+    index_columns: Optional[IndexColumns] = None,
+) -> Snapshot:
+    """Returns the process-wide snapshot of `data_load_func` with `index_columns`.
+
+    The tables are loaded once per function; asking for other index columns
+    gets another snapshot over the same tables, with its own indexes.
+    """
+    key = index_key(index_columns)
+    with _snapshots_lock:
+        snapshot = _snapshots.get((data_load_func, key))
+        if snapshot is None:
+            tables = next(
+                (other.tables for (func, _), other in _snapshots.items() if func is data_load_func),
+                None,
+            )
+            snapshot = Snapshot(data_load_func() if tables is None else tables, index_columns)
+            _snapshots[(data_load_func, key)] = snapshot
+        return snapshot
@@ -0,0 +1,227 @@
+from typing import Any, Dict, List, NamedTuple, Optional, Set
+
+from envs.hashing import DataHasher
+from envs.index import IndexColumns, IndexedData, IndexManager, Row
+from envs.sequence import SequenceAllocator
+from envs.serialization import loads
+
+Delta = Dict[str, Dict[str, Row]]
+
+
+class RowChange(NamedTuple):
+    table_name: str
+    row_id: str
+    old: Optional[Row]
+    new: Optional[Row]
+
+
+class StoreListener(object):
+    """Receives every row change made through a `DataStore`.
+
+    `on_row_change` fires as soon as a row is written (including the inverse
+    writes of a rollback); `on_commit` fires once per outermost commit with the
+    changes that became durable.
+    """
+
+    def on_row_change(self, change: RowChange) -> None:
+        pass
+
+    def on_commit(self, changes: List[RowChange]) -> None:
+        pass
+
+
+class MaterializedView(StoreListener):
+    """Derived data kept up to date by the commits of a `DataStore`.
+
+    A view is built once over the snapshot tables and then forked for every
+    checkout (see `envs.snapshot`); a fork shares the snapshot's state and
+    records only what its own commits change, so forking is O(1).
+    """
+
+    def fork(self, store: "DataStore") -> "MaterializedView":
+        raise NotImplementedError
+
+    def resolve(self) -> "MaterializedView":
+        """The view to read; a placeholder returns the view it stands for."""
+        return self
+
+
+def extract_delta(observation: str) -> Delta:
+    """Returns the `delta` payload of a successful setter response, if any."""
+    if '"delta"' not in observation:
+        return {}
+    try:
+        payload = loads(observation)
+    except ValueError:
+        return {}
+    if not isinstance(payload, dict) or not payload.get("success", True):
+        return {}
+    delta = payload.get("delta")
+    return delta if isinstance(delta, dict) else {}
+
+
+class DataStore(IndexedData):
+    """Transactional in-memory store over the environment tables.
+
+    Deltas are applied in place: existing rows are replaced by a merged copy
+    and new rows are inserted, so the cost is proportional to the delta. Every
+    write is logged so that `rollback` can restore the previous rows without
+    reloading anything. Transactions nest; only the outermost `commit` makes
+    the changes final.
+
+    When `base_indexes` is given, the tables of `data` are treated as shared
+    with other stores (see `envs.snapshot`): a table is copied, together with
+    its indexes, the first time it is written to. `base_hasher` and
+    `base_sequences` likewise seed the incremental data hash and the id
+    sequences from the shared tables.
+    """
+
+    def __init__(
+        self,
+        data: Dict[str, Any],
+        index_columns: Optional[IndexColumns] = None,
+        base_indexes: Optional[IndexManager] = None,
+        base_hasher: Optional[DataHasher] = None,
+        base_sequences: Optional[SequenceAllocator] = None,
+    ) -> None:
+        super().__init__(data, index_columns)
+        if base_indexes is not None:
+            self.indexes = base_indexes.fork(self)
+            self._owned_tables: Set[str] = set()
+        else:
+            self._owned_tables = set(self)
+        self.hasher = base_hasher.fork() if base_hasher is not None else None
+        self.sequences = (
+            base_sequences.fork()
+            if base_sequences is not None
+            else SequenceAllocator(self)
+        )
+        self.listeners: List[StoreListener] = []
+        self.views: Dict[str, MaterializedView] = {}
+        self._log: List[RowChange] = []
+        self._created_tables: Dict[str, int] = {}
+        self._savepoints: List[int] = []
+        self._sequence_states: List[Dict[str, int]] = []
+        self.rows_written = 0
+
+    @property
+    def in_transaction(self) -> bool:
+        return len(self._savepoints) > 0
+
+    def begin(self) -> None:
+        self._savepoints.append(len(self._log))
+        self._sequence_states.append(self.sequences.get_state())
+
+    def commit(self) -> None:
+        if not self._savepoints:
+            raise RuntimeError("No active transaction to commit")
+        self._savepoints.pop()
+        self._sequence_states.pop()
+        if self._savepoints:
+            return
+        changes = self._log
+        self._log = []
+        self._created_tables = {}
+        for listener in self.listeners:
+            listener.on_commit(changes)
+
+    def rollback(self) -> None:
+        if not self._savepoints:
+            raise RuntimeError("No active transaction to roll back")
+        savepoint = self._savepoints.pop()
+        while len(self._log) > savepoint:
+            change = self._log.pop()
+            self._write(change.table_name, change.row_id, change.old)
+        self.sequences.set_state(self._sequence_states.pop())
+        for table_name, position in list(self._created_tables.items()):
+            if position >= savepoint:
+                del self._created_tables[table_name]
+                del self[table_name]
+
+    def attach_view(self, name: str, view: MaterializedView) -> None:
+        """Attaches `view` under `name`, in place of the view already there."""
+        previous = self.views.get(name)
+        self.views[name] = view
+        if previous is not None and previous in self.listeners:
+            self.listeners[self.listeners.index(previous)] = view
+        else:
+            self.listeners.append(view)
+
+    def get_view(self, name: str) -> Optional[MaterializedView]:
+        view = self.views.get(name)
+        return None if view is None else view.resolve()
+
+    def get_data_hash(self) -> str:
+        return self._get_hasher().get_root_hash(self)
+
+    def get_table_hashes(self) -> Dict[str, str]:
+        """Per-table hashes, to tell which table diverged from another store."""
+        return self._get_hasher().get_table_hashes(self)
+
+    def get_row(self, table_name: str, row_id: str) -> Optional[Row]:
+        return self.get(table_name, {}).get(row_id)
+
+    def put_row(self, table_name: str, row_id: str, row: Optional[Row]) -> RowChange:
+        """Inserts, replaces or (with `row=None`) deletes a single row."""
+        if not self._savepoints:
+            raise RuntimeError("Writes require an active transaction")
+        if table_name not in self:
+            self._created_tables[table_name] = len(self._log)
+            self._owned_tables.add(table_name)
+            self[table_name] = {}
+        old = self._write(table_name, row_id, row)
+        change = RowChange(table_name, row_id, old, row)
+        self._log.append(change)
+        self.rows_written += 1
+        return change
+
+    def apply_delta(self, delta: Delta) -> List[RowChange]:
+        """Merges a tool `delta` payload into the tables as one transaction."""
+        changes: List[RowChange] = []
+        self.begin()
+        try:
+            for table_name, rows in delta.items():
+                if not isinstance(rows, dict):
+                    raise ValueError(f"Invalid delta for table {table_name}")
+                for row_id, updates in rows.items():
+                    if not isinstance(updates, dict):
+                        raise ValueError(f"Invalid delta for {table_name}/{row_id}")
+                    old = self.get_row(table_name, row_id)
+                    row = dict(old) if old is not None else {}
+                    row.update(updates)
+                    changes.append(self.put_row(table_name, row_id, row))
+        except Exception:
+            self.rollback()
+            raise
+        self.commit()
+        return changes
+
+    def _write(self, table_name: str, row_id: str, row: Optional[Row]) -> Optional[Row]:
+        if table_name not in self._owned_tables:
+            self._own(table_name)
+        table = self[table_name]
+        if row is None:
+            old = table.pop(row_id, None)
+        else:
+            old = table.get(row_id)
+            table[row_id] = row
+        self.indexes.update_row(table_name, row_id, old, row)
+        if self.hasher is not None:
+            self.hasher.update_row(table_name, row_id, old, row)
+        if old is None and row is not None:
+            self.sequences.advance(table_name, row_id)
+        change = RowChange(table_name, row_id, old, row)
+        for listener in self.listeners:
+            listener.on_row_change(change)
+        return old
+
+    def _own(self, table_name: str) -> None:
+        table = self[table_name].copy()
+        self[table_name] = table
+        self.indexes.detach(table_name, table)
+        self._owned_tables.add(table_name)
+
+    def _get_hasher(self) -> DataHasher:
+        if self.hasher is None:
+            self.hasher = DataHasher(self)
+        return self.hasher
@@ -1,8 +1,96 @@
 import abc
+import asyncio
 import enum
-from litellm import completion
+import json
+import re
+import time
+import weakref
+from litellm import ModelResponse, acompletion, completion
+
+from typing import Optional, List, Dict, Any, Sequence, Tuple, Union
+
+from envs.completion_cache import CompletionCache
+from types import Action, Task, RESPOND_ACTION_NAME
+
+_max_concurrent_completions: Optional[int] = None
+# A semaphore belongs to the event loop it is first used in, so each loop gets its own.
+_completion_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+    weakref.WeakKeyDictionary()
+)
+_completion_cache: Optional[CompletionCache] = None
+
+
+def set_max_concurrent_completions(limit: Optional[int]) -> None:
+    """Caps the number of in-flight async completions per event loop (None for no cap)."""
+    global _max_concurrent_completions
+    _max_concurrent_completions = limit
+    _completion_semaphores.clear()
+
+
+def _completion_semaphore() -> Optional[asyncio.Semaphore]:
+    if _max_concurrent_completions is None:
+        return None
+    loop = asyncio.get_running_loop()
+    semaphore = _completion_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(_max_concurrent_completions)
+        _completion_semaphores[loop] = semaphore
+    return semaphore
+
+
+def set_completion_cache(cache: Optional[CompletionCache]) -> None:
+    """Routes every user-simulator completion through `cache` (None to disable)."""
+    global _completion_cache
+    _completion_cache = cache
+
+
+def _lookup_cached_completion(kwargs: Dict[str, Any], attempt: int) -> Optional[Any]:
+    if _completion_cache is None:
+        return None
+    payload = _completion_cache.lookup(
+        kwargs.get("model"), kwargs.get("custom_llm_provider"), kwargs["messages"], attempt
+    )
+    if payload is None:
+        return None
+    res = ModelResponse(**payload)
+    # Replayed responses cost nothing.
+    res._hidden_params = {"response_cost": 0.0}
+    return res
+
+
+def _record_completion(kwargs: Dict[str, Any], res: Any, attempt: int) -> None:
+    if _completion_cache is not None:
+        _completion_cache.record(
+            kwargs.get("model"),
+            kwargs.get("custom_llm_provider"),
+            kwargs["messages"],
+            res.model_dump(),
+            attempt,
+        )
 
-from typing import Optional, List, Dict, Any, Union
+
+def cached_completion(attempt: int = 0, **kwargs: Any) -> Any:
+    """`completion` through the completion cache. Retries of a request pass
+    their `attempt` index so that they are not served the earlier answer."""
+    res = _lookup_cached_completion(kwargs, attempt)
+    if res is None:
+        res = completion(**kwargs)
+        _record_completion(kwargs, res, attempt)
+    return res
+
+
+async def async_completion(attempt: int = 0, **kwargs: Any) -> Any:
+    res = _lookup_cached_completion(kwargs, attempt)
+    if res is not None:
+        return res
+    semaphore = _completion_semaphore()
+    if semaphore is None:
+        res = await acompletion(**kwargs)
+    else:
+        async with semaphore:
+            res = await acompletion(**kwargs)
+    _record_completion(kwargs, res, attempt)
+    return res
 
 
 class BaseUserSimulationEnv(abc.ABC):
@@ -16,6 +104,17 @@ class BaseUserSimulationEnv(abc.ABC):
     def step(self, content: str) -> str:
         raise NotImplementedError
 
+    async def areset(self, instruction: Optional[str] = None) -> str:
+        # Fallback for simulators without a native async implementation.
+        return await asyncio.to_thread(self.reset, instruction)
+
+    async def astep(self, content: str) -> str:
+        return await asyncio.to_thread(self.step, content)
+
+    def set_task(self, task: Task) -> None:
+        # Called by the env before `reset`; only scripted users need the task.
+        pass
+
     @abc.abstractmethod
     def get_total_cost(self) -> float:
         raise NotImplementedError
@@ -41,9 +140,18 @@ class LLMUserSimulationEnv(BaseUserSimulationEnv):
         self.total_cost = 0.0
         self.reset()
 
-    def generate_next_message(self, messages: List[Dict[str, Any]]) -> str:
-        res = completion(
-            model=self.model, custom_llm_provider=self.provider, messages=messages
+    def generate_next_message(self, messages: List[Dict[str, Any]], attempt: int = 0) -> str:
+        res = cached_completion(
+            model=self.model, custom_llm_provider=self.provider, messages=messages, attempt=attempt
+        )
+        message = res.choices[0].message
+        self.messages.append(message.model_dump())
+        self.total_cost = res._hidden_params["response_cost"]
+        return message.content
+
+    async def agenerate_next_message(self, messages: List[Dict[str, Any]], attempt: int = 0) -> str:
+        res = await async_completion(
+            model=self.model, custom_llm_provider=self.provider, messages=messages, attempt=attempt
         )
         message = res.choices[0].message
         self.messages.append(message.model_dump())
@@ -79,6 +187,20 @@ Rules:
         self.messages.append({"role": "user", "content": content})
         return self.generate_next_message(self.messages)
 
+    async def areset(self, instruction: Optional[str] = None) -> str:
+        self.messages = [
+            {
+                "role": "system",
+                "content": self.build_system_prompt(instruction=instruction),
+            },
+            {"role": "user", "content": "Hi! How can I help you today?"},
+        ]
+        return await self.agenerate_next_message(self.messages)
+
+    async def astep(self, content: str) -> str:
+        self.messages.append({"role": "user", "content": content})
+        return await self.agenerate_next_message(self.messages)
+
     def get_total_cost(self) -> float:
         return self.total_cost
 
@@ -112,9 +234,18 @@ Thought:
 User Response:
 <the user response (this will be parsed and sent to the agent)>"""
 
-    def generate_next_message(self, messages: List[Dict[str, Any]]) -> str:
-        res = completion(
-            model=self.model, custom_llm_provider=self.provider, messages=messages
+    def generate_next_message(self, messages: List[Dict[str, Any]], attempt: int = 0) -> str:
+        res = cached_completion(
+            model=self.model, custom_llm_provider=self.provider, messages=messages, attempt=attempt
+        )
+        message = res.choices[0].message
+        self.messages.append(message.model_dump())
+        self.total_cost = res._hidden_params["response_cost"]
+        return self.parse_response(message.content)
+
+    async def agenerate_next_message(self, messages: List[Dict[str, Any]], attempt: int = 0) -> str:
+        res = await async_completion(
+            model=self.model, custom_llm_provider=self.provider, messages=messages, attempt=attempt
         )
         message = res.choices[0].message
         self.messages.append(message.model_dump())
@@ -152,28 +283,96 @@ User Response:
 
 
 class VerifyUserSimulationEnv(LLMUserSimulationEnv):
-    def __init__(self, model: str, provider: str, max_attempts: int = 3) -> None:
+    """Retries a response until the verifier accepts it.
+
+    Attempts run one after the other, as in the sync loop. With
+    `concurrent_attempts`, the async loop starts all of them at once: the
+    first verified one wins and the rest are cancelled, trading extra LLM
+    calls for latency.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        provider: str,
+        max_attempts: int = 3,
+        concurrent_attempts: bool = False,
+    ) -> None:
         self.model = model
         self.provider = provider
         self.max_attempts = max_attempts
+        self.concurrent_attempts = concurrent_attempts
         self.reset()
 
-    def generate_next_message(self, messages: List[Dict[str, Any]]) -> str:
+    def generate_next_message(self, messages: List[Dict[str, Any]], attempt: int = 0) -> str:
         attempts = 0
         cur_message = None
         while attempts < self.max_attempts:
-            res = completion(
-                model=self.model, custom_llm_provider=self.provider, messages=messages
+            res = cached_completion(
+                model=self.model,
+                custom_llm_provider=self.provider,
+                messages=messages,
+                attempt=attempts,
             )
             cur_message = res.choices[0].message
             self.total_cost = res._hidden_params["response_cost"]
-            if verify(self.model, self.provider, cur_message, messages):
+            if verify(self.model, self.provider, cur_message, messages, attempts):
                 self.messages.append(cur_message.model_dump())
                 return cur_message.content
             attempts += 1
         assert cur_message is not None
         return cur_message.content
 
+    async def agenerate_next_message(self, messages: List[Dict[str, Any]], attempt: int = 0) -> str:
+        if self.concurrent_attempts:
+            return await self.agenerate_concurrently(messages)
+        # Like the sync loop, an attempt only starts once the previous one is rejected.
+        attempts = 0
+        cur_message = None
+        while attempts < self.max_attempts:
+            res = await async_completion(
+                model=self.model,
+                custom_llm_provider=self.provider,
+                messages=messages,
+                attempt=attempts,
+            )
+            cur_message = res.choices[0].message
+            self.total_cost = res._hidden_params["response_cost"]
+            if await averify(self.model, self.provider, cur_message, messages, attempts):
+                self.messages.append(cur_message.model_dump())
+                return cur_message.content
+            attempts += 1
+        assert cur_message is not None
+        return cur_message.content
+
+    async def agenerate_concurrently(self, messages: List[Dict[str, Any]]) -> str:
+        async def run_attempt(attempt: int) -> Any:
+            res = await async_completion(
+                model=self.model,
+                custom_llm_provider=self.provider,
+                messages=messages,
+                attempt=attempt,
+            )
+            message = res.choices[0].message
+            verified = await averify(self.model, self.provider, message, messages, attempt)
+            return res, message, verified
+
+        # Attempts all start from the same history, so they can run concurrently.
+        tasks = [asyncio.ensure_future(run_attempt(attempt)) for attempt in range(self.max_attempts)]
+        cur_message = None
+        try:
+            for future in asyncio.as_completed(tasks):
+                res, cur_message, verified = await future
+                self.total_cost = res._hidden_params["response_cost"]
+                if verified:
+                    self.messages.append(cur_message.model_dump())
+                    return cur_message.content
+        finally:
+            for task in tasks:
+                task.cancel()
+        assert cur_message is not None
+        return cur_message.content
+
     def reset(self, instruction: Optional[str] = None) -> str:
         self.messages = [
             {
@@ -201,9 +400,7 @@ def map_role_label(role: str) -> str:
         return role.capitalize()
 
 
-def verify(
-    model: str, provider: str, response: str, messages: List[Dict[str, Any]]
-) -> bool:
+def build_verify_prompt(response: str, messages: List[Dict[str, Any]]) -> str:
     transcript = "\n".join(
         [
             f"{map_role_label(message['role'])}: {message['content']}"
@@ -222,17 +419,42 @@ Your answer will be parsed, so do not include any other text than the classifica
 -----
 
 Classification:"""
-    res = completion(
+    return prompt
+
+
+def verify(
+    model: str,
+    provider: str,
+    response: str,
+    messages: List[Dict[str, Any]],
+    attempt: int = 0,
+) -> bool:
+    res = cached_completion(
         model=model,
         custom_llm_provider=provider,
-        messages=[{"role": "user", "content": prompt}],
+        messages=[{"role": "user", "content": build_verify_prompt(response, messages)}],
+        attempt=attempt,
     )
     return "true" in res.choices[0].message.content.lower()
 
 
-def reflect(
-    model: str, provider: str, response: str, messages: List[Dict[str, Any]]
-) -> str:
+async def averify(
+    model: str,
+    provider: str,
+    response: str,
+    messages: List[Dict[str, Any]],
+    attempt: int = 0,
+) -> bool:
+    res = await async_completion(
+        model=model,
+        custom_llm_provider=provider,
+        messages=[{"role": "user", "content": build_verify_prompt(response, messages)}],
+        attempt=attempt,
+    )
+    return "true" in res.choices[0].message.content.lower()
+
+
+def build_reflect_prompt(response: str, messages: List[Dict[str, Any]]) -> str:
     transcript = "\n".join(
         [
             f"{map_role_label(message['role'])}: {message['content']}"
@@ -256,10 +478,38 @@ Reflection:
 
 Response:
 <the response (this will be parsed and sent to the agent)>"""
-    res = completion(
+    return prompt
+
+
+def reflect(
+    model: str,
+    provider: str,
+    response: str,
+    messages: List[Dict[str, Any]],
+    attempt: int = 0,
+) -> str:
+    res = cached_completion(
         model=model,
         custom_llm_provider=provider,
-        messages=[{"role": "user", "content": prompt}],
+        messages=[{"role": "user", "content": build_reflect_prompt(response, messages)}],
+        attempt=attempt,
+    )
+    _, response = res.choices[0].message.content.split("Response:")
+    return response.strip()
+
+
+async def areflect(
+    model: str,
+    provider: str,
+    response: str,
+    messages: List[Dict[str, Any]],
+    attempt: int = 0,
+) -> str:
+    res = await async_completion(
+        model=model,
+        custom_llm_provider=provider,
+        messages=[{"role": "user", "content": build_reflect_prompt(response, messages)}],
+        attempt=attempt,
     )
     _, response = res.choices[0].message.content.split("Response:")
     return response.strip()
@@ -272,7 +522,7 @@ class ReflectionUserSimulationEnv(LLMUserSimulationEnv):
         self.max_attempts = max_attempts
         self.reset()
 
-    def generate_next_message(self, messages: List[Dict[str, Any]]) -> str:
+    def generate_next_message(self, messages: List[Dict[str, Any]], attempt: int = 0) -> str:
         cur_messages = messages.copy()
         initial_response = super().generate_next_message(cur_messages)
         if verify(self.model, self.provider, initial_response, cur_messages):
@@ -280,11 +530,28 @@ class ReflectionUserSimulationEnv(LLMUserSimulationEnv):
         attempts = 1
         while attempts < self.max_attempts:
             new_message = reflect(
-                self.model, self.provider, initial_response, cur_messages
+                self.model, self.provider, initial_response, cur_messages, attempts
             )
             cur_messages.append({"role": "user", "content": new_message})
-            new_response = super().generate_next_message(cur_messages)
-            if verify(self.model, self.provider, new_response, cur_messages):
+            new_response = super().generate_next_message(cur_messages, attempts)
+            if verify(self.model, self.provider, new_response, cur_messages, attempts):
+                return new_response
+            attempts += 1
+        return initial_response
+
+    async def agenerate_next_message(self, messages: List[Dict[str, Any]], attempt: int = 0) -> str:
+        cur_messages = messages.copy()
+        initial_response = await super().agenerate_next_message(cur_messages)
+        if await averify(self.model, self.provider, initial_response, cur_messages):
+            return initial_response
+        attempts = 1
+        while attempts < self.max_attempts:
+            new_message = await areflect(
+                self.model, self.provider, initial_response, cur_messages, attempts
+            )
+            cur_messages.append({"role": "user", "content": new_message})
+            new_response = await super().agenerate_next_message(cur_messages, attempts)
+            if await averify(self.model, self.provider, new_response, cur_messages, attempts):
                 return new_response
             attempts += 1
         return initial_response
@@ -307,18 +574,144 @@ class ReflectionUserSimulationEnv(LLMUserSimulationEnv):
         return self.total_cost
 
 
+def describe_actions(actions: Sequence[Action]) -> str:
+    return " Then ".join(
+        f"Please run {action.name} with {json.dumps(action.kwargs, sort_keys=True)}."
+        for action in actions
+    )
+
+
+def build_user_script(task: Task) -> Tuple[str, List[str]]:
+    """Turns a task into a first message and one user reply per agent reply.
+
+    The actions between two `respond` actions become the request that
+    follows the first of them, so an agent that replays the task gets asked
+    for exactly the next block of tool calls. A reply with nothing left to
+    ask for ends the conversation.
+    """
+    blocks: List[List[Action]] = [[]]
+    for action in task.actions:
+        if action.name == RESPOND_ACTION_NAME:
+            blocks.append([])
+        else:
+            blocks[-1].append(action)
+    first_message = task.instruction or describe_actions(blocks[0])
+    replies = [
+        describe_actions(block) if block else "Yes, please continue."
+        for block in blocks[1:]
+    ]
+    while replies and replies[-1] == "Yes, please continue.":
+        replies.pop()
+    return first_message, replies
+
+
+class ScriptedUserSimulationEnv(BaseUserSimulationEnv):
+    """A deterministic user that never calls a model.
+
+    Each agent reply is answered by the first matching `rules` entry (a
+    regex searched in the reply, and the answer to send). Otherwise the next
+    turn of the task's script is used (see `build_user_script`). Once the
+    script runs out, the user asks once for any task `outputs` the agent has
+    not mentioned yet, then sends ###STOP###. `latency` seconds are waited
+    before every turn, to emulate a slow user without the network.
+    """
+
+    def __init__(
+        self,
+        rules: Optional[Sequence[Tuple[str, str]]] = None,
+        latency: float = 0.0,
+    ) -> None:
+        self.rules = [(re.compile(pattern), reply) for pattern, reply in rules or []]
+        self.latency = latency
+        self.task: Optional[Task] = None
+        self.replies: List[str] = []
+        self.turn = 0
+        self.agent_messages: List[str] = []
+        self.asked_outputs = False
+
+    def set_task(self, task: Task) -> None:
+        self.task = task
+
+    def reset(self, instruction: Optional[str] = None) -> str:
+        self.wait()
+        return self.start(instruction)
+
+    def step(self, content: str) -> str:
+        self.wait()
+        return self.reply(content)
+
+    async def areset(self, instruction: Optional[str] = None) -> str:
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+        return self.start(instruction)
+
+    async def astep(self, content: str) -> str:
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+        return self.reply(content)
+
+    def wait(self) -> None:
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+    def start(self, instruction: Optional[str]) -> str:
+        self.turn = 0
+        self.agent_messages = []
+        self.asked_outputs = False
+        if self.task is None:
+            self.replies = []
+            return instruction or ""
+        first_message, self.replies = build_user_script(self.task)
+        return instruction or first_message
+
+    def reply(self, content: str) -> str:
+        self.agent_messages.append(content)
+        for pattern, answer in self.rules:
+            if pattern.search(content):
+                return answer
+        if self.turn < len(self.replies):
+            self.turn += 1
+            return self.replies[self.turn - 1]
+        if not self.asked_outputs and self.task is not None:
+            self.asked_outputs = True
+            said = " ".join(self.agent_messages).lower().replace(",", "")
+            missing = [output for output in self.task.outputs if output.lower() not in said]
+            if missing:
+                return f"Can you also tell me: {', '.join(missing)}?"
+        return "###STOP###"
+
+    def get_total_cost(self) -> float:
+        return 0.0
+
+
 class UserStrategy(enum.Enum):
     HUMAN = "human"
     LLM = "llm"
     REACT = "react"
     VERIFY = "verify"
     REFLECTION = "reflection"
+    SCRIPTED = "scripted"
+
+
+def load_user_rules(path: str) -> List[Tuple[str, str]]:
+    """Reads scripted-user rules from a JSON file of [pattern, reply] pairs."""
+    with open(path) as f:
+        rules = json.load(f)
+    if not isinstance(rules, list) or not all(
+        isinstance(rule, list) and len(rule) == 2 and all(isinstance(part, str) for part in rule)
+        for rule in rules
+    ):
+        raise ValueError(f"{path} must hold a list of [pattern, reply] pairs")
+    return [(pattern, reply) for pattern, reply in rules]
 
 
 def load_user(
     user_strategy: Union[str, UserStrategy],
     model: Optional[str] = "gpt-4o",
     provider: Optional[str] = None,
+    rules: Optional[Sequence[Tuple[str, str]]] = None,
+    latency: float = 0.0,
+    concurrent_attempts: bool = False,
 ) -> BaseUserSimulationEnv:
     if isinstance(user_strategy, str):
         user_strategy = UserStrategy(user_strategy)
@@ -341,11 +734,15 @@ def load_user(
             raise ValueError("Verify user strategy requires a model")
         if provider is None:
             raise ValueError("Verify user strategy requires a model provider")
-        return VerifyUserSimulationEnv(model=model, provider=provider)
+        return VerifyUserSimulationEnv(
+            model=model, provider=provider, concurrent_attempts=concurrent_attempts
+        )
     elif user_strategy == UserStrategy.REFLECTION:
         if model is None:
             raise ValueError("Reflection user strategy requires a model")
         if provider is None:
             raise ValueError("Reflection user strategy requires a model provider")
         return ReflectionUserSimulationEnv(model=model, provider=provider)
+    elif user_strategy == UserStrategy.SCRIPTED:
+        return ScriptedUserSimulationEnv(rules=rules, latency=latency)
     raise ValueError(f"Unknown user strategy {user_strategy}")
\ No newline at end of file
@@ -0,0 +1,347 @@
+import argparse
+import importlib
+import json
+import os
+import threading
+import time
+import zlib
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from envs.binary_snapshot import load_json_tables, open_snapshot, write_snapshot
+from envs.files import replace_file
+from envs.index import IndexColumns
+from envs.serialization import loads
+from envs.snapshot import Snapshot, ViewFactory
+from envs.store import DataStore, RowChange, StoreListener
+
+LOG_NAME = "wal.log"
+CHECKPOINT_NAME = "checkpoint.json"
+TABLES_DIR = "tables"
+SNAPSHOT_NAME = "checkpoint.snap"
+CHECKPOINT_FORMATS = ("json", "binary")
+
+# A logged commit: (table, row id, full new row or None for a deletion).
+LogChange = Tuple[str, str, Optional[Dict[str, Any]]]
+
+
+def encode_record(lsn: int, changes: List[RowChange]) -> bytes:
+    """One commit as a line: the CRC32 of its JSON body, a tab, the body.
+
+    Rows are logged whole, so replaying a record twice is harmless.
+    """
+    body = json.dumps(
+        {"lsn": lsn, "changes": [[c.table_name, c.row_id, c.new] for c in changes]},
+        separators=(",", ":"),
+    ).encode("utf-8")
+    return b"%08x\t%s\n" % (zlib.crc32(body), body)
+
+
+def read_records(path: str) -> Iterator[Tuple[int, int, List[LogChange]]]:
+    """Yields (lsn, end offset, changes) for each intact record of a log.
+
+    Stops at the first torn or corrupt line: a crash can only leave the
+    last, partially written group of records behind.
+    """
+    if not os.path.exists(path):
+        return
+    offset = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n") or len(line) < 10 or line[8:9] != b"\t":
+                return
+            body = line[9:-1]
+            try:
+                if int(line[:8], 16) != zlib.crc32(body):
+                    return
+                record = loads(body.decode("utf-8"))
+            except ValueError:
+                return
+            offset += len(line)
+            yield record["lsn"], offset, [tuple(change) for change in record["changes"]]
+
+
+def read_checkpoint(directory: str) -> Optional[Dict[str, Any]]:
+    path = os.path.join(directory, CHECKPOINT_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+class WriteAheadLog(StoreListener):
+    """Appends the commits of a `DataStore` to a log and checkpoints its tables.
+
+    Each outermost commit becomes one log record with a log sequence number
+    (LSN). With `durable=True` a commit returns only once its record is on
+    disk. Committers share fsyncs (group commit): the first one to reach the
+    disk writes and syncs every record pending at that moment, waiting up to
+    `commit_delay` seconds to let more arrive, while the others wait for it.
+    With `durable=False` records are written once `max_pending` accumulate,
+    and on `flush` and `close`.
+
+    Every `checkpoint_every` commits the tables are written out, as one JSON
+    file per table under `data_dir` or as a binary snapshot, the LSN they
+    include is recorded in `checkpoint.json` and the log is emptied. JSON
+    checkpoints after the first only rewrite the tables changed since the
+    previous one. Pointing `data_dir` at an environment's data directory
+    persists the state there, replacing the original files.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        durable: bool = True,
+        commit_delay: float = 0.0,
+        max_pending: int = 64,
+        checkpoint_every: Optional[int] = 1000,
+        checkpoint_format: str = "json",
+        data_dir: Optional[str] = None,
+        index_columns: Optional[IndexColumns] = None,
+    ) -> None:
+        if checkpoint_format not in CHECKPOINT_FORMATS:
+            raise ValueError(f"checkpoint_format must be one of {', '.join(CHECKPOINT_FORMATS)}")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.durable = durable
+        self.commit_delay = commit_delay
+        self.max_pending = max_pending
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_format = checkpoint_format
+        self.data_dir = data_dir or os.path.join(directory, TABLES_DIR)
+        self.index_columns = index_columns
+        self.store: Optional[DataStore] = None
+
+        checkpoint = read_checkpoint(directory)
+        self.checkpoint_lsn = checkpoint["lsn"] if checkpoint is not None else 0
+        # Only a JSON checkpoint over a previous one in the same place can skip clean tables.
+        self.full_checkpoint = (
+            checkpoint is None
+            or checkpoint.get("format") != "json"
+            or checkpoint.get("data_dir") != self.data_dir
+        )
+        self.dirty_tables: Set[str] = set()
+        self.commits_since_checkpoint = 0
+
+        # Drop a torn tail before appending after it.
+        self.log_path = os.path.join(directory, LOG_NAME)
+        self.lsn = self.checkpoint_lsn
+        valid_length = 0
+        for lsn, offset, changes in read_records(self.log_path):
+            self.lsn = max(self.lsn, lsn)
+            valid_length = offset
+            if lsn > self.checkpoint_lsn:
+                self.commits_since_checkpoint += 1
+                self.dirty_tables.update(table_name for table_name, _, _ in changes)
+        self.log = open(self.log_path, "ab")
+        self.log.truncate(valid_length)
+        self.flushed_lsn = self.lsn
+        self.pending: List[bytes] = []
+        self.flushing = False
+        self.cond = threading.Condition()
+        self.records_written = 0
+        self.syncs = 0
+
+    def attach(self, store: DataStore) -> None:
+        """Logs the commits of `store`, instead of those of the previous store."""
+        self.detach()
+        self.store = store
+        store.listeners.append(self)
+
+    def detach(self) -> None:
+        if self.store is not None and self in self.store.listeners:
+            self.store.listeners.remove(self)
+        self.store = None
+
+    def on_commit(self, changes: List[RowChange]) -> None:
+        if not changes:
+            return
+        with self.cond:
+            self.lsn += 1
+            lsn = self.lsn
+            self.pending.append(encode_record(lsn, changes))
+            self.dirty_tables.update(change.table_name for change in changes)
+            self.commits_since_checkpoint += 1
+            due = len(self.pending) >= self.max_pending
+        if self.durable or due:
+            self.sync(lsn)
+        if self.checkpoint_every is not None and self.commits_since_checkpoint >= self.checkpoint_every:
+            self.checkpoint()
+
+    def flush(self) -> None:
+        with self.cond:
+            lsn = self.lsn
+        self.sync(lsn)
+
+    def sync(self, lsn: int) -> None:
+        """Returns once every record up to `lsn` is on disk."""
+        with self.cond:
+            while self.flushed_lsn < lsn:
+                if self.flushing:
+                    self.cond.wait()
+                    continue
+                self.flushing = True
+                try:
+                    if self.commit_delay > 0:
+                        self.cond.release()
+                        try:
+                            time.sleep(self.commit_delay)
+                        finally:
+                            self.cond.acquire()
+                    batch, self.pending = self.pending, []
+                    last = self.lsn
+                    self.cond.release()
+                    try:
+                        self.log.write(b"".join(batch))
+                        self.log.flush()
+                        os.fsync(self.log.fileno())
+                    finally:
+                        self.cond.acquire()
+                    self.flushed_lsn = last
+                    self.records_written += len(batch)
+                    self.syncs += 1
+                finally:
+                    self.flushing = False
+                    self.cond.notify_all()
+
+    def checkpoint(self) -> None:
+        """Writes the store's tables out and empties the log."""
+        store = self.store
+        if store is None:
+            raise RuntimeError("The log is not attached to a store")
+        if store.in_transaction:
+            raise RuntimeError("Cannot checkpoint during a transaction")
+        self.flush()
+        with self.cond:
+            while self.flushing:
+                self.cond.wait()
+            lsn = self.lsn
+            if self.checkpoint_format == "binary":
+                tables = {name: dict(table.items()) for name, table in store.items()}
+                path = os.path.join(self.directory, SNAPSHOT_NAME)
+                write_snapshot(tables, path, self.index_columns)
+            else:
+                os.makedirs(self.data_dir, exist_ok=True)
+                names = list(store) if self.full_checkpoint else sorted(self.dirty_tables)
+                for name in names:
+                    table = dict(store[name].items())
+                    replace_file(
+                        self.data_dir,
+                        os.path.join(self.data_dir, f"{name}.json"),
+                        lambda f: json.dump(table, f, indent=2),
+                    )
+            checkpoint = {"lsn": lsn, "format": self.checkpoint_format, "data_dir": self.data_dir}
+            replace_file(
+                self.directory,
+                os.path.join(self.directory, CHECKPOINT_NAME),
+                lambda f: json.dump(checkpoint, f),
+            )
+            # Records up to `lsn` are in the checkpoint now.
+            self.log.truncate(0)
+            self.pending = []
+            self.flushed_lsn = lsn
+            self.checkpoint_lsn = lsn
+            self.full_checkpoint = self.checkpoint_format != "json"
+            self.dirty_tables = set()
+            self.commits_since_checkpoint = 0
+
+    def reset(self) -> None:
+        """Starts over from the original data: empties the log and records
+        that the state is `data_load_func`'s tables (see `load_checkpoint`)."""
+        self.flush()
+        with self.cond:
+            while self.flushing:
+                self.cond.wait()
+            checkpoint = {"lsn": self.lsn, "format": "initial"}
+            replace_file(
+                self.directory,
+                os.path.join(self.directory, CHECKPOINT_NAME),
+                lambda f: json.dump(checkpoint, f),
+            )
+            self.log.truncate(0)
+            self.pending = []
+            self.flushed_lsn = self.lsn
+            self.checkpoint_lsn = self.lsn
+            self.full_checkpoint = True
+            self.dirty_tables = set()
+            self.commits_since_checkpoint = 0
+
+    def close(self) -> None:
+        self.flush()
+        self.log.close()
+        self.detach()
+
+
+def load_checkpoint(directory: str, data_load_func: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+    """The tables of the last checkpoint, or the original ones if there is none."""
+    checkpoint = read_checkpoint(directory)
+    if checkpoint is None or checkpoint["format"] == "initial":
+        return data_load_func()
+    if checkpoint["format"] == "binary":
+        return open_snapshot(os.path.join(directory, SNAPSHOT_NAME))
+    return load_json_tables(checkpoint["data_dir"])
+
+
+def open_durable_store(
+    directory: str,
+    data_load_func: Callable[[], Dict[str, Any]],
+    index_columns: Optional[IndexColumns] = None,
+    views: Optional[Dict[str, ViewFactory]] = None,
+    snapshot: Optional[Snapshot] = None,
+    **options: Any,
+) -> Tuple[DataStore, WriteAheadLog]:
+    """Recovers the state persisted in `directory` and keeps logging to it.
+
+    Loads the last checkpoint (or `data_load_func`'s tables when there is
+    none), replays the committed records logged after it in one transaction
+    and attaches a `WriteAheadLog` built with `options` to the store. A
+    `snapshot` of `data_load_func`'s tables, when given, is checked out
+    instead of loading them again.
+    """
+    checkpoint = read_checkpoint(directory)
+    checkpoint_lsn = checkpoint["lsn"] if checkpoint is not None else 0
+    views = views or {}
+    if snapshot is None or (checkpoint is not None and checkpoint["format"] != "initial"):
+        snapshot = Snapshot(load_checkpoint(directory, data_load_func), index_columns)
+        snapshot.add_views(views)
+    store = snapshot.checkout(views)
+    store.begin()
+    for lsn, _, changes in read_records(os.path.join(directory, LOG_NAME)):
+        if lsn > checkpoint_lsn:
+            for table_name, row_id, row in changes:
+                store.put_row(table_name, row_id, row)
+    store.commit()
+    log = WriteAheadLog(directory, index_columns=index_columns, **options)
+    log.attach(store)
+    return store, log
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Recover the state persisted by a write-ahead log and optionally checkpoint it."
+    )
+    parser.add_argument("directory", type=str)
+    parser.add_argument("--env", type=str, required=True, help="Environment whose data to start from (e.g. retail)")
+    parser.add_argument("--checkpoint", action="store_true", help="Compact the log into a checkpoint")
+    parser.add_argument("--format", type=str, choices=CHECKPOINT_FORMATS, default="json")
+    args = parser.parse_args()
+
+    env_data = importlib.import_module(f"envs.{args.env}.data")
+    index_columns = getattr(env_data, "INDEXES", None)
+    store, log = open_durable_store(
+        args.directory,
+        env_data.load_data,
+        index_columns,
+        checkpoint_every=None,
+        checkpoint_format=args.format,
+    )
+    replayed = log.lsn - log.checkpoint_lsn
+    print(f"Recovered {args.directory} at LSN {log.lsn} ({replayed} records replayed)")
+    print(f"Data hash: {store.get_data_hash()}")
+    if args.checkpoint:
+        log.checkpoint()
+        print(f"Checkpointed LSN {log.checkpoint_lsn} ({args.format})")
+    log.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Lets the tests import the environments from a plain checkout.
+
+The code is written against its installed layout: the tools import
+`tau_bench.envs.*`, the environments take their data models from `types`,
+and the user simulators import `litellm`. Where those are not installed,
+this aliases `tau_bench.envs` to the `envs` package of the checkout,
+provides the data models and stands in for `litellm`, whose calls then
+fail (the tests only use the scripted user).
+"""
+import importlib
+import importlib.abc
+import importlib.util
+import os
+import sys
+import types
+from typing import Any, Dict, List, Optional, Union
+
+from pydantic import BaseModel
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+class Action(BaseModel):
+    name: str
+    kwargs: Dict[str, Any]
+
+
+class Task(BaseModel):
+    user_id: str
+    actions: List[Action]
+    instruction: str
+    outputs: List[str]
+
+
+class RewardOutputInfo(BaseModel):
+    r_outputs: float
+    outputs: Dict[str, bool]
+
+
+class RewardActionInfo(BaseModel):
+    r_actions: float
+    gt_data_hash: str
+
+
+class RewardResult(BaseModel):
+    reward: float
+    info: Union[RewardOutputInfo, RewardActionInfo]
+    actions: List[Action]
+
+
+class EnvInfo(BaseModel):
+    task: Task
+    source: Optional[str] = None
+    user_cost: Optional[float] = None
+    reward_info: Optional[RewardResult] = None
+
+
+class EnvResponse(BaseModel):
+    observation: str
+    reward: float
+    done: bool
+    info: EnvInfo
+
+
+class EnvResetResponse(BaseModel):
+    observation: str
+    info: EnvInfo
+
+
+MODELS = {
+    "RESPOND_ACTION_NAME": "respond",
+    "Action": Action,
+    "Task": Task,
+    "RewardOutputInfo": RewardOutputInfo,
+    "RewardActionInfo": RewardActionInfo,
+    "RewardResult": RewardResult,
+    "EnvInfo": EnvInfo,
+    "EnvResponse": EnvResponse,
+    "EnvResetResponse": EnvResetResponse,
+}
+
+
+class EnvsAlias(importlib.abc.MetaPathFinder, importlib.abc.Loader):
+    """Imports `tau_bench.envs.X` as the very module `envs.X`."""
+
+    def find_spec(self, name: str, path: Any, target: Any = None) -> Any:
+        if name == "tau_bench" or name.startswith("tau_bench.envs"):
+            return importlib.util.spec_from_loader(name, self, is_package=True)
+        return None
+
+    def create_module(self, spec: Any) -> Any:
+        if spec.name == "tau_bench":
+            return None
+        return importlib.import_module(spec.name[len("tau_bench."):])
+
+    def exec_module(self, module: Any) -> None:
+        pass
+
+
+def fail_completion(**kwargs: Any) -> Any:
+    raise RuntimeError("litellm is not installed")
+
+
+async def fail_acompletion(**kwargs: Any) -> Any:
+    raise RuntimeError("litellm is not installed")
+
+
+class ModelResponse(dict):
+    pass
+
+
+def install() -> None:
+    for name, model in MODELS.items():
+        if not hasattr(types, name):
+            setattr(types, name, model)
+    if importlib.util.find_spec("litellm") is None:
+        litellm = types.ModuleType("litellm")
+        litellm.ModelResponse = ModelResponse
+        litellm.completion = fail_completion
+        litellm.acompletion = fail_acompletion
+        sys.modules["litellm"] = litellm
+    try:
+        tau_bench = importlib.util.find_spec("tau_bench")
+    except ImportError:
+        tau_bench = None
+    if tau_bench is None:
+        sys.meta_path.insert(0, EnvsAlias())
+
+
+install()
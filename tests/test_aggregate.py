@@ -0,0 +1,167 @@
+"""aggregate_records against the same aggregates computed naively over the tables."""
+import json
+from collections import defaultdict
+from typing import Any, Dict, List
+
+import pytest
+
+from envs.base import get_tool_name
+from envs.columnar import to_columnar
+from envs.index import IndexedData
+from envs.retail.data import CATEGORIES, INDEXES, load_data
+from envs.retail.tools import ALL_TOOLS_INTERFACE_1
+from envs.snapshot import Snapshot
+
+TOOLS = {get_tool_name(tool): tool for tool in ALL_TOOLS_INTERFACE_1}
+TABLES = load_data()
+OPEN_PO_STATUSES = ["pending", "approved", "ordered", "shipped"]
+
+
+@pytest.fixture(params=["indexed", "scanned", "columnar"])
+def data(request) -> Dict[str, Any]:
+    if request.param == "indexed":
+        return Snapshot(TABLES, INDEXES).checkout()
+    if request.param == "columnar":
+        return Snapshot(to_columnar(load_data(), CATEGORIES), INDEXES).checkout()
+    return IndexedData(TABLES)
+
+
+def aggregate(data: Dict[str, Any], **kwargs: Any) -> Dict[str, Any]:
+    return json.loads(TOOLS["aggregate_records"].invoke(data, **kwargs))
+
+
+def groups_by(response: Dict[str, Any], label: str) -> Dict[Any, Dict[str, Any]]:
+    assert response["success"], response
+    return {group[label]: group for group in response["groups"]}
+
+
+def test_units_sold_per_product(data):
+    expected: Dict[str, int] = defaultdict(int)
+    for item in TABLES["sales_order_items"].values():
+        if TABLES["sales_orders"][item["sales_order_id"]]["status"] != "cancelled":
+            expected[item["product_id"]] += item["quantity"]
+    response = aggregate(
+        data,
+        table="sales_order_items",
+        joins=["sales_orders"],
+        filters={"sales_orders.status": {"$ne": "cancelled"}},
+        group_by=["product_id"],
+        metrics=[{"op": "sum", "column": "quantity", "as": "units"}],
+    )
+    assert {key: group["units"] for key, group in groups_by(response, "product_id").items()} == expected
+    assert response["rows_matched"] == sum(
+        TABLES["sales_orders"][item["sales_order_id"]]["status"] != "cancelled"
+        for item in TABLES["sales_order_items"].values()
+    )
+    # Groups come in group_by order.
+    assert [group["product_id"] for group in response["groups"]] == sorted(expected)
+
+
+def test_revenue_by_payment_method(data):
+    expected: Dict[str, float] = defaultdict(float)
+    for item in TABLES["sales_order_items"].values():
+        order = TABLES["sales_orders"][item["sales_order_id"]]
+        expected[order["payment_method"]] += item["quantity"] * TABLES["products"][item["product_id"]]["unit_price"]
+    response = aggregate(
+        data,
+        table="sales_order_items",
+        joins=["sales_orders", "products"],
+        group_by=["sales_orders.payment_method"],
+        metrics=[{"op": "sum", "column": "quantity", "times": "products.unit_price", "as": "revenue"}],
+    )
+    revenue = {key: group["revenue"] for key, group in groups_by(response, "sales_orders.payment_method").items()}
+    assert revenue == pytest.approx(dict(expected))
+
+
+def test_open_po_quantity_per_supplier(data):
+    expected: Dict[str, int] = defaultdict(int)
+    for item in TABLES["purchase_order_items"].values():
+        order = TABLES["purchase_orders"][item["purchase_order_id"]]
+        if order["status"] in OPEN_PO_STATUSES:
+            expected[order["supplier_id"]] += item["quantity"]
+    response = aggregate(
+        data,
+        table="purchase_order_items",
+        joins=["purchase_orders"],
+        filters={"purchase_orders.status": {"$in": OPEN_PO_STATUSES}},
+        group_by=[{"column": "purchase_orders.supplier_id", "as": "supplier_id"}],
+        metrics=[{"op": "sum", "column": "quantity"}],
+    )
+    assert {key: group["sum_quantity"] for key, group in groups_by(response, "supplier_id").items()} == expected
+    assert expected
+
+
+def test_count_avg_min_max_per_supplier(data):
+    prices: Dict[str, List[float]] = defaultdict(list)
+    for product in TABLES["products"].values():
+        prices[product["supplier_id"]].append(product["unit_price"])
+    response = aggregate(
+        data,
+        table="products",
+        group_by="supplier_id",
+        metrics=[
+            {"op": "count"},
+            {"op": "avg", "column": "unit_price"},
+            {"op": "min", "column": "unit_price"},
+            {"op": "max", "column": "unit_price"},
+        ],
+    )
+    groups = groups_by(response, "supplier_id")
+    assert set(groups) == set(prices)
+    for supplier_id, values in prices.items():
+        group = groups[supplier_id]
+        assert group["count"] == len(values)
+        assert group["avg_unit_price"] == pytest.approx(sum(values) / len(values))
+        assert (group["min_unit_price"], group["max_unit_price"]) == (min(values), max(values))
+
+
+def test_dates_group_by_month(data):
+    expected: Dict[str, int] = defaultdict(int)
+    for order in TABLES["sales_orders"].values():
+        expected[order["created_at"][:7]] += 1
+    response = aggregate(
+        data, table="sales_orders", group_by=[{"column": "created_at", "truncate": "month", "as": "month"}]
+    )
+    assert {key: group["count"] for key, group in groups_by(response, "month").items()} == expected
+
+
+def test_order_and_limit_keep_the_largest_groups(data):
+    counts: Dict[str, int] = defaultdict(int)
+    for order in TABLES["sales_orders"].values():
+        counts[order["user_id"]] += 1
+    response = aggregate(data, table="sales_orders", group_by=["user_id"], order_by=["-count"], limit=3)
+    assert [group["count"] for group in response["groups"]] == sorted(counts.values(), reverse=True)[:3]
+    assert response["count"] == 3 and response["total_groups"] == len(counts)
+
+
+def test_filters_on_a_joined_table_go_through_the_indexes():
+    store = Snapshot(TABLES, INDEXES).checkout()
+    response = aggregate(
+        store,
+        table="sales_order_items",
+        joins=["sales_orders"],
+        filters={"sales_orders.user_id": "3"},
+        metrics=[{"op": "sum", "column": "quantity"}],
+    )
+    orders = [so_id for so_id, order in TABLES["sales_orders"].items() if order["user_id"] == "3"]
+    items = [item for item in TABLES["sales_order_items"].values() if item["sales_order_id"] in orders]
+    assert response["groups"] == [{"sum_quantity": sum(item["quantity"] for item in items)}]
+    assert store.rows_scanned == len(orders) + len(items)
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"table": "nothing"},
+        {"table": "sales_order_items", "joins": ["suppliers"]},
+        {"table": "sales_orders", "metrics": [{"op": "median", "column": "status"}]},
+        {"table": "sales_orders", "metrics": [{"op": "sum"}]},
+        {"table": "sales_orders", "metrics": [{"op": "sum", "column": "status"}]},
+        {"table": "sales_orders", "group_by": ["products.name"]},
+        {"table": "sales_orders", "group_by": ["status"], "order_by": ["user_id"]},
+        {"table": "sales_orders", "limit": -1},
+    ],
+)
+def test_invalid_aggregates_are_reported(data, kwargs):
+    response = aggregate(data, **kwargs)
+    assert response["success"] is False and response["error"]
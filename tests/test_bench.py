@@ -0,0 +1,23 @@
+"""The benchmark suite, run small."""
+import pytest
+
+pytest.importorskip("faker")
+
+from envs.retail.bench import compare, run
+
+
+def test_runs_every_case_and_replays_tasks_correctly(tmp_path):
+    report = run(scales=[1.0], seed=0, iterations=2, num_episodes=3, data_dir=str(tmp_path))
+    results = report["results"]["scale=1"]
+    assert any(name.startswith("tool:") for name in results)
+    for name in ["snapshot_load", "reset", "step", "get_data_hash", "calculate_reward[cold]", "calculate_reward[cached]"]:
+        assert results[name]["mean_us"] > 0
+    # Episodes replay their task's actions, so each one earns the full reward.
+    assert results["episodes"]["n"] == 3
+    assert results["episodes"]["mean_reward"] == 1.0
+
+
+def test_compare_reports_cases_slower_than_the_threshold():
+    baseline = {"results": {"scale=1": {"fast": {"p50_us": 100.0}, "slow": {"p50_us": 100.0}, "tiny": {"mean_us": 1.0}}}}
+    report = {"results": {"scale=1": {"fast": {"p50_us": 110.0}, "slow": {"p50_us": 200.0}, "tiny": {"mean_us": 4.0}, "new": {"mean_us": 9.0}}}}
+    assert compare(report, baseline, threshold=1.25) == ["scale=1 slow: 100.0us -> 200.0us (2.00x)"]
@@ -0,0 +1,32 @@
+"""The memory-mapped binary snapshot format."""
+import json
+import os
+
+import pytest
+
+from envs.binary_snapshot import binary_to_json, json_to_binary, open_snapshot
+from envs.hashing import DataHasher
+from envs.retail.data import CATEGORIES, FOLDER_PATH, INDEXES, load_data
+
+
+def test_converts_json_tables_to_binary_and_back(tmp_path):
+    path = str(tmp_path / "retail.snap")
+    json_to_binary(FOLDER_PATH, path, INDEXES, CATEGORIES)
+    tables = open_snapshot(path)
+    expected = load_data()
+    assert {table_name: dict(table.items()) for table_name, table in tables.items()} == expected
+    assert DataHasher(tables).get_root_hash(tables) == DataHasher(expected).get_root_hash(expected)
+
+    output_dir = str(tmp_path / "json")
+    binary_to_json(path, output_dir)
+    for table_name, table in expected.items():
+        with open(os.path.join(output_dir, f"{table_name}.json")) as f:
+            assert json.load(f) == table
+
+
+def test_rejects_files_that_are_not_snapshots(tmp_path):
+    path = str(tmp_path / "retail.snap")
+    with open(path, "wb") as f:
+        f.write(b"not a snapshot at all")
+    with pytest.raises(ValueError):
+        open_snapshot(path)
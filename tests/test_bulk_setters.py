@@ -0,0 +1,80 @@
+"""Bulk actions of the Manage* setters."""
+import json
+
+import pytest
+
+from envs.base import Env
+from envs.retail.data import INDEXES, load_data
+from envs.retail.tools import ALL_TOOLS_INTERFACE_1
+from types import Action, Task
+
+TASKS = [Task(user_id="", actions=[], instruction="", outputs=[])]
+
+
+@pytest.fixture
+def env() -> Env:
+    env = Env(
+        load_data,
+        ALL_TOOLS_INTERFACE_1,
+        TASKS,
+        "",
+        [],
+        "scripted",
+        "",
+        task_index=0,
+        index_columns=INDEXES,
+    )
+    env.reset(task_index=0)
+    return env
+
+
+def call(env: Env, name: str, **kwargs) -> dict:
+    return json.loads(env.step(Action(name=name, kwargs=kwargs)).observation)
+
+
+def test_a_single_update_takes_any_status(env):
+    result = call(env, "manage_sales_orders", action="update", sales_order_id="3", status="on_hold")
+    assert result["success"]
+    assert env.data["sales_orders"]["3"]["status"] == "on_hold"
+
+
+def test_bulk_update_writes_every_order(env):
+    result = call(env, "manage_sales_orders", action="bulk_update", sales_order_ids=["3", "4"], status="cancelled")
+    assert result["success"]
+    assert [env.data["sales_orders"][so_id]["status"] for so_id in ["3", "4"]] == ["cancelled", "cancelled"]
+
+
+def test_bulk_add_items_adds_every_line(env):
+    result = call(
+        env,
+        "manage_purchase_orders",
+        action="bulk_add_items",
+        purchase_order_id="1",
+        items=[{"product_id": "1", "quantity": 2}, {"product_id": "2", "quantity": 3}],
+    )
+    assert result["success"]
+    items = env.data["purchase_order_items"]
+    assert [(items[item_id]["product_id"], items[item_id]["quantity"]) for item_id in result["item_ids"]] == [("1", 2), ("2", 3)]
+
+
+@pytest.mark.parametrize(
+    "name, kwargs",
+    [
+        ("manage_sales_orders", {"action": "bulk_update", "sales_order_ids": ["3", "4"], "status": "on_hold"}),
+        ("manage_sales_orders", {"action": "bulk_update", "sales_order_ids": ["3", "missing"], "status": "cancelled"}),
+        ("manage_sales_orders", {"action": "bulk_update", "sales_order_ids": ["3", "3"], "status": "cancelled"}),
+        ("manage_sales_orders", {"action": "bulk_update", "sales_order_ids": [], "status": "cancelled"}),
+        (
+            "manage_purchase_orders",
+            {"action": "bulk_add_items", "purchase_order_id": "1", "items": [{"product_id": "1", "quantity": 2}, {"product_id": "1", "quantity": 0}]},
+        ),
+        ("manage_shipping", {"action": "bulk_create", "sales_order_ids": ["3", "missing"], "method": "ground"}),
+    ],
+)
+def test_a_bulk_action_rejects_bad_input_without_a_partial_write(env, name, kwargs):
+    data_hash = env.get_data_hash()
+    before = {table_name: dict(table) for table_name, table in env.data.items()}
+    result = call(env, name, **kwargs)
+    assert not result["success"]
+    assert env.get_data_hash() == data_hash
+    assert {table_name: dict(table) for table_name, table in env.data.items()} == before
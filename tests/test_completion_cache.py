@@ -0,0 +1,81 @@
+"""Record/replay of user-simulator completions."""
+import sqlite3
+from typing import Any, Dict
+
+import pytest
+
+import envs.user
+from envs.completion_cache import CacheMissError, CacheMode, CompletionCache, completion_key
+from envs.user import cached_completion
+
+MESSAGES = [{"role": "user", "content": "Hi"}]
+
+
+class Response(dict):
+    def model_dump(self) -> Dict[str, Any]:
+        return dict(self)
+
+
+def stored_sizes(path: str) -> tuple:
+    conn = sqlite3.connect(path)
+    try:
+        (total,) = conn.execute("SELECT total FROM completions_size").fetchone()
+        (summed,) = conn.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()
+        return total, summed
+    finally:
+        conn.close()
+
+
+def test_records_and_replays_across_processes(tmp_path):
+    path = str(tmp_path / "completions.sqlite")
+    cache = CompletionCache(path)
+    cache.record("model", "provider", MESSAGES, {"text": "first"})
+    cache.record("model", "provider", MESSAGES, {"text": "second"}, attempt=1)
+    cache.close()
+
+    cache = CompletionCache(path, mode=CacheMode.REPLAY)
+    assert cache.lookup("model", "provider", MESSAGES) == {"text": "first"}
+    assert cache.lookup("model", "provider", MESSAGES, attempt=1) == {"text": "second"}
+    with pytest.raises(CacheMissError):
+        cache.lookup("model", "provider", MESSAGES, attempt=2)
+    with pytest.raises(CacheMissError):
+        cache.lookup("other", "provider", MESSAGES)
+    cache.close()
+
+
+def test_the_first_attempt_keeps_the_key_of_unretried_requests():
+    assert completion_key("model", "provider", MESSAGES) == completion_key("model", "provider", MESSAGES, 0)
+    assert completion_key("model", "provider", MESSAGES) != completion_key("model", "provider", MESSAGES, 1)
+
+
+def test_evicts_the_least_recently_used_entries(tmp_path):
+    path = str(tmp_path / "completions.sqlite")
+    cache = CompletionCache(path, max_bytes=100)
+    for index in range(10):
+        cache.put(f"key {index}", {"text": "x" * 20})
+        cache.put(f"key {index}", {"text": "y" * 20})
+    assert cache.get("key 9") == {"text": "y" * 20}
+    assert cache.get("key 0") is None
+    cache.close()
+    total, summed = stored_sizes(path)
+    assert total == summed <= 100
+
+
+def test_user_completions_go_through_the_cache(tmp_path, monkeypatch):
+    calls = []
+
+    def completion(**kwargs: Any) -> Response:
+        calls.append(kwargs)
+        return Response(choices=[{"message": {"content": f"answer {len(calls)}"}}])
+
+    monkeypatch.setattr(envs.user, "completion", completion)
+    path = str(tmp_path / "completions.sqlite")
+    monkeypatch.setattr(envs.user, "_completion_cache", CompletionCache(path))
+    recorded = [cached_completion(model="model", messages=MESSAGES, attempt=attempt) for attempt in range(2)]
+    assert [res["choices"][0]["message"]["content"] for res in recorded] == ["answer 1", "answer 2"]
+
+    monkeypatch.setattr(envs.user, "_completion_cache", CompletionCache(path, mode=CacheMode.REPLAY))
+    replayed = [cached_completion(model="model", messages=MESSAGES, attempt=attempt) for attempt in range(2)]
+    assert [dict(res) for res in replayed] == [dict(res) for res in recorded]
+    assert [res._hidden_params["response_cost"] for res in replayed] == [0.0, 0.0]
+    assert len(calls) == 2
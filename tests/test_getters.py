@@ -0,0 +1,131 @@
+"""Getter output, byte for byte, against the baseline implementation, on each data backend.
+
+`data/baseline_getters.json` holds the observations the getters returned
+before they were served from indexes, over the retail data plus a few
+approvals.
+"""
+import json
+import os
+from typing import Any, Callable, Dict
+
+import pytest
+
+from envs.base import get_tool_name
+from envs.binary_snapshot import open_snapshot, write_snapshot
+from envs.columnar import to_columnar
+from envs.index import IndexedData, find_records
+from envs.retail.data import CATEGORIES, INDEXES, load_data
+from envs.retail.tools import ALL_TOOLS_INTERFACE_1
+from envs.snapshot import Snapshot
+
+with open(os.path.join(os.path.dirname(__file__), "data", "baseline_getters.json")) as f:
+    BASELINE = json.load(f)
+TOOLS = {get_tool_name(tool): tool for tool in ALL_TOOLS_INTERFACE_1}
+DISCOVER_CALLS = [call for call in BASELINE["calls"] if call["name"].startswith("discover_")]
+APPROVAL_CALLS = [call for call in BASELINE["calls"] if call["name"] == "check_approval"]
+
+
+def load_tables(tmp_path: Any) -> Dict[str, Any]:
+    tables = load_data()
+    tables["approvals"] = BASELINE["approvals"]
+    return tables
+
+
+def load_columnar_tables(tmp_path: Any) -> Dict[str, Any]:
+    return to_columnar(load_tables(tmp_path), CATEGORIES)
+
+
+def load_binary_tables(tmp_path: Any) -> Dict[str, Any]:
+    path = str(tmp_path / "retail.snap")
+    write_snapshot(load_tables(tmp_path), path, INDEXES, CATEGORIES)
+    return open_snapshot(path)
+
+
+# Loads the baseline's tables into a backend, given a scratch directory.
+BACKENDS: Dict[str, Callable[[Any], Dict[str, Any]]] = {
+    "dict": load_tables,
+    "columnar": load_columnar_tables,
+    "binary": load_binary_tables,
+}
+
+
+@pytest.fixture(params=sorted(BACKENDS))
+def tables(request, tmp_path) -> Dict[str, Any]:
+    return BACKENDS[request.param](tmp_path)
+
+
+def invoke(data: Dict[str, Any], call: Dict[str, Any]) -> str:
+    return TOOLS[call["name"]].invoke(data, **call["kwargs"])
+
+
+def test_discover_matches_the_baseline_through_the_indexes(tables):
+    store = Snapshot(tables, INDEXES).checkout()
+    for call in DISCOVER_CALLS:
+        assert invoke(store, call) == call["observation"], call
+
+
+def test_discover_matches_the_baseline_without_indexes(tables):
+    data = IndexedData(tables)
+    for call in DISCOVER_CALLS:
+        assert invoke(data, call) == call["observation"], call
+
+
+def test_check_approval_matches_the_baseline(tables):
+    store = Snapshot(tables, INDEXES).checkout()
+    data = IndexedData(tables)
+    for call in APPROVAL_CALLS:
+        assert invoke(store, call) == invoke(data, call) == call["observation"], call
+    # The requester's user row and the approvals of that (requester, action), not whole tables.
+    assert store.rows_scanned == 9
+
+
+def test_check_approval_sees_new_approvals(tables):
+    store = Snapshot(tables, INDEXES).checkout()
+    call = {"name": "check_approval", "kwargs": {"action": "update_pii", "requester_email": "melissa-jones@outlook.com"}}
+    assert '"approved": false' in invoke(store, call)
+    store.begin()
+    store.apply_delta({"approvals": {"2": {"status": "approved"}}})
+    store.commit()
+    assert invoke(store, call) == '{"approved": true, "reason": "Explicit approval found: APR-2"}'
+
+
+def test_an_indexed_lookup_only_reads_the_matching_rows(tables):
+    store = Snapshot(tables, INDEXES).checkout()
+    assert [row_id for row_id, _ in find_records(store, "sales_orders", {"user_id": "3"})] == ["1", "2", "3"]
+    assert store.rows_scanned == 3
+
+
+def test_indexes_follow_writes(tables):
+    store = Snapshot(tables, INDEXES).checkout()
+    store.begin()
+    store.apply_delta(
+        {
+            "sales_orders": {
+                "1": {"user_id": "4", "status": "cancelled"},
+                "25": {"sales_order_id": "25", "user_id": "3", "status": "placed"},
+            }
+        }
+    )
+    store.commit()
+    scan = IndexedData({table_name: dict(table.items()) for table_name, table in store.items()})
+    for filters in [{"user_id": "3"}, {"user_id": "4"}, {"status": "cancelled"}, {"status": "placed", "user_id": "3"}]:
+        assert list(find_records(store, "sales_orders", filters)) == list(find_records(scan, "sales_orders", filters))
+
+
+def test_backends_hash_and_write_alike(tables):
+    expected = Snapshot(load_tables(None), INDEXES).checkout()
+    store = Snapshot(tables, INDEXES).checkout()
+    assert store.get_data_hash() == expected.get_data_hash()
+    delta = {
+        "sales_orders": {"1": {"status": "cancelled", "cancel_reason": "late"}, "25": {"sales_order_id": "25", "quantity": 2}},
+        "users": {"2": {"role": "Customer Support"}},
+    }
+    for data in (store, expected):
+        data.begin()
+        data.apply_delta(delta)
+        data.put_row("shipping", "3", None)
+        data.commit()
+    assert store.get_data_hash() == expected.get_data_hash()
+    for name in ["discover_sales_orders", "discover_users", "discover_shipping"]:
+        call = {"name": name, "kwargs": {"filters": {}}}
+        assert invoke(store, call) == invoke(expected, call)
@@ -0,0 +1,67 @@
+"""Ground-truth hashes cached on disk stay valid across runs."""
+import os
+import subprocess
+import sys
+
+from envs.base import Env
+from envs.gt_cache import GroundTruthCache
+from envs.retail.data import INDEXES, load_data
+from envs.retail.tools import ALL_TOOLS_INTERFACE_1
+from types import Action, Task
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TASKS = [
+    Task(
+        user_id="",
+        actions=[
+            Action(name="manage_shipping", kwargs={"action": "create", "sales_order_id": "3", "method": "ground"}),
+            Action(
+                name="manage_sales_orders",
+                kwargs={"action": "update", "sales_order_id": "3", "status": "shipped"},
+            ),
+        ],
+        instruction="",
+        outputs=[],
+    )
+]
+
+# Fills the cache at the path given, as an earlier run would.
+CHILD = """
+import sys
+import tests.conftest
+from envs.gt_cache import GroundTruthCache
+from tests.test_gt_cache import make_env
+make_env(GroundTruthCache(sys.argv[1])).get_gt_data_hash(0)
+"""
+
+
+def make_env(gt_cache: GroundTruthCache) -> Env:
+    return Env(
+        load_data,
+        ALL_TOOLS_INTERFACE_1,
+        TASKS,
+        "",
+        [],
+        "scripted",
+        "",
+        task_index=0,
+        index_columns=INDEXES,
+        gt_cache=gt_cache,
+    )
+
+
+def test_a_hash_cached_by_an_earlier_run_is_the_fresh_one(tmp_path):
+    path = str(tmp_path / "gt_hashes.json")
+    subprocess.run([sys.executable, "-c", CHILD, path], cwd=ROOT, check=True)
+
+    cache = GroundTruthCache(path)
+    env = make_env(cache)
+    cached = cache.get(env.get_gt_cache_key(0))
+    assert cached is not None
+    assert cached == env.compute_gt_data_hash(0)
+    assert env.get_gt_data_hash(0) == cached
+
+    env.reset(task_index=0)
+    for action in TASKS[0].actions:
+        env.step(action)
+    assert env.calculate_reward().reward == 1.0
@@ -0,0 +1,48 @@
+"""The incrementally maintained data hash."""
+import random
+
+from envs.hashing import DataHasher
+from envs.retail.data import INDEXES, load_data
+from envs.store import DataStore
+
+
+def fresh_hash(store: DataStore) -> str:
+    tables = {table_name: dict(table) for table_name, table in store.items()}
+    return DataHasher(tables).get_root_hash(tables)
+
+
+def test_the_incremental_hash_is_the_hash_of_the_data():
+    rng = random.Random(0)
+    store = DataStore(load_data(), INDEXES)
+    store.get_data_hash()
+    for step in range(50):
+        so_id = str(rng.randint(1, 30))
+        store.begin()
+        if rng.random() < 0.2:
+            store.put_row("sales_orders", so_id, None)
+        else:
+            store.apply_delta({"sales_orders": {so_id: {"status": f"status {step}"}}, "notes": {str(step): {"n": step}}})
+        store.commit()
+        assert store.get_data_hash() == fresh_hash(store)
+
+
+def test_the_hash_does_not_depend_on_row_order():
+    tables = load_data()
+    reordered = {table_name: dict(reversed(list(table.items()))) for table_name, table in reversed(list(tables.items()))}
+    assert DataHasher(tables).get_root_hash(tables) == DataHasher(reordered).get_root_hash(reordered)
+
+
+def test_table_hashes_tell_which_table_changed():
+    store = DataStore(load_data(), INDEXES)
+    before = store.get_table_hashes()
+    store.begin()
+    store.apply_delta({"shipping": {"1": {"status": "lost"}}})
+    store.commit()
+    after = store.get_table_hashes()
+    assert [table_name for table_name in before if before[table_name] != after[table_name]] == ["shipping"]
+    assert store.get_data_hash() != DataStore(load_data()).get_data_hash()
+
+    store.begin()
+    store.apply_delta({"shipping": {"1": {"status": load_data()["shipping"]["1"]["status"]}}})
+    store.commit()
+    assert store.get_table_hashes() == before
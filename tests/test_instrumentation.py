@@ -0,0 +1,65 @@
+"""Per-step instrumentation of `Env.step`."""
+import json
+
+from envs.base import Env
+from envs.instrumentation import Recorder
+from envs.retail.data import INDEXES, load_data
+from envs.retail.tools import ALL_TOOLS_INTERFACE_1
+from types import Action, Task
+
+CANCEL = Action(name="manage_sales_orders", kwargs={"action": "update", "sales_order_id": "3", "status": "cancelled"})
+LOOKUP = Action(name="discover_sales_orders", kwargs={"filters": {"user_id": "3"}})
+TASKS = [Task(user_id="", actions=[CANCEL], instruction="", outputs=[])]
+
+
+def make_env(recorder: Recorder) -> Env:
+    return Env(
+        load_data,
+        ALL_TOOLS_INTERFACE_1,
+        TASKS,
+        "",
+        [],
+        "scripted",
+        "",
+        task_index=0,
+        index_columns=INDEXES,
+        instrumentation=recorder,
+    )
+
+
+def test_records_what_each_step_cost(tmp_path):
+    recorder = Recorder()
+    env = make_env(recorder)
+    env.reset(task_index=0)
+    responses = [env.step(action) for action in [LOOKUP, CANCEL, LOOKUP]]
+    env.calculate_reward()
+
+    summary = recorder.summary()
+    assert summary["tools"]["discover_sales_orders"]["count"] == 2
+    assert summary["tools"]["discover_sales_orders"]["rows_scanned"] == 6
+    assert summary["tools"]["discover_sales_orders"]["rows_written"] == 0
+    assert summary["tools"]["manage_sales_orders"]["rows_written"] == 1
+    assert summary["tools"]["manage_sales_orders"]["response_bytes"] == len(responses[1].observation.encode("utf-8"))
+    assert set(summary["phases"]) == {"reward.data_hash", "reward.gt_data_hash", "reward.outputs"}
+    assert [metrics.action_name for metrics in recorder.steps] == [LOOKUP.name, CANCEL.name, LOOKUP.name]
+
+    path = str(tmp_path / "env.prom")
+    recorder.write_prometheus(path)
+    with open(path) as f:
+        assert 'env_rows_written_total{action="manage_sales_orders"} 1' in f.read().splitlines()
+    path = str(tmp_path / "trace.json")
+    recorder.write_chrome_trace(path)
+    with open(path) as f:
+        events = json.load(f)["traceEvents"]
+    assert [event["cat"] for event in events].count("step") == 3
+
+
+def test_drops_timeline_events_past_the_limit():
+    recorder = Recorder(max_events=2)
+    env = make_env(recorder)
+    env.reset(task_index=0)
+    for _ in range(4):
+        env.step(LOOKUP)
+    assert len(recorder.steps) == 2
+    assert recorder.summary()["dropped_events"] == 2
+    assert recorder.summary()["tools"]["discover_sales_orders"]["count"] == 4
@@ -0,0 +1,108 @@
+"""The materialized inventory view against stock recomputed from the tables."""
+import json
+from typing import Any, Dict
+
+from envs.base import Env
+from envs.retail.data import INDEXES, load_data
+from envs.retail.inventory import VIEWS, InventoryView
+from envs.retail.tools import ALL_TOOLS_INTERFACE_1
+from types import Action, Task
+
+TASKS = [Task(user_id="", actions=[], instruction="", outputs=[])]
+STEPS = [
+    Action(name="manage_purchase_orders", kwargs={"action": "update", "purchase_order_id": "5", "status": "received"}),
+    Action(name="manage_purchase_orders", kwargs={"action": "add_item", "purchase_order_id": "1", "product_id": "2", "quantity": 7}),
+    Action(name="manage_sales_orders", kwargs={"action": "update", "sales_order_id": "6", "status": "cancelled", "cancel_reason": "x"}),
+    Action(name="manage_shipping", kwargs={"action": "create", "sales_order_id": "4", "method": "Ground"}),
+    Action(name="manage_sales_orders", kwargs={"action": "bulk_update", "sales_order_ids": ["10", "11"], "status": "delivered"}),
+]
+
+
+def make_env() -> Env:
+    return Env(
+        load_data, ALL_TOOLS_INTERFACE_1, TASKS, "", [], "scripted", "",
+        task_index=0, index_columns=INDEXES, views=VIEWS,
+    )
+
+
+def naive_inventory(data: Dict[str, Any]) -> Dict[str, Dict[str, int]]:
+    """Stock per product, joining the four tables from scratch."""
+    shipped_orders = {
+        shipment["sales_order_id"]
+        for shipment in data["shipping"].values()
+        if shipment.get("status") in ("shipped", "delivered")
+    }
+    stock = {product_id: {"received": 0, "shipped": 0, "reserved": 0} for product_id in data["products"]}
+    for item in data["purchase_order_items"].values():
+        order = data["purchase_orders"].get(item["purchase_order_id"])
+        if order is not None and order["status"] == "received":
+            stock[item["product_id"]]["received"] += item["quantity"]
+    for item in data["sales_order_items"].values():
+        so_id = item["sales_order_id"]
+        status = data["sales_orders"][so_id]["status"]
+        if status in ("cancelled", "returned"):
+            continue
+        if status in ("shipped", "delivered") or so_id in shipped_orders:
+            stock[item["product_id"]]["shipped"] += item["quantity"]
+        elif status in ("placed", "processing"):
+            stock[item["product_id"]]["reserved"] += item["quantity"]
+    for units in stock.values():
+        units["on_hand"] = units["received"] - units["shipped"]
+        units["available"] = units["on_hand"] - units["reserved"]
+    return stock
+
+
+def view_inventory(env: Env) -> Dict[str, Dict[str, int]]:
+    response = json.loads(
+        env.tools_map["get_inventory"].invoke(env.data, product_ids=list(env.data["products"]))
+    )
+    assert response["success"], response
+    return {record.pop("product_id"): record for record in response["inventory"]}
+
+
+def test_the_view_matches_the_tables_at_load():
+    env = make_env()
+    env.reset(task_index=0)
+    assert view_inventory(env) == naive_inventory(env.data)
+    assert any(units["reserved"] for units in view_inventory(env).values())
+
+
+def test_the_view_follows_every_write():
+    env = make_env()
+    env.reset(task_index=0)
+    before = view_inventory(env)
+    for action in STEPS:
+        response = env.step(action)
+        assert '"success": true' in response.observation, response.observation
+        assert view_inventory(env) == naive_inventory(env.data)
+    assert view_inventory(env) != before
+    fresh = InventoryView(env.data)
+    assert view_inventory(env) == {product_id: fresh.get(product_id) for product_id in env.data["products"]}
+
+
+def test_a_rollback_leaves_the_view_unchanged():
+    env = make_env()
+    env.reset(task_index=0)
+    before = view_inventory(env)
+    env.data.begin()
+    env.data.apply_delta({"purchase_orders": {"5": {"status": "received"}}, "sales_orders": {"4": {"status": "cancelled"}}})
+    env.data.rollback()
+    assert view_inventory(env) == before == naive_inventory(env.data)
+
+
+def test_episodes_do_not_see_each_others_writes():
+    env = make_env()
+    env.reset(task_index=0)
+    before = view_inventory(env)
+    for action in STEPS:
+        env.step(action)
+    env.reset(task_index=0)
+    assert view_inventory(env) == before
+
+
+def test_unknown_products_are_reported():
+    env = make_env()
+    env.reset(task_index=0)
+    tool = env.tools_map["get_inventory"]
+    assert json.loads(tool.invoke(env.data, product_id="nope")) == {"success": False, "error": "Product nope not found"}
+    assert json.loads(tool.invoke(env.data))["success"] is False
@@ -0,0 +1,111 @@
+"""Join getters against the records a naive join of the tables gives."""
+import json
+from typing import Any, Dict, List, Optional
+
+import pytest
+
+from envs.base import get_tool_name
+from envs.columnar import to_columnar
+from envs.index import IndexedData
+from envs.retail.data import CATEGORIES, INDEXES, load_data
+from envs.retail.tools import ALL_TOOLS_INTERFACE_1
+from envs.snapshot import Snapshot
+
+TOOLS = {get_tool_name(tool): tool for tool in ALL_TOOLS_INTERFACE_1}
+TABLES = load_data()
+
+
+@pytest.fixture(params=["indexed", "scanned", "columnar"])
+def data(request) -> Dict[str, Any]:
+    if request.param == "indexed":
+        return Snapshot(TABLES, INDEXES).checkout()
+    if request.param == "columnar":
+        return Snapshot(to_columnar(load_data(), CATEGORIES), INDEXES).checkout()
+    return IndexedData(TABLES)
+
+
+def with_id(row_id: str, row: Dict[str, Any], id_column: str) -> Dict[str, Any]:
+    return {**row, id_column: row_id} if id_column not in row else dict(row)
+
+
+def lookup(table_name: str, row_id: Optional[str], id_column: str) -> Optional[Dict[str, Any]]:
+    row = TABLES[table_name].get(row_id)
+    return None if row is None else with_id(row_id, row, id_column)
+
+
+def items_of(table_name: str, foreign_key: str, value: str, id_column: str) -> List[Dict[str, Any]]:
+    return [
+        {**with_id(item_id, item, id_column), "product": lookup("products", item.get("product_id"), "product_id")}
+        for item_id, item in TABLES[table_name].items()
+        if item.get(foreign_key) == value
+    ]
+
+
+def naive_sales_order(so_id: str) -> Dict[str, Any]:
+    record = with_id(so_id, TABLES["sales_orders"][so_id], "sales_order_id")
+    record["items"] = items_of("sales_order_items", "sales_order_id", so_id, "so_item_id")
+    record["shipments"] = [
+        with_id(shipping_id, shipment, "shipping_id")
+        for shipping_id, shipment in TABLES["shipping"].items()
+        if shipment.get("sales_order_id") == so_id
+    ]
+    return record
+
+
+def naive_purchase_order(po_id: str) -> Dict[str, Any]:
+    record = {**TABLES["purchase_orders"][po_id], "purchase_order_id": po_id}
+    record["supplier"] = lookup("suppliers", record.get("supplier_id"), "supplier_id")
+    record["items"] = items_of("purchase_order_items", "purchase_order_id", po_id, "po_item_id")
+    return record
+
+
+def invoke(data: Dict[str, Any], name: str, **kwargs: Any) -> Dict[str, Any]:
+    response = json.loads(TOOLS[name].invoke(data, **kwargs))
+    assert response["success"], response
+    return response
+
+
+def test_sales_order_details_join_items_products_and_shipments(data):
+    response = invoke(data, "get_sales_order_details")
+    assert response["sales_orders"] == [naive_sales_order(so_id) for so_id in TABLES["sales_orders"]]
+    assert any(order["items"] for order in response["sales_orders"])
+    assert any(order["shipments"] for order in response["sales_orders"])
+
+
+def test_purchase_order_details_join_the_supplier_items_and_products(data):
+    response = invoke(data, "get_purchase_order_details")
+    assert response["purchase_orders"] == [naive_purchase_order(po_id) for po_id in TABLES["purchase_orders"]]
+    assert any(order["items"] for order in response["purchase_orders"])
+
+
+def test_details_equal_the_chained_getters(data):
+    order = invoke(data, "get_sales_order_details", filters={"sales_order_id": "2"})["sales_orders"][0]
+    items = invoke(data, "discover_sales_order_items", filters={"sales_order_id": "2"})["sales_order_items"]
+    shipments = invoke(data, "discover_shipping", filters={"sales_order_id": "2"})["shipments"]
+    assert [{key: value for key, value in item.items() if key != "product"} for item in order["items"]] == items
+    assert order["shipments"] == shipments
+
+
+def test_the_joins_go_through_the_foreign_key_indexes():
+    store = Snapshot(TABLES, INDEXES).checkout()
+    order = invoke(store, "get_sales_order_details", filters={"sales_order_id": "2"})["sales_orders"][0]
+    # The order, its items and its shipments; products are fetched by id.
+    assert store.rows_scanned == 1 + len(order["items"]) + len(order["shipments"])
+
+
+def test_details_follow_writes():
+    store = Snapshot(TABLES, INDEXES).checkout()
+    store.begin()
+    store.apply_delta({"shipping": {"S-new": {"shipping_id": "S-new", "sales_order_id": "2", "status": "pending"}}})
+    store.commit()
+    order = invoke(store, "get_sales_order_details", filters={"sales_order_id": "2"})["sales_orders"][0]
+    assert order["shipments"][-1] == {"shipping_id": "S-new", "sales_order_id": "2", "status": "pending"}
+
+
+def test_fields_and_filters_apply_to_the_joined_records(data):
+    response = invoke(data, "get_sales_order_details", filters={"user_id": "3"}, fields=["sales_order_id", "items"])
+    assert response["sales_orders"] == [
+        {"sales_order_id": so_id, "items": naive_sales_order(so_id)["items"]}
+        for so_id, order in TABLES["sales_orders"].items()
+        if order["user_id"] == "3"
+    ]
@@ -0,0 +1,112 @@
+"""Keyset paging of getter responses under `PageLimits`."""
+import json
+from typing import Any, Dict, List, Optional
+
+import pytest
+
+from envs.base import get_tool_name
+from envs.query import PageLimits
+from envs.retail.data import INDEXES, load_data
+from envs.retail.tools import ALL_TOOLS_INTERFACE_1
+from envs.snapshot import Snapshot
+
+TOOLS = {get_tool_name(tool): tool for tool in ALL_TOOLS_INTERFACE_1}
+SNAPSHOT = Snapshot(load_data(), INDEXES)
+
+
+def checkout(page_limits: Optional[PageLimits] = None) -> Any:
+    store = SNAPSHOT.checkout()
+    store.page_limits = page_limits
+    return store
+
+
+def discover_orders(data: Any, **kwargs: Any) -> Dict[str, Any]:
+    return json.loads(TOOLS["discover_sales_orders"].invoke(data, **kwargs))
+
+
+def all_pages(data: Any, **kwargs: Any) -> List[Dict[str, Any]]:
+    pages = [discover_orders(data, **kwargs)]
+    while "next_cursor" in pages[-1]:
+        pages.append(discover_orders(data, cursor=pages[-1]["next_cursor"]))
+    return pages
+
+
+def order_ids(pages: List[Dict[str, Any]]) -> List[str]:
+    return [order["sales_order_id"] for page in pages for order in page["sales_orders"]]
+
+
+def expected_ids(orders: Dict[str, Any], column: Optional[str], descending: bool) -> List[str]:
+    # Ties are broken by ascending id in both directions.
+    ids = sorted(orders, key=int)
+    if column is not None:
+        ids.sort(key=lambda so_id: orders[so_id][column], reverse=descending)
+    return ids
+
+
+@pytest.mark.parametrize(
+    "order_by, column, descending",
+    [(None, None, False), ("status", "status", False), ("-created_at", "created_at", True)],
+)
+def test_pages_cover_the_search_without_gaps_or_duplicates(order_by, column, descending):
+    store = checkout(PageLimits(max_page_size=5, max_response_bytes=None))
+    orders = store["sales_orders"]
+    pages = all_pages(store, order_by=order_by)
+    assert [len(page["sales_orders"]) for page in pages] == [5, 5, 5, 5, 4]
+    assert all(page["count"] == len(orders) for page in pages)
+    ids = order_ids(pages)
+    assert sorted(ids, key=int) == sorted(orders, key=int)
+    assert ids == expected_ids(orders, column, descending)
+
+
+def test_the_byte_budget_ends_pages_early():
+    unlimited = discover_orders(checkout())
+    budget = 1000
+    store = checkout(PageLimits(max_page_size=None, max_response_bytes=budget))
+    pages = all_pages(store)
+    assert len(pages) > 1
+    for page in pages:
+        records = json.dumps(page["sales_orders"])
+        assert len(page["sales_orders"]) == 1 or len(records) <= budget
+        assert page["count"] == unlimited["count"]
+    assert [order for page in pages for order in page["sales_orders"]] == unlimited["sales_orders"]
+
+
+def test_a_limit_spans_pages():
+    store = checkout(PageLimits(max_page_size=5, max_response_bytes=None))
+    pages = all_pages(store, filters={"status": {"$ne": "cancelled"}}, limit=7, fields=["sales_order_id"])
+    assert [len(page["sales_orders"]) for page in pages] == [5, 2]
+    assert all(page["count"] == 7 for page in pages)
+    assert all(list(order) == ["sales_order_id"] for page in pages for order in page["sales_orders"])
+    unpaged = discover_orders(checkout(), filters={"status": {"$ne": "cancelled"}}, limit=7)
+    assert order_ids(pages) == [order["sales_order_id"] for order in unpaged["sales_orders"]]
+
+
+def test_rows_written_between_pages_do_not_shift_the_next_one():
+    store = checkout(PageLimits(max_page_size=5, max_response_bytes=None))
+    first = discover_orders(store)
+    store.begin()
+    store.apply_delta({"sales_orders": {"0": {"sales_order_id": "0", "user_id": "3", "status": "placed"}}})
+    store.commit()
+    second = discover_orders(store, cursor=first["next_cursor"])
+    assert order_ids([first, second]) == [str(so_id) for so_id in range(1, 11)]
+    assert second["count"] == first["count"]
+
+
+def test_large_limits_leave_the_response_unchanged():
+    for kwargs in ({}, {"filters": {"user_id": "3"}}, {"fields": ["status"]}):
+        unlimited = TOOLS["discover_sales_orders"].invoke(checkout(), **kwargs)
+        paged = TOOLS["discover_sales_orders"].invoke(checkout(PageLimits()), **kwargs)
+        assert paged == unlimited
+
+
+@pytest.mark.parametrize("cursor", ["not a cursor", "e30=", 5])
+def test_invalid_cursors_are_reported(cursor):
+    response = discover_orders(checkout(PageLimits()), cursor=cursor)
+    assert response["success"] is False
+
+
+def test_a_cursor_only_resumes_its_own_table():
+    store = checkout(PageLimits(max_page_size=5, max_response_bytes=None))
+    cursor = discover_orders(store)["next_cursor"]
+    response = json.loads(TOOLS["discover_shipping"].invoke(store, cursor=cursor))
+    assert response == {"success": False, "error": "Invalid cursor"}
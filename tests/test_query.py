@@ -0,0 +1,119 @@
+"""The query language of the getters: predicates, order, limit, offset and fields."""
+import json
+from typing import Any, Dict, List
+
+import pytest
+
+from envs.base import get_tool_name
+from envs.index import IndexedData
+from envs.query import QueryError, query_records
+from envs.retail.data import INDEXES, load_data
+from envs.retail.tools import ALL_TOOLS_INTERFACE_1
+from envs.snapshot import Snapshot
+
+TOOLS = {get_tool_name(tool): tool for tool in ALL_TOOLS_INTERFACE_1}
+TABLES = load_data()
+ORDERS = TABLES["sales_orders"]
+
+
+@pytest.fixture(params=["indexed", "scanned"])
+def data(request) -> Dict[str, Any]:
+    if request.param == "indexed":
+        return Snapshot(TABLES, INDEXES).checkout()
+    return IndexedData(TABLES)
+
+
+def discover_orders(data: Dict[str, Any], **kwargs: Any) -> Dict[str, Any]:
+    return json.loads(TOOLS["discover_sales_orders"].invoke(data, **kwargs))
+
+
+def order_ids(response: Dict[str, Any]) -> List[str]:
+    assert response["success"], response
+    return [order["sales_order_id"] for order in response["sales_orders"]]
+
+
+@pytest.mark.parametrize(
+    "filters, expected",
+    [
+        ({"created_at": {"$gte": "2025-01-01", "$lt": "2025-07-01"}},
+         lambda order: "2025-01-01" <= order["created_at"] < "2025-07-01"),
+        ({"status": {"$in": ["placed", "processing"]}},
+         lambda order: order["status"] in ("placed", "processing")),
+        ({"payment_method": {"$prefix": "Credit"}},
+         lambda order: order["payment_method"].startswith("Credit")),
+        ({"status": {"$ne": "delivered"}, "user_id": "3"},
+         lambda order: order["status"] != "delivered" and order["user_id"] == "3"),
+        ({"status": {"$eq": "shipped"}}, lambda order: order["status"] == "shipped"),
+        ({"cancel_reason": {"$gt": 5}}, lambda order: False),
+    ],
+)
+def test_filters_match_the_rows_that_satisfy_them(data, filters, expected):
+    assert order_ids(discover_orders(data, filters=filters)) == [
+        so_id for so_id, order in ORDERS.items() if expected(order)
+    ]
+
+
+def test_in_lists_are_answered_from_the_index():
+    store = Snapshot(TABLES, INDEXES).checkout()
+    ids = order_ids(discover_orders(store, filters={"user_id": {"$in": ["3", "4"]}}))
+    assert ids == [so_id for so_id, order in ORDERS.items() if order["user_id"] in ("3", "4")]
+    assert store.rows_scanned == len(ids)
+
+
+def test_orders_limits_and_offsets(data):
+    newest_first = sorted(ORDERS, key=lambda so_id: ORDERS[so_id]["created_at"], reverse=True)
+    ids = order_ids(discover_orders(data, order_by=["-created_at"], limit=5, offset=2))
+    assert ids == newest_first[2:7]
+    # Ties keep table order, and a second column breaks them.
+    by_status = sorted(ORDERS, key=lambda so_id: ORDERS[so_id]["status"])
+    assert order_ids(discover_orders(data, order_by="status")) == by_status
+    by_status_newest = sorted(
+        sorted(ORDERS, key=lambda so_id: ORDERS[so_id]["created_at"], reverse=True),
+        key=lambda so_id: ORDERS[so_id]["status"],
+    )
+    assert order_ids(discover_orders(data, order_by=["status", "-created_at"])) == by_status_newest
+
+
+def test_limit_without_order_keeps_table_order(data):
+    assert order_ids(discover_orders(data, limit=3, offset=1)) == list(ORDERS)[1:4]
+
+
+def test_rows_missing_the_order_column_sort_last():
+    tables = {"sales_orders": {"1": {"rank": 2}, "2": {}, "3": {"rank": 1}}}
+    for descending in (False, True):
+        order_by = "-rank" if descending else "rank"
+        records = query_records(tables, "sales_orders", None, order_by, id_column="sales_order_id")
+        assert [row_id for row_id, _ in records] == (["1", "3", "2"] if descending else ["3", "1", "2"])
+
+
+def test_fields_project_the_records(data):
+    response = discover_orders(data, filters={"user_id": "3"}, fields=["sales_order_id", "status"])
+    assert response["sales_orders"] == [
+        {"sales_order_id": so_id, "status": order["status"]}
+        for so_id, order in ORDERS.items()
+        if order["user_id"] == "3"
+    ]
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"filters": {"status": {"$like": "x"}}},
+        {"filters": {"status": {"$in": "placed"}}},
+        {"filters": {"status": {"$prefix": 1}}},
+        {"filters": ["status"]},
+        {"limit": -1},
+        {"offset": "2"},
+        {"order_by": [""]},
+        {"fields": "status"},
+    ],
+)
+def test_malformed_queries_are_reported(data, kwargs):
+    response = discover_orders(data, **kwargs)
+    assert response["success"] is False and response["error"]
+
+
+def test_mixed_types_cannot_be_ordered():
+    tables = {"sales_orders": {"1": {"rank": 2}, "2": {"rank": "a"}}}
+    with pytest.raises(QueryError):
+        query_records(tables, "sales_orders", None, "rank")
@@ -0,0 +1,68 @@
+"""Rewards of trajectories that write to the data."""
+from envs.base import Env
+from envs.gt_cache import GroundTruthCache
+from envs.retail.data import INDEXES, load_data
+from envs.retail.tools import ALL_TOOLS_INTERFACE_1
+from types import Action, Task
+
+CANCEL = Action(
+    name="manage_sales_orders",
+    kwargs={"action": "update", "sales_order_id": "3", "status": "cancelled", "cancel_reason": "duplicate"},
+)
+SHIP = Action(name="manage_shipping", kwargs={"action": "create", "sales_order_id": "3", "method": "ground"})
+AUDIT = Action(
+    name="create_new_audit_trail",
+    kwargs={"action": "ship", "details": {"sales_order_id": "3"}, "user_email": "a@example.com"},
+)
+RESPOND = Action(name="respond", kwargs={"content": "Done."})
+TASKS = [
+    Task(user_id="", actions=[CANCEL, RESPOND], instruction="", outputs=[]),
+    Task(user_id="", actions=[SHIP, AUDIT, RESPOND], instruction="", outputs=[]),
+]
+
+
+def make_env(gt_cache: GroundTruthCache = None) -> Env:
+    return Env(
+        load_data,
+        ALL_TOOLS_INTERFACE_1,
+        TASKS,
+        "",
+        [],
+        "scripted",
+        "",
+        task_index=0,
+        index_columns=INDEXES,
+        gt_cache=gt_cache,
+    )
+
+
+def test_a_correct_write_trajectory_is_rewarded():
+    env = make_env()
+    for task_index, task in enumerate(TASKS):
+        env.reset(task_index=task_index)
+        for action in task.actions[:-1]:
+            env.step(action)
+        assert env.calculate_reward().reward == 1.0
+
+
+def test_a_trajectory_without_the_writes_is_not_rewarded():
+    env = make_env()
+    env.reset(task_index=0)
+    assert env.calculate_reward().reward == 0.0
+
+
+def test_a_wrong_write_is_not_rewarded():
+    env = make_env()
+    env.reset(task_index=0)
+    env.step(Action(name="manage_sales_orders", kwargs={**CANCEL.kwargs, "cancel_reason": "other"}))
+    assert env.calculate_reward().reward == 0.0
+
+
+def test_failed_calls_do_not_change_what_later_writes_stamp():
+    env = make_env()
+    env.reset(task_index=1)
+    env.step(Action(name="manage_shipping", kwargs={"action": "update", "shipping_id": "missing"}))
+    env.step(Action(name="manage_sales_orders", kwargs={"action": "explode"}))
+    for action in TASKS[1].actions[:-1]:
+        env.step(action)
+    assert env.calculate_reward().reward == 1.0
@@ -0,0 +1,49 @@
+"""The parallel episode runner."""
+import json
+
+import envs.retail.tasks
+import envs.user
+from envs.runner import load_records, run
+from types import Action, Task
+
+TASKS = [
+    Task(
+        user_id="",
+        actions=[
+            Action(
+                name="manage_sales_orders",
+                kwargs={"action": "update", "sales_order_id": str(task_index + 1), "status": "cancelled"},
+            )
+        ],
+        instruction="",
+        outputs=[],
+    )
+    for task_index in range(4)
+]
+
+
+def run_tasks(output_path: str, **options) -> list:
+    return run("retail", "test", "scripted", "", output_path, num_workers=2, **options)
+
+
+def test_runs_each_task_once_and_resumes(tmp_path, monkeypatch):
+    monkeypatch.setattr(envs.retail.tasks, "tasks", TASKS)
+    output_path = str(tmp_path / "results.jsonl")
+    cache_path = str(tmp_path / "completions.sqlite")
+
+    records = run_tasks(output_path, task_ids=[0, 1, 2], completion_cache=cache_path)
+    assert sorted(record["task_index"] for record in records) == [0, 1, 2]
+    assert all(record["reward"] == 1.0 for record in records)
+    # Only the workers open the completion cache.
+    assert envs.user._completion_cache is None
+
+    with open(output_path, "a") as f:
+        f.write('{"task_index": 3, "error": "crashed"}\n{"task_in')
+    records = run_tasks(output_path)
+    assert [record["task_index"] for record in records] == [3]
+
+    assert sorted(load_records(output_path)) == [0, 1, 2, 3]
+    with open(output_path) as f:
+        lines = [json.loads(line) for line in f]
+    assert sorted(record["task_index"] for record in lines) == [0, 1, 2, 3]
+    assert not any("error" in record for record in lines)
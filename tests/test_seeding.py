@@ -0,0 +1,55 @@
+"""The streaming retail data generator."""
+import json
+import os
+
+import pytest
+
+pytest.importorskip("faker")
+
+from envs.retail.data import FOREIGN_KEYS
+from envs.retail.seeding import TABLES, generate, write_table
+
+
+def read_tables(directory: str) -> dict:
+    tables = {}
+    for table in TABLES:
+        with open(os.path.join(directory, f"{table}.json")) as f:
+            tables[table] = f.read()
+    return tables
+
+
+def test_output_does_not_depend_on_chunks_workers_or_table_selection(tmp_path):
+    counts = generate(str(tmp_path / "a"), scale=2, seed=7)
+    generate(str(tmp_path / "b"), scale=2, seed=7, num_workers=2, chunk_size=3)
+    generate(str(tmp_path / "c"), scale=2, seed=7, tables=["shipping", "users"])
+    a = read_tables(str(tmp_path / "a"))
+    assert a == read_tables(str(tmp_path / "b"))
+    for table in ["shipping", "users"]:
+        with open(os.path.join(str(tmp_path / "c"), f"{table}.json")) as f:
+            assert f.read() == a[table]
+    assert counts == {table: len(json.loads(text)) for table, text in a.items()}
+    assert generate(str(tmp_path / "d"), scale=2, seed=8, tables=["users"]) == {"users": counts["users"]}
+    with open(os.path.join(str(tmp_path / "d"), "users.json")) as f:
+        assert f.read() != a["users"]
+
+
+def test_foreign_keys_point_at_existing_rows(tmp_path):
+    generate(str(tmp_path), scale=3, seed=1)
+    tables = {table: json.loads(text) for table, text in read_tables(str(tmp_path)).items()}
+    for table, references in FOREIGN_KEYS.items():
+        for row in tables[table].values():
+            for referenced, column in references.items():
+                assert row[column] in tables[referenced], (table, column, row[column])
+
+
+def test_streamed_tables_have_the_json_dump_layout(tmp_path):
+    rows = {str(index): {"id": str(index), "tags": ["a", "b"], "nested": {"x": index}} for index in range(1, 8)}
+    for chunk_size in [1, 3, 100]:
+        path = str(tmp_path / f"table_{chunk_size}.json")
+        assert write_table(path, iter(rows.items()), chunk_size) == len(rows)
+        with open(path) as f:
+            assert f.read() == json.dumps(rows, indent=2)
+    path = str(tmp_path / "empty.json")
+    write_table(path, iter([]))
+    with open(path) as f:
+        assert f.read() == json.dumps({}, indent=2)
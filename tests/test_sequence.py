@@ -0,0 +1,43 @@
+"""Id allocation for create actions."""
+from envs.retail.data import INDEXES, load_data
+from envs.sequence import next_id, next_ids
+from envs.snapshot import Snapshot
+
+
+def test_ids_follow_the_largest_numeric_id():
+    tables = load_data()
+    tables["sales_orders"]["abc"] = {"sales_order_id": "abc"}
+    store = Snapshot(tables, INDEXES).checkout()
+    assert next_id(store, "sales_orders") == next_id(tables, "sales_orders") == "25"
+    assert next_ids(store, "sales_orders", 3) == next_ids(tables, "sales_orders", 3) == ["25", "26", "27"]
+    assert next_id(store, "returns") == next_id(tables, "returns") == "1"
+
+
+def test_only_committed_inserts_consume_ids():
+    store = Snapshot(load_data(), INDEXES).checkout()
+    store.begin()
+    store.apply_delta({"sales_orders": {"25": {"status": "placed"}}})
+    assert next_id(store, "sales_orders") == "26"
+    store.rollback()
+    assert next_id(store, "sales_orders") == "25"
+
+    store.begin()
+    store.apply_delta({"sales_orders": {"25": {"status": "placed"}}, "returns": {"7": {"status": "open"}}})
+    store.commit()
+    assert next_id(store, "sales_orders") == "26"
+    assert next_id(store, "returns") == "8"
+    store.begin()
+    store.put_row("sales_orders", "25", None)
+    store.commit()
+    assert next_id(store, "sales_orders") == "26"
+
+
+def test_checkouts_allocate_independently():
+    snapshot = Snapshot(load_data(), INDEXES)
+    store = snapshot.checkout()
+    other = snapshot.checkout()
+    store.begin()
+    store.apply_delta({"shipping": {next_id(store, "shipping"): {"status": "shipped"}}})
+    store.commit()
+    assert next_id(store, "shipping") == "14"
+    assert next_id(other, "shipping") == "13"
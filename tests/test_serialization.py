@@ -0,0 +1,94 @@
+"""Observation encoding: the stdlib bytes, with encoded rows cached while unchanged."""
+import json
+from typing import Any
+
+import pytest
+
+from envs.base import get_tool_name
+from envs.query import Page
+from envs.retail.data import INDEXES, load_data
+from envs.retail.tools import ALL_TOOLS_INTERFACE_1
+from envs.serialization import OrjsonSerializer, Serializer, loads, orjson, record_with_id
+from envs.snapshot import Snapshot
+
+TOOLS = {get_tool_name(tool): tool for tool in ALL_TOOLS_INTERFACE_1}
+VALUES = [
+    {"name": "Zoë", "price": 19.99, "qty": 3, "tags": ["a", None, True], "nested": {"x": -1.5e-7}},
+    {1: "int key", "nan": float("nan"), "inf": float("inf")},
+    [],
+    "plain",
+]
+
+
+@pytest.mark.parametrize("value", VALUES)
+def test_dumps_matches_json_dumps(value):
+    assert Serializer().dumps(value) == json.dumps(value)
+
+
+@pytest.mark.skipif(orjson is None, reason="orjson is not installed")
+def test_orjson_output_parses_to_the_same_value():
+    value = VALUES[0]
+    assert loads(OrjsonSerializer().dumps(value)) == json.loads(json.dumps(value))
+
+
+def test_loads_accepts_what_json_dumps_emits():
+    assert json.dumps(loads(json.dumps(VALUES[1]))) == json.dumps(VALUES[1])
+
+
+def test_records_are_only_copied_to_add_their_id():
+    row = {"user_id": "7", "name": "a"}
+    assert record_with_id("7", row, "user_id") is row
+    assert record_with_id("8", row, "user_id") is row
+    assert record_with_id("8", row, "user_id", overwrite_id=True) == {"user_id": "8", "name": "a"}
+    assert record_with_id("8", {"name": "a"}, "user_id") == {"name": "a", "user_id": "8"}
+    assert row == {"user_id": "7", "name": "a"}
+
+
+def test_encoded_rows_are_reused_until_the_row_is_replaced():
+    serializer = Serializer()
+    store = Snapshot(load_data(), INDEXES).checkout()
+    store.serializer = serializer
+    table = store["users"]
+    first = serializer.encode_record(table, "users", "1", table["1"], "user_id")
+    assert serializer.encode_record(table, "users", "1", table["1"], "user_id") is first
+    assert first == json.dumps(table["1"])
+
+    store.begin()
+    store.apply_delta({"users": {"1": {"first_name": "Renamed"}}})
+    store.commit()
+    table = store["users"]
+    second = serializer.encode_record(table, "users", "1", table["1"], "user_id")
+    assert second == json.dumps(store["users"]["1"]) and "Renamed" in second
+    response = TOOLS["discover_users"].invoke(store, filters={"user_id": "1"})
+    assert response == json.dumps({"success": True, "count": 1, "users": [store["users"]["1"]]})
+
+
+def test_rows_of_tables_that_materialize_them_are_not_cached():
+    class Materializing(dict):
+        materializes_rows = True
+
+    serializer = Serializer()
+    table = Materializing({"1": {"name": "a"}})
+    serializer.encode_record(table, "users", "1", table["1"], "user_id")
+    assert serializer.row_cache == {}
+
+
+def test_the_cache_is_bounded():
+    serializer = Serializer(max_cached_rows=2)
+    table = {str(row_id): {"n": row_id} for row_id in range(5)}
+    for row_id, row in table.items():
+        assert serializer.encode_record(table, "t", row_id, row, "id") == json.dumps({"n": int(row_id), "id": row_id})
+    assert len(serializer.row_cache) <= 2
+
+
+@pytest.mark.parametrize("serializer", [Serializer(), OrjsonSerializer()] if orjson else [Serializer()])
+def test_pages_render_like_the_serializer_dumps_the_response(serializer: Any):
+    records = [{"id": "1", "name": "Zoë"}, {"id": "2"}]
+    encoded = [serializer.dumps(record) for record in records]
+    assert Page(serializer, encoded, None).render("rows") == serializer.dumps(
+        {"success": True, "count": 2, "rows": records}
+    )
+    assert Page(serializer, encoded, "abc", 5).render("rows") == serializer.dumps(
+        {"success": True, "count": 5, "rows": records, "next_cursor": "abc"}
+    )
+    assert Page(serializer, [], None).render("rows") == serializer.dumps({"success": True, "count": 0, "rows": []})
@@ -0,0 +1,93 @@
+"""Sessions of one `EnvServer` do not wait for each other."""
+import asyncio
+import json
+import threading
+from typing import Any, Dict, Optional
+
+from envs.base import Env
+from envs.retail.data import INDEXES, load_data
+from envs.retail.inventory import VIEWS
+from envs.retail.tools import ALL_TOOLS_INTERFACE_1
+from envs.server import EnvServer, Request
+from types import Task
+
+TASKS = [Task(user_id="", actions=[], instruction="", outputs=[])]
+
+
+def make_env(task_index: Optional[int] = None, durable_dir: Optional[str] = None) -> Env:
+    return Env(
+        load_data,
+        ALL_TOOLS_INTERFACE_1,
+        TASKS,
+        "",
+        [],
+        "scripted",
+        "",
+        task_index=0,
+        index_columns=INDEXES,
+        views=VIEWS,
+        durable_dir=durable_dir,
+    )
+
+
+def request(method: str, path: str, payload: Optional[Dict[str, Any]] = None) -> Request:
+    body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+    return Request(method, path, "HTTP/1.1", {}, body)
+
+
+STEP = {"name": "discover_users", "kwargs": {"filters": {"user_id": "1"}}}
+
+
+def test_a_session_steps_while_another_is_being_created():
+    release = threading.Event()
+    released = []
+    blocking = [False]
+
+    def factory(task_index: Optional[int], durable_dir: Optional[str]) -> Env:
+        if blocking[0]:
+            # Only returns early if the other session's step got through.
+            released.append(release.wait(10))
+        return make_env(task_index, durable_dir)
+
+    async def scenario() -> None:
+        server = EnvServer(factory)
+        session_id = (await server.create_session(0))["session_id"]
+        blocking[0] = True
+        creating = asyncio.ensure_future(server.create_session(0))
+        await asyncio.sleep(0.05)
+        status, response = await server.route(request("POST", f"/sessions/{session_id}/step", STEP))
+        assert status == 200 and '"success": true' in response["observation"]
+        release.set()
+        await creating
+        assert len(server.sessions) == 2
+
+    asyncio.run(scenario())
+    assert released == [True]
+
+
+def test_a_session_steps_while_another_computes_its_reward():
+    release = threading.Event()
+    released = []
+
+    async def scenario() -> None:
+        server = EnvServer(make_env)
+        slow = (await server.create_session(0))["session_id"]
+        fast = (await server.create_session(0))["session_id"]
+        env = server.sessions[slow].env
+        calculate_reward = env.calculate_reward
+
+        def slow_reward() -> Any:
+            released.append(release.wait(10))
+            return calculate_reward()
+
+        env.calculate_reward = slow_reward
+        rewarding = asyncio.ensure_future(server.route(request("GET", f"/sessions/{slow}/reward")))
+        await asyncio.sleep(0.05)
+        status, _ = await server.route(request("POST", f"/sessions/{fast}/step", STEP))
+        assert status == 200
+        release.set()
+        status, reward = await rewarding
+        assert status == 200 and "reward" in reward
+
+    asyncio.run(scenario())
+    assert released == [True]
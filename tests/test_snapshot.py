@@ -0,0 +1,46 @@
+"""Copy-on-write snapshots shared by the episodes of a process."""
+from typing import Any, Dict
+
+from envs.index import find_records
+from envs.retail.data import INDEXES, load_data
+from envs.snapshot import Snapshot, load_snapshot
+
+
+def test_a_checkout_copies_only_the_tables_it_writes():
+    snapshot = Snapshot(load_data(), INDEXES)
+    original = dict(snapshot.tables["sales_orders"]["3"])
+    store = snapshot.checkout()
+    other = snapshot.checkout()
+
+    store.begin()
+    store.apply_delta({"sales_orders": {"3": {"status": "cancelled"}}})
+    store.commit()
+
+    assert store["sales_orders"]["3"]["status"] == "cancelled"
+    assert store["sales_orders"] is not snapshot.tables["sales_orders"]
+    assert store["users"] is snapshot.tables["users"]
+    assert snapshot.tables["sales_orders"]["3"] == original
+    assert other["sales_orders"]["3"] == original
+    cancelled = {"sales_order_id": "3", "status": "cancelled"}
+    assert [row_id for row_id, _ in find_records(store, "sales_orders", cancelled)] == ["3"]
+    assert [row_id for row_id, _ in find_records(other, "sales_orders", cancelled)] == []
+    assert other.get_data_hash() == snapshot.fingerprint != store.get_data_hash()
+
+
+def test_snapshots_are_loaded_once_per_function_and_index_columns():
+    loads = []
+
+    def load() -> Dict[str, Any]:
+        loads.append(1)
+        return load_data()
+
+    snapshot = load_snapshot(load, {"users": ["email", "user_id"]})
+    assert load_snapshot(load, {"users": ["user_id", "email"], "products": []}) is snapshot
+
+    other = load_snapshot(load, {"sales_orders": ["status"]})
+    assert other is not snapshot
+    assert other.tables is snapshot.tables
+    assert loads == [1]
+    assert other.indexes.get_table_index("sales_orders") is not None
+    assert snapshot.indexes.get_table_index("sales_orders") is None
+    assert other.fingerprint == snapshot.fingerprint
@@ -0,0 +1,104 @@
+"""Transactions of the `DataStore` tools write through."""
+from typing import Any, Dict, List
+
+import pytest
+
+from envs.index import IndexedData, find_records
+from envs.retail.data import INDEXES, load_data
+from envs.store import DataStore
+
+LOOKUPS = [
+    ("sales_orders", {"user_id": "3"}),
+    ("sales_orders", {"status": "cancelled"}),
+    ("sales_orders", {"sales_order_id": "25"}),
+    ("shipping", {"sales_order_id": "1"}),
+    ("users", {"email": "melissa-jones@outlook.com"}),
+]
+
+
+def lookups(data: Dict[str, Any]) -> List[List[str]]:
+    return [[row_id for row_id, _ in find_records(data, table, filters)] for table, filters in LOOKUPS]
+
+
+def write(store: DataStore) -> None:
+    store.apply_delta(
+        {
+            "sales_orders": {
+                "1": {"status": "cancelled", "user_id": "4"},
+                "25": {"sales_order_id": "25", "user_id": "3", "status": "placed"},
+            },
+            "returns": {"1": {"return_id": "1", "sales_order_id": "1"}},
+        }
+    )
+    store.put_row("shipping", "1", None)
+    store.put_row("users", "4", {**store["users"]["4"], "email": "changed@example.com"})
+
+
+def test_rollback_leaves_data_and_indexes_unchanged():
+    store = DataStore(load_data(), INDEXES)
+    before = {table_name: dict(table) for table_name, table in store.items()}
+    found = lookups(store)
+    data_hash = store.get_data_hash()
+    next_id = store.sequences.peek("sales_orders")
+
+    store.begin()
+    write(store)
+    assert lookups(store) != found
+    store.rollback()
+
+    assert {table_name: dict(table) for table_name, table in store.items()} == before
+    assert lookups(store) == found == lookups(IndexedData(before))
+    assert store.get_data_hash() == data_hash
+    assert store.sequences.peek("sales_orders") == next_id
+    assert not store.in_transaction
+
+
+def test_commit_keeps_what_was_written():
+    store = DataStore(load_data(), INDEXES)
+    store.begin()
+    write(store)
+    store.commit()
+    assert store["sales_orders"]["1"]["status"] == "cancelled"
+    assert "1" not in store["shipping"]
+    assert lookups(store) == lookups(IndexedData({table_name: dict(table) for table_name, table in store.items()}))
+    assert store.get_data_hash() == DataStore({table_name: dict(table) for table_name, table in store.items()}).get_data_hash()
+    assert store.sequences.peek("sales_orders") == ["26"]
+
+
+def test_an_inner_rollback_keeps_the_outer_writes():
+    store = DataStore(load_data(), INDEXES)
+    store.begin()
+    store.apply_delta({"sales_orders": {"1": {"status": "cancelled"}}})
+    store.begin()
+    store.apply_delta({"sales_orders": {"2": {"status": "cancelled"}}})
+    store.rollback()
+    store.commit()
+    assert store["sales_orders"]["1"]["status"] == "cancelled"
+    assert store["sales_orders"]["2"] == load_data()["sales_orders"]["2"]
+    cancelled = [row_id for row_id, _ in find_records(store, "sales_orders", {"status": "cancelled"})]
+    assert "1" in cancelled and "2" not in cancelled
+
+
+def test_a_bad_delta_is_not_applied_in_part():
+    store = DataStore(load_data(), INDEXES)
+    before = store.get_data_hash()
+    store.begin()
+    with pytest.raises(ValueError):
+        store.apply_delta({"sales_orders": {"1": {"status": "cancelled"}, "2": "cancelled"}})
+    store.commit()
+    assert store["sales_orders"]["1"]["status"] != "cancelled"
+    assert store.get_data_hash() == before
+
+
+def test_a_delta_only_writes_its_rows():
+    store = DataStore(load_data(), INDEXES)
+    store.begin()
+    store.apply_delta({"sales_orders": {"1": {"status": "cancelled"}, "2": {"status": "cancelled"}}})
+    store.commit()
+    assert store.rows_written == 2
+
+
+def test_writes_require_a_transaction():
+    store = DataStore(load_data(), INDEXES)
+    with pytest.raises(RuntimeError):
+        store.put_row("sales_orders", "1", None)
@@ -0,0 +1,132 @@
+"""User simulators."""
+import asyncio
+import json
+from typing import Any, Dict, List
+
+import pytest
+
+import envs.user
+from envs.base import Env
+from envs.retail.data import INDEXES, load_data
+from envs.retail.tools import ALL_TOOLS_INTERFACE_1
+from envs.user import ScriptedUserSimulationEnv, VerifyUserSimulationEnv, load_user_rules
+from types import Action, Task
+
+CANCEL = Action(name="manage_sales_orders", kwargs={"action": "update", "sales_order_id": "3", "status": "cancelled"})
+SHIP = Action(name="manage_shipping", kwargs={"action": "create", "sales_order_id": "4", "method": "ground"})
+RESPOND = Action(name="respond", kwargs={"content": "Done."})
+TASK = Task(user_id="", actions=[CANCEL, RESPOND, SHIP, RESPOND], instruction="", outputs=["TRK"])
+
+
+class Message(object):
+    def __init__(self, content: str) -> None:
+        self.content = content
+
+    def __str__(self) -> str:
+        return self.content
+
+    def model_dump(self) -> Dict[str, Any]:
+        return {"role": "assistant", "content": self.content}
+
+
+class Response(object):
+    def __init__(self, content: str) -> None:
+        self.choices = [type("Choice", (), {"message": Message(content)})()]
+        self._hidden_params = {"response_cost": 0.0}
+
+
+class FakeLLM(object):
+    """Answers "answer <n>" to the n-th user turn, and only verifies answer 0, the slowest."""
+
+    def __init__(self) -> None:
+        self.answers = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def completion(self, messages: List[Dict[str, Any]], **kwargs: Any) -> Response:
+        return Response("Hello")
+
+    async def acompletion(self, messages: List[Dict[str, Any]], **kwargs: Any) -> Response:
+        prompt = messages[-1]["content"]
+        if "Classification:" in prompt:
+            return Response("true" if "answer 0" in prompt.split("# Response:")[1] else "false")
+        answer = self.answers
+        self.answers += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.05 if answer == 0 else 0)
+        self.in_flight -= 1
+        return Response(f"answer {answer}")
+
+
+def make_user(monkeypatch, **options: Any) -> Any:
+    llm = FakeLLM()
+    monkeypatch.setattr(envs.user, "completion", llm.completion)
+    monkeypatch.setattr(envs.user, "acompletion", llm.acompletion)
+    return llm, VerifyUserSimulationEnv("model", "provider", **options)
+
+
+def test_verify_attempts_run_one_after_the_other_by_default(monkeypatch):
+    llm, user = make_user(monkeypatch)
+    assert asyncio.run(user.astep("Hi")) == "answer 0"
+    assert (llm.answers, llm.max_in_flight) == (1, 1)
+
+
+def test_verify_attempts_can_run_concurrently(monkeypatch):
+    llm, user = make_user(monkeypatch, concurrent_attempts=True)
+    assert asyncio.run(user.astep("Hi")) == "answer 0"
+    assert (llm.answers, llm.max_in_flight) == (3, 3)
+    assert user.messages[-1]["content"] == "answer 0"
+
+
+def scripted_user(**options: Any) -> ScriptedUserSimulationEnv:
+    user = ScriptedUserSimulationEnv(**options)
+    user.set_task(TASK)
+    return user
+
+
+def test_the_scripted_user_asks_for_each_block_of_actions():
+    user = scripted_user()
+    first = user.reset()
+    assert first == f"Please run manage_sales_orders with {json.dumps(CANCEL.kwargs, sort_keys=True)}."
+    assert user.step("Cancelled.") == f"Please run manage_shipping with {json.dumps(SHIP.kwargs, sort_keys=True)}."
+    assert user.step("Shipped.") == "Can you also tell me: TRK?"
+    assert user.step("It is TRK-1.") == "###STOP###"
+
+
+def test_the_scripted_user_does_not_ask_for_outputs_already_given():
+    user = scripted_user()
+    user.reset()
+    user.step("Cancelled.")
+    assert user.step("Shipped with TRK-1.") == "###STOP###"
+
+
+def test_scripted_user_rules_come_first(tmp_path):
+    path = str(tmp_path / "rules.json")
+    with open(path, "w") as f:
+        json.dump([["(?i)anything else", "No, thanks."]], f)
+    user = scripted_user(rules=load_user_rules(path))
+    user.reset()
+    assert user.step("Anything else?") == "No, thanks."
+    assert user.step("Cancelled.").startswith("Please run manage_shipping")
+    assert asyncio.run(user.astep("Anything else?")) == "No, thanks."
+
+
+def test_user_rules_must_be_pattern_reply_pairs(tmp_path):
+    path = str(tmp_path / "rules.json")
+    with open(path, "w") as f:
+        json.dump([["only a pattern"]], f)
+    with pytest.raises(ValueError):
+        load_user_rules(path)
+
+
+def test_an_agent_replaying_the_task_ends_with_the_full_reward():
+    env = Env(
+        load_data, ALL_TOOLS_INTERFACE_1, [TASK], "", [], "scripted", "", task_index=0, index_columns=INDEXES
+    )
+    env.reset(task_index=0)
+    for action in TASK.actions:
+        response = env.step(action)
+    response = env.step(Action(name="respond", kwargs={"content": "The tracking number is TRK-1."}))
+    assert response.done
+    assert response.reward == 1.0
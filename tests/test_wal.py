@@ -0,0 +1,166 @@
+"""Crash recovery of environments persisted with `durable_dir`."""
+import os
+import signal
+import subprocess
+import sys
+from typing import Any, Dict, Optional
+
+import pytest
+
+from envs.base import Env
+from envs.files import replace_file
+from envs.retail.data import INDEXES, load_data
+from envs.retail.inventory import VIEWS, InventoryView
+from envs.retail.tools import ALL_TOOLS_INTERFACE_1
+from envs.wal import open_durable_store
+from types import Action, Task
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TASKS = [Task(user_id="", actions=[], instruction="", outputs=[])]
+
+# Steps until the parent kills it; prints the number of steps done after each one.
+CHILD = """
+import sys
+import tests.conftest
+from tests.test_wal import make_env, step_action
+env = make_env(sys.argv[1])
+env.reset(task_index=0)
+step = 0
+while True:
+    env.step(step_action(step))
+    step += 1
+    print(step, flush=True)
+"""
+
+
+def make_env(durable_dir: Optional[str] = None) -> Env:
+    return Env(
+        load_data,
+        ALL_TOOLS_INTERFACE_1,
+        TASKS,
+        "",
+        [],
+        "scripted",
+        "",
+        task_index=0,
+        index_columns=INDEXES,
+        views=VIEWS,
+        durable_dir=durable_dir,
+    )
+
+
+def step_action(step: int) -> Action:
+    return Action(
+        name="manage_sales_orders",
+        kwargs={
+            "action": "update",
+            "sales_order_id": str(step % 24 + 1),
+            "status": "cancelled",
+            "cancel_reason": f"step {step}",
+        },
+    )
+
+
+def cancel_reasons(env: Env) -> Dict[str, str]:
+    return {so_id: order.get("cancel_reason") for so_id, order in env.data["sales_orders"].items()}
+
+
+def test_recovers_the_steps_of_a_killed_process(tmp_path):
+    durable_dir = str(tmp_path / "env")
+    child = subprocess.Popen(
+        [sys.executable, "-c", CHILD, durable_dir], cwd=ROOT, stdout=subprocess.PIPE, text=True
+    )
+    try:
+        for line in child.stdout:
+            done = int(line)
+            if done >= 50:
+                break
+    finally:
+        child.kill()
+        child.wait()
+        child.stdout.close()
+    assert child.returncode == -signal.SIGKILL
+
+    env = make_env(durable_dir)
+    try:
+        steps = 1 + max(
+            int(reason.split()[1])
+            for reason in cancel_reasons(env).values()
+            if reason is not None and reason.startswith("step ")
+        )
+        # Every step that returned is there, and nothing half-done.
+        assert steps >= done
+        expected = make_env()
+        expected.reset(task_index=0)
+        for step in range(steps):
+            expected.step(step_action(step))
+        assert cancel_reasons(env) == cancel_reasons(expected)
+        assert env.data == expected.data
+        assert env.get_data_hash() == expected.get_data_hash()
+
+        view = InventoryView(env.data)
+        for product_id in env.data["products"]:
+            assert env.data.get_view("inventory").get(product_id) == view.get(product_id)
+    finally:
+        env.close()
+
+
+def test_reset_starts_the_log_over(tmp_path):
+    durable_dir = str(tmp_path / "env")
+    env = make_env(durable_dir)
+    env.reset(task_index=0)
+    for step in range(3):
+        env.step(step_action(step))
+    env.reset(task_index=0)
+    env.step(step_action(5))
+    env.close()
+
+    env = make_env(durable_dir)
+    try:
+        original = make_env()
+        original.reset(task_index=0)
+        expected = cancel_reasons(original)
+        expected["6"] = "step 5"
+        assert cancel_reasons(env) == expected
+    finally:
+        env.close()
+
+
+@pytest.mark.parametrize("checkpoint_format", ["json", "binary"])
+def test_recovers_from_a_checkpoint_and_the_records_after_it(tmp_path, checkpoint_format):
+    directory = str(tmp_path / "env")
+    store, log = open_durable_store(directory, load_data, INDEXES, checkpoint_format=checkpoint_format)
+    expected = make_env()
+    expected.reset(task_index=0)
+    for step in range(5):
+        if step == 3:
+            log.checkpoint()
+        delta = {"sales_orders": {str(step + 1): {"status": "cancelled", "cancel_reason": f"step {step}"}}}
+        for data in (store, expected.data):
+            data.begin()
+            data.apply_delta(delta)
+            data.commit()
+    log.close()
+    assert not [name for name in os.listdir(directory) if name.endswith(".tmp")]
+
+    store, log = open_durable_store(directory, load_data, INDEXES, checkpoint_format=checkpoint_format)
+    try:
+        assert store == expected.data
+        assert store.get_data_hash() == expected.get_data_hash()
+    finally:
+        log.close()
+
+
+def test_replace_file_leaves_the_old_file_when_writing_fails(tmp_path):
+    path = str(tmp_path / "state.json")
+    replace_file(str(tmp_path), path, lambda f: f.write("old"))
+
+    def fail(f: Any) -> None:
+        f.write("half")
+        raise RuntimeError("disk full")
+
+    with pytest.raises(RuntimeError):
+        replace_file(str(tmp_path), path, fail)
+    with open(path) as f:
+        assert f.read() == "old"
+    assert os.listdir(str(tmp_path)) == ["state.json"]